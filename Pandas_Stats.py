@@ -1,90 +1,330 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-# Load the dataset
-file_path = "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_ads_president_scored_anon.csv"  # Update this to your actual file path
-df = pd.read_csv(file_path)
+import dataset_cache
+from comparative_stats import INTEGRAL_KEY_PATTERN
+from external_groupby import SortGroupPolicy, describe_groups_pandas_sorted
+from instrumentation import Instrumentation, records_stages, stage
+from job_spec import STAT_SEPARATOR, DatasetSpec, group_key_text, grouping_name, unpack_stats
+from nested_columns import NestedPolicy, nested_stats_pandas
+from plot_aggregates import PlotSpec, share_from_frame
+from prefetch_reader import prefetch_batches, with_csv_source
+from quantiles import DEFAULT_PROBABILITIES, quantile_label
+from schema_inference import pandas_dtypes, read_csv_pandas, resolve_schema
+from sketches import SketchPolicy, pandas_top_and_unique
 
-# ===== 1. OVERALL STATISTICS =====
-print("\n=== Overall Describe ===")
-print(df.describe(include='all'))
 
-# Non-numeric column summary
-non_numeric = df.select_dtypes(exclude='number')
-for col in non_numeric.columns:
-    print(f"\n=== {col} Value Counts ===")
-    print(df[col].value_counts().head(5))  # Top 5 most frequent values
-    print(f"Unique values: {df[col].nunique()}")
+# Print top-5 values and the unique count of a column, exactly or from sketches
+def print_value_counts(df: pd.DataFrame, col: str, sketch_policy: SketchPolicy, unique_label: str) -> None:
+    top_values, n_unique, approximate = pandas_top_and_unique(df[col], sketch_policy, col)
+    print(pd.Series(dict(top_values), name="count (approx.)" if approximate else "count", dtype="int64"))
+    print(f"{unique_label}: {'~' if approximate else ''}{n_unique}")
 
-# ===== 2. GROUPED BY 'page_id' =====
-print("\n\n=== Grouped by 'page_id' ===")
-grouped_page = df.groupby('page_id')
 
-# Numerical stats per group
-print(grouped_page.describe().transpose())
+# Print the weighted per-key stats of the nested JSON columns, overall and per group
+def print_nested_stats(df: pd.DataFrame, nested_cols, group_col: str, nested_policy: NestedPolicy) -> None:
+    for col in nested_cols:
+        overall = nested_stats_pandas(df, col, [], nested_policy.weight_column)
+        print(f"\n=== {col} (unpacked, weighted by {nested_policy.weight_column}) ===")
+        print(overall.sort_values("weighted_share", ascending=False))
+        if group_col in df.columns:
+            grouped = nested_stats_pandas(df, col, [group_col], nested_policy.weight_column)
+            print(f"\nWeighted share of each {col} key per {group_col}:")
+            print(grouped["weighted_share"].unstack("key"))
 
-# Most common non-numeric values per group
-for col in non_numeric.columns:
-    print(f"\nMost common {col} per page_id:")
-    print(grouped_page[col].agg(lambda x: x.value_counts().idxmax()))
 
-# ===== 3. GROUPED BY ['page_id', 'ad_id'] =====
-print("\n\n=== Grouped by ['page_id', 'ad_id'] ===")
-grouped_page_ad = df.groupby(['page_id', 'ad_id'])
+# ===== Dataset 1: Facebook ads =====
+@records_stages
+def analyze_fb_ads(file_path: str, sketch_policy: Optional[SketchPolicy] = None, use_cache: bool = False, schema: Union[str, Dict[str, str], None] = None, nested_policy: Optional[NestedPolicy] = None, sort_group_policy: Optional[SortGroupPolicy] = None, plot_specs: Optional[Dict[str, PlotSpec]] = None) -> None:
+    # Load the dataset
+    with stage("load") as record:
+        schema = resolve_schema(file_path, schema)
+        df = dataset_cache.load_pandas(file_path, schema=schema) if use_cache else read_csv_pandas(file_path, schema)
+        record.add_rows(len(df))
 
-# Numerical stats per group
-print(grouped_page_ad.describe().transpose())
+    # Histogram / KDE / box-plot aggregates for bonus_script.py, from the loaded frame
+    if plot_specs:
+        with stage("plot_aggregates"):
+            share_from_frame(file_path, df, plot_specs)
 
+    # ===== 1. OVERALL STATISTICS =====
+    with stage("describe"):
+        print("\n=== Overall Describe ===")
+        print(df.describe(include='all'))
 
-import pandas as pd
+    # Non-numeric column summary (nested JSON columns are unpacked instead, if enabled)
+    non_numeric = df.select_dtypes(exclude='number')
+    nested_cols = [col for col in non_numeric.columns if nested_policy is not None and nested_policy.applies_to(col)]
+    with stage("value_counts"):
+        for col in non_numeric.columns:
+            if col in nested_cols:
+                continue
+            print(f"\n=== {col} Value Counts ===")
+            if sketch_policy is not None:
+                print_value_counts(df, col, sketch_policy, "Unique values")
+                continue
+            print(df[col].value_counts().head(5))  # Top 5 most frequent values
+            print(f"Unique values: {df[col].nunique()}")
 
-# Step 1: Load the dataset
-file_path = "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_posts_president_scored_anon.csv"  # Adjust if needed
-df = pd.read_csv(file_path)
+    if nested_cols:
+        with stage("nested"):
+            print_nested_stats(df, nested_cols, 'page_id', nested_policy)
 
-# Step 2A: Descriptive stats for numeric columns
-print("=== Descriptive Stats for Numeric Columns ===")
-print(df.describe())
+    # ===== 2. GROUPED BY 'page_id' =====
+    with stage("group:page_id"):
+        print("\n\n=== Grouped by 'page_id' ===")
+        grouped_page = df.groupby('page_id')
 
-# Step 2B: Descriptive stats for categorical/object columns
-print("\n=== Descriptive Stats for Categorical Columns ===")
-print(df.describe(include=[object]))
+        # Numerical stats per group
+        print(grouped_page.describe().transpose())
 
-# Step 2C: value_counts and nunique for non-numeric fields
-non_numeric_columns = df.select_dtypes(include='object').columns
+        # Most common non-numeric values per group
+        for col in non_numeric.columns:
+            if col in nested_cols:
+                continue
+            print(f"\nMost common {col} per page_id:")
+            print(grouped_page[col].agg(lambda x: x.value_counts().idxmax()))
 
-for col in non_numeric_columns:
-    print(f"\n--- {col} ---")
-    print("Top 5 Most Frequent Values:")
-    print(df[col].value_counts().head(5))
-    print(f"Number of Unique Values: {df[col].nunique()}")
+    # ===== 3. GROUPED BY ['page_id', 'ad_id'] =====
+    with stage("group:page_id,ad_id"):
+        print("\n\n=== Grouped by ['page_id', 'ad_id'] ===")
+        if sort_group_policy is not None and sort_group_policy.applies_to(['page_id', 'ad_id']):
+            # Nearly one group per row: describe sorted chunks into a CSV file (external_groupby.py)
+            path = sort_group_policy.output_path(file_path, ['page_id', 'ad_id'], '.csv')
+            group_count = describe_groups_pandas_sorted(df, ['page_id', 'ad_id'], path)
+            print(pd.read_csv(path, nrows=5))
+            print(f"Wrote {group_count} groups to {path}")
+        else:
+            grouped_page_ad = df.groupby(['page_id', 'ad_id'])
 
+            # Numerical stats per group
+            print(grouped_page_ad.describe().transpose())
 
 
-import pandas as pd
+# ===== Dataset 2: Facebook posts =====
+@records_stages
+def analyze_fb_posts(file_path: str, sketch_policy: Optional[SketchPolicy] = None, use_cache: bool = False, schema: Union[str, Dict[str, str], None] = None, plot_specs: Optional[Dict[str, PlotSpec]] = None) -> None:
+    # Step 1: Load the dataset
+    with stage("load") as record:
+        schema = resolve_schema(file_path, schema)
+        df = dataset_cache.load_pandas(file_path, schema=schema) if use_cache else read_csv_pandas(file_path, schema)
+        record.add_rows(len(df))
+
+    # Histogram / KDE / box-plot aggregates for bonus_script.py, from the loaded frame
+    if plot_specs:
+        with stage("plot_aggregates"):
+            share_from_frame(file_path, df, plot_specs)
+
+    with stage("describe"):
+        # Step 2A: Descriptive stats for numeric columns
+        print("=== Descriptive Stats for Numeric Columns ===")
+        print(df.describe())
+
+        # Step 2B: Descriptive stats for categorical/object columns
+        print("\n=== Descriptive Stats for Categorical Columns ===")
+        print(df.describe(include=[object]))
+
+    # Step 2C: value_counts and nunique for non-numeric fields
+    non_numeric_columns = df.select_dtypes(include='object').columns
+
+    with stage("value_counts"):
+        for col in non_numeric_columns:
+            print(f"\n--- {col} ---")
+            print("Top 5 Most Frequent Values:")
+            if sketch_policy is not None:
+                print_value_counts(df, col, sketch_policy, "Number of Unique Values")
+                continue
+            print(df[col].value_counts().head(5))
+            print(f"Number of Unique Values: {df[col].nunique()}")
+
+
+# ===== Dataset 3: Twitter posts =====
+@records_stages
+def analyze_tw_posts(file_path: str, sketch_policy: Optional[SketchPolicy] = None, use_cache: bool = False, schema: Union[str, Dict[str, str], None] = None, plot_specs: Optional[Dict[str, PlotSpec]] = None) -> Dict[str, Any]:
+    # Reload the uploaded file
+    with stage("load") as record:
+        schema = resolve_schema(file_path, schema)
+        df = dataset_cache.load_pandas(file_path, schema=schema) if use_cache else read_csv_pandas(file_path, schema)
+        record.add_rows(len(df))
+
+    # Histogram / KDE / box-plot aggregates for bonus_script.py, from the loaded frame
+    if plot_specs:
+        with stage("plot_aggregates"):
+            share_from_frame(file_path, df, plot_specs)
+
+    with stage("describe"):
+        # Step 2A: Describe numeric fields
+        numeric_summary = df.describe(include=[float, int])
+
+        # Step 2B: Describe object/categorical fields
+        categorical_summary = df.describe(include=[object])
+
+    # Step 2C: value_counts() and nunique() for non-numeric columns
+    non_numeric_info = {}
+    non_numeric_columns = df.select_dtypes(include='object').columns
+
+    with stage("value_counts"):
+        for col in non_numeric_columns:
+            if sketch_policy is not None:
+                top_pairs, unique_count, approximate = pandas_top_and_unique(df[col], sketch_policy, col)
+                non_numeric_info[col] = {
+                    "top_5_value_counts": dict(top_pairs),
+                    "n_unique": unique_count,
+                    "approximate": approximate
+                }
+                continue
+            top_values = df[col].value_counts().head(5)
+            unique_count = df[col].nunique()
+            non_numeric_info[col] = {
+                "top_5_value_counts": top_values.to_dict(),
+                "n_unique": unique_count
+            }
+
+    with stage("report"):
+        print(numeric_summary)
+    return non_numeric_info
+
+
+# ===== Job specs (job_spec.py, stats_cli.py) =====
+JOB_CHUNK_ROWS = 200_000
+
+
+# Only the columns a job spec dataset references, filtered chunk by chunk while reading
+def read_job_frame(dataset: DatasetSpec, schema: Optional[Dict[str, str]]) -> pd.DataFrame:
+    """
+    The next chunk is parsed in a background thread while the current one is filtered
+    (prefetch_reader.py); .gz / .zst files are decompressed ahead in another.
+    """
+    headers = with_csv_source(dataset.path, lambda source: pd.read_csv(source, nrows=0).columns.tolist())
+    columns = dataset.referenced_columns(headers) if dataset.columns is not None else None
+    key_columns = dataset.key_columns()
+    # Group keys keep their CSV text (no float parsing, no NA tokens) for join_key_series
+    converters = {column: str for column in key_columns if column in headers}
+
+    def read_chunks(source, dtype) -> pd.DataFrame:
+        frames = []
+        for chunk in prefetch_batches(pd.read_csv(source, usecols=columns, dtype=dtype, converters=converters, chunksize=JOB_CHUNK_ROWS)):
+            for row_filter in dataset.filters:
+                chunk = chunk[row_filter.pandas_mask(chunk[row_filter.column], text_column=row_filter.column in key_columns)]
+            frames.append(chunk)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns or headers)
+
+    def read(dtype) -> pd.DataFrame:
+        return with_csv_source(dataset.path, lambda source: read_chunks(source, dtype))
+    if not schema:
+        return read(None)
+    try:
+        return read({column: dtype for column, dtype in pandas_dtypes(schema).items() if column not in converters})
+    except (ValueError, TypeError):
+        return read(None)
+
+
+# Named aggregations for the requested stats: (column + STAT_SEPARATOR + compute_stats key, column, func)
+def job_aggregations(df: pd.DataFrame, columns: List[str], stats: List[str]) -> List[Tuple[str, str, Any]]:
+    aggregations = []
+    for col in columns:
+        name = f"{col}{STAT_SEPARATOR}"
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            if 'count' in stats:
+                aggregations += [(name + 'total_count', col, 'count'), (name + 'numeric_count', col, 'count')]
+            for stat, func in (('mean', 'mean'), ('min', 'min'), ('max', 'max'), ('stddev', 'std')):
+                if stat in stats:
+                    aggregations.append((name + stat, col, func))
+            if 'quantiles' in stats:
+                aggregations += [(f"{name}quantiles{STAT_SEPARATOR}{quantile_label(p)}", col, quantile_of(p)) for p in DEFAULT_PROBABILITIES]
+        else:
+            if 'count' in stats:
+                aggregations += [(name + 'total_count', col, 'count'), (name + 'non_numeric_count', col, 'count')]
+            if 'unique' in stats:
+                aggregations.append((name + 'unique_non_numeric', col, 'nunique'))
+            if 'most_common' in stats:
+                aggregations.append((name + 'most_common_non_numeric', col, most_common))
+    return aggregations
+
+
+# Quantile p of a Series, as an aggregation function
+def quantile_of(p: float):
+    return lambda s: s.quantile(p)
+
+
+# Most common value of a Series and its count, as [value, count] (None if all missing)
+def most_common(s: pd.Series):
+    counts = s.value_counts()
+    if not len(counts):
+        return None
+    value = counts.index[0]
+    return [value.item() if hasattr(value, 'item') else value, int(counts.iloc[0])]
+
+
+# Canonical join keys of a text Series (comparative_stats.join_key, vectorized)
+def join_key_series(series: pd.Series) -> pd.Series:
+    text = series.str.strip().str.replace(INTEGRAL_KEY_PATTERN, r"\1", regex=True)
+    return text.where(text.str.len() > 0)
+
+
+# Overall and grouped stats of one job spec dataset
+def analyze_job_dataset(dataset: DatasetSpec, schema: Union[str, Dict[str, str], None] = "infer") -> Dict[str, Any]:
+    schema = resolve_schema(dataset.path, schema)
+    df = read_job_frame(dataset, schema)
+    aggregations = job_aggregations(df, dataset.summary_columns(df.columns), dataset.stats)
+    print(f"{dataset.name}: {len(df)} rows after filters, {len(df.columns)} columns read")
+    overall = {name: getattr(df[col], func)() if isinstance(func, str) else func(df[col]) for name, col, func in aggregations}
+    results = {'file_path': dataset.path, 'row_count': len(df), 'overall_stats': unpack_stats(overall)}
+    for keys in dataset.group_by:
+        grouped = df.groupby([join_key_series(df[k]).rename(k) for k in keys], sort=False, dropna=False).agg(**{name: (col, func) for name, col, func in aggregations})
+        results[grouping_name(keys)] = {
+            group_key_text(key if isinstance(key, tuple) else (key,)): unpack_stats(row)
+            for key, row in zip(grouped.index, grouped.to_dict('records'))
+        }
+    return results
+
+
+# ===== Run all three datasets at the same time (output kept in order) =====
+if __name__ == "__main__":
+    from functools import partial
+    from dataset_scheduler import run_dataset_jobs
+
+    # Opt-in approximate value counts for high-cardinality text columns (sketches.py),
+    # e.g. SketchPolicy(threshold=100_000). None keeps value_counts()/nunique() exact.
+    sketch_policy = None
+
+    # Reuse a memory-mapped Arrow copy of each CSV from earlier runs (dataset_cache.py)
+    use_cache = True
+
+    # Per-stage timings printed after each dataset (instrumentation.py); None turns them off
+    instrumentation = Instrumentation(trace_memory=False, profile_dir=None, trace_dir=None)
 
-# Reload the uploaded file
-file_path = "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_tw_posts_president_scored_anon.csv"
-df = pd.read_csv(file_path)
+    # read_csv dtypes from a schema (schema_inference.py): "infer" samples the first rows
+    # of each file once, a {column: type} dict sets them by hand, None lets pandas guess
+    schema = "infer"
 
-# Step 2A: Describe numeric fields
-numeric_summary = df.describe(include=[float, int])
+    # Opt-in: unpack delivery_by_region / demographic_distribution into per-key stats
+    # weighted by impressions (nested_columns.py) instead of counting their raw strings,
+    # e.g. NestedPolicy(columns=("delivery_by_region", "demographic_distribution"),
+    # weight_column="impressions"). None keeps the raw-string value counts.
+    nested_policy = None
 
-# Step 2B: Describe object/categorical fields
-categorical_summary = df.describe(include=[object])
+    # Describe the (page_id, ad_id) groups in sorted chunks written to a CSV file next to
+    # the dataset, instead of one wide describe().transpose() frame (external_groupby.py).
+    # e.g. SortGroupPolicy(groupings=[["page_id", "ad_id"]]); None keeps the frame.
+    sort_group_policy = None
 
-# Step 2C: value_counts() and nunique() for non-numeric columns
-non_numeric_info = {}
-non_numeric_columns = df.select_dtypes(include='object').columns
+    # Also store the pre-aggregated plot data bonus_script.py draws from (plot_aggregates.py),
+    # so it does not read the CSV again; e.g. bonus_script.PLOT_SPECS. None skips it.
+    plot_specs = None
 
-for col in non_numeric_columns:
-    top_values = df[col].value_counts().head(5)
-    unique_count = df[col].nunique()
-    non_numeric_info[col] = {
-        "top_5_value_counts": top_values.to_dict(),
-        "n_unique": unique_count
-    }
+    jobs = [
+        (partial(analyze_fb_ads, sketch_policy=sketch_policy, use_cache=use_cache, instrumentation=instrumentation, schema=schema, nested_policy=nested_policy, sort_group_policy=sort_group_policy, plot_specs=plot_specs), "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_ads_president_scored_anon.csv"),  # Update this to your actual file path
+        (partial(analyze_fb_posts, sketch_policy=sketch_policy, use_cache=use_cache, instrumentation=instrumentation, schema=schema, plot_specs=plot_specs), "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_posts_president_scored_anon.csv"),  # Adjust if needed
+        (partial(analyze_tw_posts, sketch_policy=sketch_policy, use_cache=use_cache, instrumentation=instrumentation, schema=schema, plot_specs=plot_specs), "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_tw_posts_president_scored_anon.csv"),
+    ]
 
-print(numeric_summary)
+    # Datasets analyzed at the same time, capped by a memory budget
+    # (estimated memory per dataset = file size x memory_factor; pandas needs several x)
+    dataset_workers = 3
+    memory_budget_mb = 8192
+    memory_factor = 5.0
 
+    run_dataset_jobs(jobs, max_workers=dataset_workers, memory_budget_mb=memory_budget_mb, memory_factor=memory_factor)
@@ -3,6 +3,17 @@
 
 import polars as pl
 import os # Import the os module to construct file paths and check existence
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import dataset_cache
+from comparative_stats import INTEGRAL_KEY_PATTERN, comparison_results, describe_comparison
+from instrumentation import Instrumentation, records_stages, stage
+from job_spec import STAT_SEPARATOR, Comparison, DatasetSpec, group_key_text, grouping_name, unpack_stats
+from nested_columns import NestedPolicy, nested_stats_polars
+from quantiles import DEFAULT_PROBABILITIES, quantile_label
+from schema_inference import read_csv_polars, resolve_schema, scan_csv_polars
+from sketches import SketchPolicy, polars_top_and_unique
 
 # --- Configuration ---
 # Your list of dataset filenames
@@ -16,9 +27,42 @@ datasets = [
 # This path is derived from your original snippets. Please ensure it's correct.
 base_directory = "/Users/Guest/Downloads/Task_03_Descriptive_Stats/"
 
-# --- Loop through each dataset and perform analysis ---
-for dataset_name in datasets:
-    file_path = os.path.join(base_directory, dataset_name)
+# --- Approximate value counts (opt-in, see sketches.py) ---
+SKETCH_BATCH_ROWS = 100_000
+
+# Print the sketched top 5 and distinct count of one column from batches of its values
+def print_sketched_value_counts(col: str, batches, sketch_policy: SketchPolicy) -> None:
+    top_pairs, n_unique = polars_top_and_unique(batches, sketch_policy)
+    print("Top 5 Most Frequent Values (approx.):")
+    print(pl.DataFrame({col: [value for value, _ in top_pairs], "count_of_values": [count for _, count in top_pairs]}))
+    print(f"Number of Unique Values: ~{n_unique}")
+
+# --- Nested JSON columns (opt-in, see nested_columns.py) ---
+
+# Plans for the unpacked stats of each nested column: overall, then per page_id
+def nested_plans(lf: pl.LazyFrame, nested_cols: List[str], page_id_col: Optional[str], nested_policy: NestedPolicy) -> List[pl.LazyFrame]:
+    plans = []
+    for col in nested_cols:
+        plans.append(nested_stats_polars(lf, col, [], nested_policy.weight_column).sort("weighted_share", descending=True, nulls_last=True))
+        if page_id_col:
+            plans.append(nested_stats_polars(lf, col, [page_id_col], nested_policy.weight_column).sort([page_id_col, "weighted_share"], descending=[False, True], nulls_last=True))
+    return plans
+
+# Print the frames collected from nested_plans
+def print_nested_stats(frames: List[pl.DataFrame], nested_cols: List[str], page_id_col: Optional[str], nested_policy: NestedPolicy) -> None:
+    frames = iter(frames)
+    for col in nested_cols:
+        print(f"\n=== {col} (unpacked, weighted by {nested_policy.weight_column}) ===")
+        print(next(frames))
+        if page_id_col:
+            print(f"\nPer {page_id_col}:")
+            print(next(frames))
+
+# --- Per-dataset analysis ---
+# Module-level so dataset_scheduler can run one dataset per worker process
+@records_stages
+def analyze_dataset_polars(file_path: str, dataset_name: Optional[str] = None, sketch_policy: Optional[SketchPolicy] = None, use_cache: bool = False, schema: Union[str, Dict[str, str], None] = None, nested_policy: Optional[NestedPolicy] = None) -> None:
+    dataset_name = dataset_name or file_path
 
     print(f"\n\n--- Analyzing Dataset: {dataset_name} with Polars ---")
     print(f"Full path: {file_path}")
@@ -26,11 +70,14 @@ for dataset_name in datasets:
     # Check if the file exists before attempting to load
     if not os.path.exists(file_path):
         print(f"Error: The file was not found at '{file_path}'. Skipping this dataset.")
-        continue # Move to the next dataset in the list
+        return # Move to the next dataset in the list
 
     try:
         # Step 1: Load the dataset
-        df = pl.read_csv(file_path)
+        with stage("load") as record:
+            schema = resolve_schema(file_path, schema)
+            df = dataset_cache.load_polars(file_path, schema=schema) if use_cache else read_csv_polars(file_path, schema)
+            record.add_rows(df.height)
         print("Polars DataFrame loaded successfully.")
         print(f"DataFrame shape: {df.shape}")
 
@@ -38,40 +85,222 @@ for dataset_name in datasets:
         print("\n=== Numeric Summary ===")
         # Polars describe() provides a good overview for both numeric and string columns
         # You can filter it if you only want numeric, but it's usually comprehensive.
-        print(df.describe())
+        with stage("describe"):
+            print(df.describe())
 
         # Step 2B: value_counts() and nunique() for categorical/Utf8 columns
+        # (nested JSON columns are unpacked in step 2C instead, if enabled)
         print("\n=== Categorical Value Counts and Unique Counts ===")
+        nested_cols = [col for col in df.columns if nested_policy is not None and nested_policy.applies_to(col)]
+
+        with stage("value_counts"):
+            # Loop through columns and identify Utf8 (string) type
+            for col in df.columns:
+                if df[col].dtype == pl.Utf8 and col not in nested_cols:
+                    print(f"\n--- Column: {col} ---")
+                    try:
+                        # Check if the column itself is empty (no rows of data)
+                        if df[col].is_empty():
+                            print(f"Column '{col}' is empty.")
+                            continue
+
+                        # Opt-in sketches for high-cardinality columns
+                        mode = sketch_policy.mode_for(col) if sketch_policy else "exact"
+                        if mode == "sketch" or (mode == "auto" and df[col].approx_n_unique() > sketch_policy.threshold):
+                            batches = (df[col].slice(i, SKETCH_BATCH_ROWS) for i in range(0, df.height, SKETCH_BATCH_ROWS))
+                            print_sketched_value_counts(col, batches, sketch_policy)
+                            continue
+
+                        # FIX: Use group_by().agg() to explicitly name the count column for sorting.
+                        # This avoids the "ColumnNotFoundError: 'counts' not found" issue.
+                        # pl.len() is used to count rows within each group, and .alias() renames it.
+                        value_counts_df = df.group_by(col).agg(pl.len().alias("count_of_values"))
+
+                        # Now sort by the explicitly named count column
+                        # Handle case where value_counts_df might be empty if all values are null/empty after group_by
+                        if value_counts_df.is_empty():
+                            print(f"No unique values found or counted for column '{col}'.")
+                        else:
+                            print("Top 5 Most Frequent Values:")
+                            # Ensure to sort by the aliased column name
+                            print(value_counts_df.sort("count_of_values", descending=True).head(5))
+
+                        # Get unique count (n_unique() automatically handles nulls if present)
+                        print(f"Number of Unique Values: {df[col].n_unique()}")
+
+                    except Exception as e:
+                        print(f"Error processing column '{col}' for value counts: {e}")
+
+        # Step 2C: per-key stats of the nested JSON columns, overall and per page_id
+        if nested_cols:
+            page_id_col = "page_id" if "page_id" in df.columns else ("Facebook_Id" if "Facebook_Id" in df.columns else None)
+            with stage("nested"):
+                frames = pl.collect_all(nested_plans(df.lazy(), nested_cols, page_id_col, nested_policy))
+                print_nested_stats(frames, nested_cols, page_id_col, nested_policy)
+
+    except pl.exceptions.NoDataError:
+        print(f"Error: The CSV file '{file_path}' is empty or contains no valid data for Polars.")
+    except pl.exceptions.ComputeError as e:
+        print(f"Error during Polars computation for {dataset_name}: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred during Polars analysis for {dataset_name}: {e}")
+
+# --- Lazy single-scan analysis ---
+# Rows of the numeric summary, in the same order as DataFrame.describe()
+DESCRIBE_STATS = ["count", "null_count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+# Expressions for one numeric column's describe() statistics, aliased "<col>:<stat>"
+def describe_exprs(col: str, stats: List[str] = DESCRIBE_STATS) -> List[pl.Expr]:
+    c = pl.col(col)
+    exprs = {
+        "count": c.count(),
+        "null_count": c.null_count(),
+        "mean": c.mean(),
+        "std": c.std(),
+        "min": c.min(),
+        "25%": c.quantile(0.25, interpolation="nearest"),
+        "50%": c.quantile(0.5, interpolation="nearest"),
+        "75%": c.quantile(0.75, interpolation="nearest"),
+        "max": c.max(),
+    }
+    return [exprs[stat].cast(pl.Float64).alias(f"{col}:{stat}") for stat in stats]
+
+# Decide whether to use the streaming engine (file likely larger than free memory)
+def should_stream(file_path: str) -> bool:
+    try:
+        available = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return False # Free memory is unknown on this platform (e.g. macOS); stay in-memory
+    return os.path.getsize(file_path) * 2 > available
+
+# Same report as analyze_dataset_polars, plus the grouped describes, from one collect_all
+@records_stages
+def analyze_dataset_polars_lazy(file_path: str, dataset_name: Optional[str] = None, streaming: Optional[bool] = None, sketch_policy: Optional[SketchPolicy] = None, use_cache: bool = False, schema: Union[str, Dict[str, str], None] = None, nested_policy: Optional[NestedPolicy] = None) -> None:
+    """
+    Builds every summary as a LazyFrame over one pl.scan_csv: the numeric describe and
+    every n_unique in one select, one top-5 plan per string column, and the
+    page_id / (page_id, ad_id) grouped describes. pl.collect_all runs them together,
+    so common-subplan elimination shares the scan and projection pushdown reads only
+    the needed columns. streaming=None picks the streaming engine when the file looks
+    larger than free memory.
+
+    With a sketch_policy, 'sketch' and 'auto' string columns get approx_n_unique in the
+    summary select instead of an exact top-5 plan. Afterwards, 'auto' columns under
+    the threshold get their exact plans in a second collect_all, and the others are
+    counted with Space-Saving over collect_batches, so no full hash table is built.
+    use_cache scans the cached Arrow IPC copy (dataset_cache.py) instead of the CSV;
+    schema gives scan_csv its schema_overrides (schema_inference.py).
+    With a nested_policy, its JSON-string columns are unpacked into per-key stats
+    (overall and per page_id) by plans in the same collect_all, and get no top-5 plan.
+    """
+    dataset_name = dataset_name or file_path
+
+    print(f"\n\n--- Analyzing Dataset: {dataset_name} with Polars (lazy) ---")
+    print(f"Full path: {file_path}")
+
+    if not os.path.exists(file_path):
+        print(f"Error: The file was not found at '{file_path}'. Skipping this dataset.")
+        return
 
-        # Loop through columns and identify Utf8 (string) type
-        for col in df.columns:
-            if df[col].dtype == pl.Utf8:
+    try:
+        with stage("plan"):
+            schema = resolve_schema(file_path, schema)
+            lf = dataset_cache.scan_polars(file_path, schema=schema) if use_cache else scan_csv_polars(file_path, schema)
+            schema = lf.collect_schema()
+        nested_cols = [col for col in schema if nested_policy is not None and nested_policy.applies_to(col)]
+        numeric_cols = [col for col, dtype in schema.items() if dtype.is_numeric()]
+        string_cols = [col for col, dtype in schema.items() if dtype == pl.Utf8 and col not in nested_cols]
+
+        # Grouping columns, with the same naming fallbacks as Pure_Python_Stats.py
+        page_id_col = "page_id" if "page_id" in schema else ("Facebook_Id" if "Facebook_Id" in schema else None)
+        child_col = "ad_id" if "ad_id" in schema else ("post_id" if "post_id" in schema else None)
+        grouping_sets = []
+        if page_id_col:
+            grouping_sets.append([page_id_col])
+            if child_col:
+                grouping_sets.append([page_id_col, child_col])
+
+        # Plan 0: row count, numeric describe and every n_unique in a single select
+        summary_exprs = [pl.len().alias("row_count")]
+        for col in numeric_cols:
+            summary_exprs.extend(describe_exprs(col))
+        sketch_modes = {col: sketch_policy.mode_for(col) if sketch_policy else "exact" for col in string_cols}
+        exact_cols = [col for col in string_cols if sketch_modes[col] == "exact"]
+        for col in string_cols:
+            if sketch_modes[col] == "exact":
+                summary_exprs.append(pl.col(col).n_unique().alias(f"{col}:n_unique"))
+            else:
+                summary_exprs.append(pl.col(col).approx_n_unique().alias(f"{col}:approx_n_unique"))
+        plans = [lf.select(summary_exprs)]
+
+        # Plans 1..k: top 5 values for each exactly counted string column
+        def top5_plan(col: str) -> pl.LazyFrame:
+            return lf.group_by(col).agg(pl.len().alias("count_of_values")).sort("count_of_values", descending=True).head(5)
+        for col in exact_cols:
+            plans.append(top5_plan(col))
+
+        # Remaining plans: grouped describe for each grouping (numeric, non-key columns)
+        group_stats = [stat for stat in DESCRIBE_STATS if stat != "null_count"]
+        for keys in grouping_sets:
+            exprs = [pl.len().alias("rows")]
+            for col in numeric_cols:
+                if col not in keys:
+                    exprs.extend(describe_exprs(col, group_stats))
+            plans.append(lf.group_by(keys).agg(exprs).sort(keys))
+
+        # Last plans: unpacked nested columns
+        plans.extend(nested_plans(lf, nested_cols, page_id_col, nested_policy) if nested_cols else [])
+
+        if streaming is None:
+            streaming = should_stream(file_path)
+        engine = "streaming" if streaming else "auto"
+        with stage("collect") as record:
+            results = pl.collect_all(plans, engine=engine)
+
+            summary = results[0].row(0, named=True)
+            record.add_rows(summary["row_count"])
+        top5_frames = dict(zip(exact_cols, results[1:1 + len(exact_cols)]))
+        group_frames = results[1 + len(exact_cols):1 + len(exact_cols) + len(grouping_sets)]
+        nested_frames = results[1 + len(exact_cols) + len(grouping_sets):]
+
+        # 'auto' columns that turned out small enough are counted exactly after all
+        small_cols = [col for col in string_cols if sketch_modes[col] == "auto" and summary[f"{col}:approx_n_unique"] <= sketch_policy.threshold]
+        if small_cols:
+            small_plans = [lf.select([pl.col(col).n_unique().alias(f"{col}:n_unique") for col in small_cols])]
+            small_plans += [top5_plan(col) for col in small_cols]
+            with stage("collect"):
+                small_results = pl.collect_all(small_plans, engine=engine)
+            summary.update(small_results[0].row(0, named=True))
+            top5_frames.update(zip(small_cols, small_results[1:]))
+        with stage("report"):
+            print("Polars LazyFrame collected successfully.")
+            print(f"DataFrame shape: ({summary['row_count']}, {len(schema)})")
+
+            print("\n=== Numeric Summary ===")
+            describe_df = pl.DataFrame({"statistic": DESCRIBE_STATS, **{col: [summary[f"{col}:{stat}"] for stat in DESCRIBE_STATS] for col in numeric_cols}})
+            print(describe_df)
+
+            print("\n=== Categorical Value Counts and Unique Counts ===")
+            for col in string_cols:
                 print(f"\n--- Column: {col} ---")
-                try:
-                    # Check if the column itself is empty (no rows of data)
-                    if df[col].is_empty():
-                        print(f"Column '{col}' is empty.")
-                        continue
-
-                    # FIX: Use group_by().agg() to explicitly name the count column for sorting.
-                    # This avoids the "ColumnNotFoundError: 'counts' not found" issue.
-                    # pl.len() is used to count rows within each group, and .alias() renames it.
-                    value_counts_df = df.group_by(col).agg(pl.len().alias("count_of_values"))
-
-                    # Now sort by the explicitly named count column
-                    # Handle case where value_counts_df might be empty if all values are null/empty after group_by
-                    if value_counts_df.is_empty():
-                        print(f"No unique values found or counted for column '{col}'.")
-                    else:
-                        print("Top 5 Most Frequent Values:")
-                        # Ensure to sort by the aliased column name
-                        print(value_counts_df.sort("count_of_values", descending=True).head(5))
-
-                    # Get unique count (n_unique() automatically handles nulls if present)
-                    print(f"Number of Unique Values: {df[col].n_unique()}")
-
-                except Exception as e:
-                    print(f"Error processing column '{col}' for value counts: {e}")
+                if col not in top5_frames:
+                    batches = (batch.to_series() for batch in lf.select(col).collect_batches(chunk_size=SKETCH_BATCH_ROWS, engine=engine))
+                    print_sketched_value_counts(col, batches, sketch_policy)
+                    continue
+                value_counts_df = top5_frames[col]
+                if value_counts_df.is_empty():
+                    print(f"No unique values found or counted for column '{col}'.")
+                else:
+                    print("Top 5 Most Frequent Values:")
+                    print(value_counts_df)
+                print(f"Number of Unique Values: {summary[f'{col}:n_unique']}")
+
+            if nested_cols:
+                print_nested_stats(nested_frames, nested_cols, page_id_col, nested_policy)
+
+            for keys, grouped_df in zip(grouping_sets, group_frames):
+                print(f"\n\n=== Grouped by {keys} ===")
+                print(grouped_df)
 
     except pl.exceptions.NoDataError:
         print(f"Error: The CSV file '{file_path}' is empty or contains no valid data for Polars.")
@@ -80,4 +309,196 @@ for dataset_name in datasets:
     except Exception as e:
         print(f"An unexpected error occurred during Polars analysis for {dataset_name}: {e}")
 
-print("\n\n--- All Dataset Analysis Complete ---")
\ No newline at end of file
+# --- Job specs (job_spec.py, stats_cli.py) ---
+
+# Aggregations for the requested stats, named column + STAT_SEPARATOR + compute_stats key
+def job_aggregations(frame_schema: pl.Schema, columns: List[str], stats: List[str]) -> List[pl.Expr]:
+    exprs = []
+    for col in columns:
+        c = pl.col(col)
+        name = f"{col}{STAT_SEPARATOR}"
+        if frame_schema[col].is_numeric():
+            if 'count' in stats:
+                exprs += [c.count().alias(name + 'total_count'), c.count().alias(name + 'numeric_count')]
+            if 'mean' in stats:
+                exprs.append(c.mean().alias(name + 'mean'))
+            if 'min' in stats:
+                exprs.append(c.min().alias(name + 'min'))
+            if 'max' in stats:
+                exprs.append(c.max().alias(name + 'max'))
+            if 'stddev' in stats:
+                exprs.append(c.std().alias(name + 'stddev'))
+            if 'quantiles' in stats:
+                exprs += [c.quantile(p, interpolation="linear").alias(f"{name}quantiles{STAT_SEPARATOR}{quantile_label(p)}") for p in DEFAULT_PROBABILITIES]
+        else:
+            if 'count' in stats:
+                exprs += [c.count().alias(name + 'total_count'), c.count().alias(name + 'non_numeric_count')]
+            if 'unique' in stats:
+                exprs.append(c.drop_nulls().n_unique().alias(name + 'unique_non_numeric'))
+            if 'most_common' in stats:
+                exprs.append(c.drop_nulls().value_counts(sort=True).first().alias(name + 'most_common_non_numeric'))
+    return exprs
+
+# {column: stats} from one row of job_aggregations; most common values become [value, count]
+def job_summary(row: Dict) -> Dict[str, Dict]:
+    summary = unpack_stats(row)
+    for stats in summary.values():
+        most_common = stats.get('most_common_non_numeric')
+        if isinstance(most_common, dict):
+            stats['most_common_non_numeric'] = list(most_common.values())
+    return summary
+
+JOIN_KEY = f"{STAT_SEPARATOR}key" # Join key column of comparison plans (cannot clash with a CSV column)
+
+# Canonical join key of a text column (comparative_stats.join_key as an expression)
+def join_key_expr(column: str, name: str = JOIN_KEY) -> pl.Expr:
+    text = pl.col(column).cast(pl.Utf8).str.strip_chars().str.replace(INTEGRAL_KEY_PATTERN, "${1}")
+    return pl.when(text.str.len_chars() > 0).then(text).alias(name)
+
+# Overall and grouped stats of one job spec dataset in a single lazy query
+def analyze_job_dataset(dataset: DatasetSpec, schema: Union[str, Dict[str, str], None] = "infer") -> Dict:
+    """
+    scan_csv only reads the referenced columns (projection pushdown) and the filters
+    are applied while the CSV is read (predicate pushdown). Group key columns are read
+    as text and grouped by their join key (join_key_expr), as the other engines do.
+    """
+    schema = resolve_schema(dataset.path, schema)
+    key_columns = dataset.key_columns()
+    for infer_all in (False, True):
+        lf = scan_csv_polars(dataset.path, schema, text_columns=sorted(key_columns), infer_all=infer_all)
+        headers = lf.collect_schema().names()
+        if dataset.columns is not None:
+            lf = lf.select(dataset.referenced_columns(headers))
+        for row_filter in dataset.filters:
+            lf = lf.filter(row_filter.polars_expr(text_column=row_filter.column in key_columns))
+        frame_schema = lf.collect_schema()
+        exprs = job_aggregations(frame_schema, dataset.summary_columns(frame_schema.names()), dataset.stats)
+        plans = [lf.select([pl.len().alias("row_count")] + exprs)]
+        plans += [lf.group_by([join_key_expr(k, k) for k in keys], maintain_order=True).agg(exprs) for keys in dataset.group_by]
+        try:
+            frames = pl.collect_all(plans)
+            break
+        except pl.exceptions.ComputeError:
+            # Schema overrides did not fit: infer from the whole file instead
+            if infer_all:
+                raise
+    overall = frames[0].row(0, named=True)
+    print(f"{dataset.name}: {overall['row_count']} rows after filters, {len(frame_schema)} columns read")
+    results = {'file_path': dataset.path, 'row_count': overall['row_count'], 'overall_stats': job_summary(overall)}
+    for keys, frame in zip(dataset.group_by, frames[1:]):
+        results[grouping_name(keys)] = {group_key_text([row[k] for k in keys]): job_summary(row) for row in frame.iter_rows(named=True)}
+    return results
+
+# Lazy scan of one comparison dataset with its projection and filters
+def comparison_scan(dataset: DatasetSpec, key: str, schema: Optional[Dict[str, str]], infer_all: bool) -> pl.LazyFrame:
+    """
+    The key is read as text, so join_key_expr works on the CSV field as written
+    (comparative_stats.join_key, as the pure-Python engine) instead of a float Polars
+    inferred; filters on the key still compare numbers as numbers.
+    """
+    lf = scan_csv_polars(dataset.path, schema, text_columns=[key], infer_all=infer_all)
+    headers = lf.collect_schema().names()
+    if key not in headers:
+        raise ValueError(f"Comparison key '{key}' is not a column of {dataset.path}.")
+    if dataset.columns is not None:
+        needed = set(dataset.referenced_columns(headers)) | {key}
+        lf = lf.select([h for h in headers if h in needed])
+    for row_filter in dataset.filters:
+        lf = lf.filter(row_filter.polars_expr(text_column=row_filter.column == key))
+    return lf
+
+# Joined rows of a comparison frame, shaped as in comparative_stats
+def comparison_rows(frame: pl.DataFrame, names: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Columns are named '<dataset index>\x1frows' and '<dataset index>\x1f<aggregate>'.
+    """
+    for row in frame.iter_rows(named=True):
+        parts = [{} for _ in names]
+        for column, value in row.items():
+            if column != JOIN_KEY:
+                index, aggregate = column.split(STAT_SEPARATOR, 1)
+                parts[int(index)][aggregate] = value
+        rows, stats = {}, {}
+        for name, part in zip(names, parts):
+            rows[name] = part.pop('rows') or 0
+            stats[name] = job_summary(part) if rows[name] else None
+        yield {'key': row[JOIN_KEY], 'rows': rows, 'stats': stats}
+
+# Per-key stats of a job spec comparison side by side, in one lazy query
+def analyze_comparison(comparison: Comparison, datasets: Dict[str, DatasetSpec], schema: Union[str, Dict[str, str], None] = "infer") -> Dict[str, Any]:
+    """
+    Each dataset is grouped by its key in a lazy plan (with projection and predicate
+    pushdown), and the grouped plans are joined on the key, so the hash join runs on
+    one row per key. The join and the row and key counts are collected together, so
+    each CSV is scanned once.
+    """
+    names = list(comparison.keys)
+    for infer_all in (False, True):
+        scans, grouped = [], []
+        for i, name in enumerate(names):
+            dataset, key = datasets[name], comparison.keys[name]
+            lf = comparison_scan(dataset, key, resolve_schema(dataset.path, schema), infer_all)
+            frame_schema = lf.collect_schema()
+            exprs = job_aggregations(frame_schema, dataset.summary_columns(frame_schema.names()), dataset.stats)
+            prefix = f"{i}{STAT_SEPARATOR}"
+            scans.append(lf)
+            grouped.append(lf.group_by(join_key_expr(key)).agg([pl.len().alias(prefix + "rows")] + [e.name.prefix(prefix) for e in exprs])
+                           .filter(pl.col(JOIN_KEY).is_not_null()))
+        joined = grouped[0]
+        for other in grouped[1:]:
+            joined = joined.join(other, on=JOIN_KEY, how="full" if comparison.how == 'outer' else "inner", coalesce=True)
+        plans = [joined.sort(JOIN_KEY)] + [lf.select(pl.len()) for lf in scans] + [g.select(pl.len()) for g in grouped]
+        try:
+            frames = pl.collect_all(plans)
+            break
+        except pl.exceptions.ComputeError:
+            # Schema overrides did not fit: infer from the whole files instead
+            if infer_all:
+                raise
+    counts = [frame.item() for frame in frames[1:]]
+    infos = {name: {'file_path': datasets[name].path, 'key': comparison.keys[name], 'row_count': counts[i], 'key_count': counts[len(names) + i]}
+             for i, name in enumerate(names)}
+    results = comparison_results(comparison, infos, comparison_rows(frames[0], names))
+    print(describe_comparison(comparison.name, results))
+    return results
+
+# --- Run every dataset (in parallel worker processes, output kept in order) ---
+if __name__ == "__main__":
+    from dataset_scheduler import run_dataset_jobs
+
+    # Set to True to build all summaries (including grouped describes) lazily and run
+    # them with a single pl.collect_all; False keeps the eager read_csv + describe flow
+    lazy_mode = True
+    analyze = analyze_dataset_polars_lazy if lazy_mode else analyze_dataset_polars
+
+    # Opt-in approximate value counts for high-cardinality text columns (sketches.py),
+    # e.g. SketchPolicy(threshold=100_000). None keeps every count exact.
+    sketch_policy = None
+
+    # Reuse a memory-mapped Arrow IPC copy of each CSV from earlier runs (dataset_cache.py)
+    use_cache = True
+
+    # Per-stage timings printed after each dataset (instrumentation.py); None turns them off
+    instrumentation = Instrumentation(trace_memory=False, profile_dir=None, trace_dir=None)
+
+    # Column types from a larger sample than Polars' default 100 rows (schema_inference.py):
+    # "infer" samples the first rows of each file once, a {column: type} dict sets them
+    # by hand, None keeps Polars' own inference
+    schema = "infer"
+
+    # Opt-in: unpack delivery_by_region / demographic_distribution into per-key stats
+    # weighted by impressions (nested_columns.py) instead of counting their raw strings,
+    # e.g. NestedPolicy(columns=("delivery_by_region", "demographic_distribution"),
+    # weight_column="impressions"). None keeps the raw-string value counts.
+    nested_policy = None
+
+    # Datasets analyzed at the same time, capped by a memory budget
+    # (estimated memory per dataset = file size x memory_factor)
+    dataset_workers = 3
+    memory_budget_mb = 8192
+    memory_factor = 3.0
+
+    jobs = [(partial(analyze, dataset_name=dataset_name, sketch_policy=sketch_policy, use_cache=use_cache, instrumentation=instrumentation, schema=schema, nested_policy=nested_policy), os.path.join(base_directory, dataset_name)) for dataset_name in datasets]
+    run_dataset_jobs(jobs, max_workers=dataset_workers, memory_budget_mb=memory_budget_mb, memory_factor=memory_factor, start_method="spawn")
+
+    print("\n\n--- All Dataset Analysis Complete ---")
\ No newline at end of file
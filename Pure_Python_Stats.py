@@ -1,18 +1,44 @@
 import csv
 import math
 import os # For path manipulation and checking file existence
+import re
+from array import array # Compact typed buffers for the columnar table
 from collections import defaultdict, Counter
-from typing import List, Dict, Any, Tuple
+from itertools import islice
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional, Union
 import json # For potential JSON output
+from functools import partial
+
+from comparative_stats import comparison_results, describe_comparison, hash_join, join_key # Cross-dataset joins of group summaries
+from external_groupby import ExternalSorter, SortedGroups, SortGroupPolicy # Sort-based group-by for near-unique keys
+from instrumentation import Instrumentation, instrumented, recorder_for, stage # Opt-in per-stage timings
+from job_spec import Comparison, DatasetSpec, RowFilter, group_key_text, grouping_name # Declarative jobs for stats_cli.py
+from mmap_reader import bytes_converter, iter_mmap_records # Memory-mapped CSV tokenizer for load_csv
+from nested_columns import NestedAccumulator, NestedPolicy, decode_nested, nested_weight # Unpacking of JSON-string columns
+from prefetch_reader import compression_of, open_csv_text # Read-ahead thread and .gz / .zst input
+from quantiles import QuantileAccumulator, QuantilePolicy # Opt-in p25/median/p75/p95/p99 of numeric columns
+from result_sink import GroupSink, ResultSinkPolicy # Streaming NDJSON / Parquet output of group summaries
+from schema_inference import resolve_schema # Per-column types for typed parsing
+from sketches import SketchPolicy # Opt-in HyperLogLog / Space-Saving counting for text columns
 
 # --- Helper Functions (Defined once) ---
 
 # Load the CSV file
-def load_csv(filepath: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+def load_csv(filepath: str, columnar: bool = False, schema: Optional[Dict[str, str]] = None, use_mmap: bool = False, prefetch: bool = False) -> Tuple[List[str], Union['ColumnarTable', List[Dict[str, Any]]]]:
     """
-    Loads a CSV file into a list of dictionaries (rows) and a list of headers.
+    Loads a CSV file and returns its headers plus the rows.
+    By default the rows are the list of dictionaries from csv.DictReader (raw string
+    cells); columnar=True holds them in a ColumnarTable instead (typed arrays, parsed
+    once), which is what process_dataset uses.
+    A schema (see schema_inference.py) selects a typed converter per column.
+    use_mmap tokenizes the columnar table from a memory-mapped file (mmap_reader.py).
+    prefetch reads the file ahead in a background thread; .gz / .zst files are always
+    decompressed that way (prefetch_reader.py).
     """
-    with open(filepath, newline='', encoding='utf-8') as csvfile:
+    if columnar:
+        table = load_csv_columnar(filepath, schema, use_mmap, prefetch)
+        return table.headers, table
+    with open_csv_text(filepath, prefetch) as csvfile:
         reader = csv.DictReader(csvfile)
         rows = [row for row in reader]
         headers = reader.fieldnames if reader.fieldnames else [] # Handle case of empty file or no headers
@@ -32,12 +58,63 @@ def try_parse_float(value: str) -> Any:
     except ValueError:
         return value.strip()
 
+# Superset of the strings float() accepts (digits, '_', '.', exponent, nan/inf)
+NUMBER_LIKE_RE = re.compile(r'\s*[+-]?(?:[\d_.]+(?:[eE][+-]?[\d_]+)?|(?i:nan|inf|infinity))\s*')
+
+# try_parse_float for columns known to hold numbers
+def parse_number(value: Optional[str]) -> Any:
+    """
+    Same result as try_parse_float; only the rare non-numeric cell raises ValueError.
+    """
+    if not value or value.isspace():
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value.strip()
+
+# try_parse_float for columns known to hold text
+def parse_text(value: Optional[str]) -> Any:
+    """
+    Same result as try_parse_float without raising ValueError per cell: float() is
+    only tried on values that look like a number.
+    """
+    if not value or value.isspace():
+        return None
+    if NUMBER_LIKE_RE.fullmatch(value):
+        return try_parse_float(value)
+    return value.strip()
+
+# One converter per header, picked from a schema {column: type}
+def column_converters(headers: List[str], schema: Optional[Dict[str, str]] = None, raw_bytes: bool = False) -> List[Any]:
+    """
+    Columns missing from the schema (or typed 'unknown') use try_parse_float.
+    With raw_bytes, the converters take bytes fields (see mmap_reader.bytes_converter).
+    """
+    converters = []
+    for h in headers:
+        column_type = schema.get(h) if schema else None
+        if column_type in ('int', 'float', 'mixed'):
+            converter = parse_number
+        elif column_type in ('bool', 'json', 'id', 'text'):
+            converter = parse_text
+        else:
+            converter = try_parse_float
+        converters.append(bytes_converter(converter, numeric=converter is not parse_text) if raw_bytes else converter)
+    return converters
+
 # Compute stats for a column
-def compute_stats(values: List[Any]) -> Dict[str, Any]:
+@instrumented("aggregate")
+def compute_stats(values: List[Any], sketch_policy: Optional[SketchPolicy] = None, column: Optional[str] = None, quantile_policy: Optional[QuantilePolicy] = None) -> Dict[str, Any]:
     """
     Computes basic descriptive statistics for a list of values.
     Separates numeric and non-numeric values for different stats.
     Handles None values by filtering them out before calculation.
+    With a sketch_policy, the column's non-numeric values may be summarized with
+    HyperLogLog / Space-Saving sketches; the stats then include
+    'non_numeric_approximate': True.
+    With a quantile_policy, the stats end with 'quantiles' ({'p25': ..., 'p50': ...} of
+    the numeric values, see quantiles.py).
     """
     # Filter out None values before processing, as they can cause issues with stats
     filtered_values = [v for v in values if v is not None]
@@ -67,45 +144,115 @@ def compute_stats(values: List[Any]) -> Dict[str, Any]:
         stats['max'] = None
         stats['stddev'] = None
 
-    if non_numeric_values:
+    mode = sketch_policy.mode_for(column) if sketch_policy else 'exact'
+    if non_numeric_values and mode != 'exact':
+        counter = Counter(non_numeric_values) if mode == 'auto' else None
+        if counter is not None and len(counter) <= sketch_policy.threshold:
+            mode = 'exact' # Few enough distinct values to count exactly
+        else:
+            hll, top_k = sketch_policy.new_sketches()
+            for v in non_numeric_values:
+                hll.add(v)
+                top_k.add(v)
+            stats['non_numeric_count'] = len(non_numeric_values)
+            stats['unique_non_numeric'] = hll.count()
+            stats['most_common_non_numeric'] = top_k.top(1)[0]
+            stats['non_numeric_approximate'] = True
+
+    if non_numeric_values and mode == 'exact':
         counter = Counter(non_numeric_values)
         stats['non_numeric_count'] = len(non_numeric_values)
         stats['unique_non_numeric'] = len(counter)
         # most_common returns a list of (value, count) tuples. Get the first one.
         stats['most_common_non_numeric'] = counter.most_common(1)[0] if counter else None
-    else:
+    elif not non_numeric_values:
         stats['non_numeric_count'] = 0
         stats['unique_non_numeric'] = 0
         stats['most_common_non_numeric'] = None
-    
+
+    if quantile_policy is not None:
+        stats.update(quantile_policy.summarize(numeric_values, column))
     return stats
 
 # Analyze all columns in the dataset
-def analyze_dataset(headers: List[str], rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+def analyze_dataset(headers: List[str], rows: List[Dict[str, Any]], engine: str = 'python', sketch_policy: Optional[SketchPolicy] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None) -> Dict[str, Dict[str, Any]]:
     """
     Analyzes each column in the dataset and computes statistics.
     Handles cases where a row might not contain a header, appending None.
+    A ColumnarTable is analyzed directly from its typed column buffers.
+    engine='numpy' (or 'auto') uses the vectorized numpy_backend when NumPy is installed.
+    A sketch_policy is passed on to compute_stats (pure-Python engine only), as is a
+    quantile_policy that sketches some column. With a nested_policy, its columns'
+    stats also get 'nested' (see nested_column_stats), whatever the engine.
     """
+    backend = get_numpy_backend(engine) if sketch_policy is None and numpy_quantiles(quantile_policy) else None
+    if backend is not None:
+        table = as_columnar_table(headers, rows)
+        summary = {col: stats for col, stats in backend.analyze_table(table, quantile_policy).items() if col in headers}
+        return add_nested_stats(summary, headers, table, nested_policy)
+
+    if isinstance(rows, ColumnarTable) and sketch_policy is None:
+        if len(rows) == 0:
+            return {}
+        summary = {col: rows.column_stats(i, quantile_policy) for i, col in enumerate(rows.headers) if col in headers}
+        return add_nested_stats(summary, headers, rows, nested_policy)
+
     columns = defaultdict(list)
-    for row in rows:
-        for h in headers:
-            # Ensure the key exists in the row before trying to access it
-            # csv.DictReader might fill missing fields with empty strings, but explicit check is safer
-            value = try_parse_float(row.get(h, None)) # Use .get() with a default of None
-            columns[h].append(value)
+    with stage("parse", len(rows)):
+        for row in rows:
+            for h in headers:
+                # Ensure the key exists in the row before trying to access it
+                # csv.DictReader might fill missing fields with empty strings, but explicit check is safer
+                value = try_parse_float(row.get(h, None)) # Use .get() with a default of None
+                columns[h].append(value)
     
     summary = {}
     for col, values in columns.items():
-        summary[col] = compute_stats(values)
+        summary[col] = compute_stats(values, sketch_policy, col, quantile_policy)
+    return add_nested_stats(summary, headers, rows, nested_policy)
+
+# Weighted per-key stats of the nested JSON columns (nested_columns.py) of some rows
+def nested_column_stats(headers: List[str], rows: Union['ColumnarTable', List[Dict[str, Any]]], nested_policy: NestedPolicy) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns {column: NestedAccumulator stats} for the policy's columns in headers,
+    the same values HashAggregator adds under 'nested' in streaming mode.
+    """
+    columns = [h for h in headers if nested_policy.applies_to(h)]
+    if not columns:
+        return {}
+    weight_column = nested_policy.weight_column
+    if isinstance(rows, ColumnarTable):
+        indices = [rows.headers.index(c) for c in columns]
+        weight_index = rows.headers.index(weight_column) if weight_column in rows.headers else None
+        records = (([rows.value(c, i) for c in indices], rows.value(weight_index, i) if weight_index is not None else None) for i in rows._rows())
+    else:
+        records = (([try_parse_float(row.get(c, None)) for c in columns], try_parse_float(row.get(weight_column, None))) for row in rows)
+    accumulators = [NestedAccumulator() for _ in columns]
+    for values, weight in records:
+        weight = nested_weight(weight)
+        for acc, value in zip(accumulators, values):
+            acc.add_value(value, weight)
+    return {col: acc.stats() for col, acc in zip(columns, accumulators)}
+
+# Add 'nested' to the stats of a summary's nested columns (no-op without a policy)
+def add_nested_stats(summary: Dict[str, Dict[str, Any]], headers: List[str], rows: Union['ColumnarTable', List[Dict[str, Any]]], nested_policy: Optional[NestedPolicy]) -> Dict[str, Dict[str, Any]]:
+    if nested_policy is not None and summary:
+        for col, nested in nested_column_stats(headers, rows, nested_policy).items():
+            summary[col]['nested'] = nested
     return summary
 
 # Group by one or more columns
+@instrumented("group_by")
 def group_by(rows: List[Dict[str, Any]], keys: List[str]) -> Dict[Tuple, List[Dict[str, Any]]]:
     """
     Groups rows by the specified key columns.
     Applies try_parse_float to key values to ensure consistent type for grouping.
     Handles missing keys in a row by using None.
+    A ColumnarTable is grouped into ColumnarTable views that share its buffers.
     """
+    if isinstance(rows, ColumnarTable):
+        return rows.group_by(keys)
+
     grouped = defaultdict(list)
     for row in rows:
         key_values = []
@@ -117,74 +264,884 @@ def group_by(rows: List[Dict[str, Any]], keys: List[str]) -> Dict[Tuple, List[Di
     return grouped
 
 # Analyze grouped data
-def analyze_groups(headers: List[str], rows: List[Dict[str, Any]], group_keys: List[str]) -> Dict:
+def analyze_groups(headers: List[str], rows: List[Dict[str, Any]], group_keys: List[str], engine: str = 'python', sketch_policy: Optional[SketchPolicy] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None) -> Dict:
     """
     Groups the data and then analyzes each group.
+    engine='numpy' (or 'auto') computes all groups at once with the numpy_backend
+    (nested columns are still unpacked group by group in Python).
     """
     # Pre-check if all group_keys exist in headers for informational purposes
     missing_keys = [key for key in group_keys if key not in headers]
     if missing_keys:
         print(f"Warning: Grouping keys {missing_keys} not found in dataset headers. These groups will use 'None' for missing keys.")
 
+    backend = get_numpy_backend(engine) if sketch_policy is None and numpy_quantiles(quantile_policy) else None
+    if backend is not None:
+        table = as_columnar_table(headers, rows)
+        grouped = backend.analyze_table_groups(table, group_keys, quantile_policy)
+        grouped = {key: {col: stats for col, stats in summary.items() if col in headers} for key, summary in grouped.items()}
+        if nested_policy is not None:
+            for key, group_rows in group_by(table, group_keys).items():
+                add_nested_stats(grouped[key], headers, group_rows, nested_policy)
+        return grouped
+
     grouped_data = group_by(rows, group_keys)
     group_summaries = {}
     for group, group_rows in grouped_data.items():
         # Pass the original full headers for consistency with analyze_dataset
-        group_summary = analyze_dataset(headers, group_rows)
+        group_summary = analyze_dataset(headers, group_rows, sketch_policy=sketch_policy, quantile_policy=quantile_policy, nested_policy=nested_policy)
         group_summaries[group] = group_summary
     return group_summaries
 
+# --- Columnar Typed Storage ---
+
+class TypedColumn:
+    """
+    One column of a ColumnarTable.
+    numbers holds the float value of each cell (0.0 when the cell is not numeric),
+    valid is a bitmap with one bit per row set when the cell is not None, and codes
+    holds 1 + the string-pool index of non-numeric cells (0 for numeric/None cells).
+    codes is only allocated once the column actually contains a string.
+    """
+    __slots__ = ('numbers', 'codes', 'valid', 'null_count', 'string_count')
+
+    def __init__(self):
+        self.numbers = array('d')
+        self.codes = None
+        self.valid = bytearray()
+        self.null_count = 0
+        self.string_count = 0
+
+class ColumnarTable:
+    """
+    Compact replacement for the List[Dict[str, Any]] rows produced by csv.DictReader.
+    Cells are parsed once with try_parse_float and stored column by column in typed
+    arrays (8 bytes per numeric cell, 4 more for dictionary-encoded strings), and every
+    distinct string is stored once in a pool shared by all columns.
+
+    A table can also be a view over a subset of rows of another table (see select),
+    which is how group_by returns groups without copying any column data.
+    Iterating a table yields row dicts of parsed values, so code written against the
+    old list of rows still works. With a schema, cells are parsed by the typed
+    converters from column_converters (same values as try_parse_float); with raw_bytes,
+    append_record takes records of bytes fields (mmap_reader.py).
+    """
+
+    def __init__(self, headers: List[str], schema: Optional[Dict[str, str]] = None, raw_bytes: bool = False):
+        self.headers = list(headers)
+        self.converters = column_converters(self.headers, schema, raw_bytes)
+        self.columns = [TypedColumn() for _ in self.headers]
+        self.string_pool = []  # Shared pool of distinct strings, indexed by code - 1
+        self.string_codes = {}
+        self.num_rows = 0
+        self.row_indices = None  # array('I') of selected rows when this is a view
+
+    def __len__(self) -> int:
+        return len(self.row_indices) if self.row_indices is not None else self.num_rows
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in self._rows():
+            yield {h: self.value(c, i) for c, h in enumerate(self.headers)}
+
+    def _rows(self) -> Iterable[int]:
+        return self.row_indices if self.row_indices is not None else range(self.num_rows)
+
+    def append_record(self, record: List[str]) -> None:
+        """
+        Parses one raw CSV record with the column converters and appends it column by
+        column. Short records are padded with None, like csv.DictReader's restval.
+        """
+        row = self.num_rows
+        byte, bit = row >> 3, 1 << (row & 7)
+        width = len(record)
+        converters = self.converters
+        for i, column in enumerate(self.columns):
+            if bit == 1:
+                column.valid.append(0)
+            value = converters[i](record[i]) if i < width else None
+            if value is None:
+                column.numbers.append(0.0)
+                if column.codes is not None:
+                    column.codes.append(0)
+                column.null_count += 1
+                continue
+            column.valid[byte] |= bit
+            if isinstance(value, float):
+                column.numbers.append(value)
+                if column.codes is not None:
+                    column.codes.append(0)
+            else:
+                code = self.string_codes.get(value)
+                if code is None:
+                    self.string_pool.append(value)
+                    code = len(self.string_pool)
+                    self.string_codes[value] = code
+                if column.codes is None:
+                    column.codes = array('I', bytes(4 * row))  # Backfill zeros for earlier rows
+                column.numbers.append(0.0)
+                column.codes.append(code)
+                column.string_count += 1
+        self.num_rows += 1
+
+    def value(self, col: int, row: int) -> Any:
+        """
+        Returns the parsed value of one cell (float, str or None).
+        """
+        column = self.columns[col]
+        if not (column.valid[row >> 3] >> (row & 7)) & 1:
+            return None
+        if column.codes is not None and column.codes[row]:
+            return self.string_pool[column.codes[row] - 1]
+        return column.numbers[row]
+
+    def select(self, row_indices: array) -> 'ColumnarTable':
+        """
+        Returns a view over the given rows that shares this table's column buffers.
+        """
+        view = ColumnarTable.__new__(ColumnarTable)
+        view.headers = self.headers
+        view.converters = self.converters
+        view.columns = self.columns
+        view.string_pool = self.string_pool
+        view.string_codes = self.string_codes
+        view.num_rows = self.num_rows
+        view.row_indices = row_indices
+        return view
+
+    def group_by(self, keys: List[str]) -> Dict[Tuple, 'ColumnarTable']:
+        """
+        Groups rows by the key columns (None for missing columns, as group_by does)
+        and returns one view per group in first-seen order.
+        """
+        key_cols = [self.headers.index(k) if k in self.headers else None for k in keys]
+        grouped = {}
+        for i in self._rows():
+            key = tuple(self.value(c, i) if c is not None else None for c in key_cols)
+            indices = grouped.get(key)
+            if indices is None:
+                indices = array('I')
+                grouped[key] = indices
+            indices.append(i)
+        return {key: self.select(indices) for key, indices in grouped.items()}
+
+    @instrumented("aggregate")
+    def column_stats(self, col: int, quantile_policy: Optional[QuantilePolicy] = None) -> Dict[str, Any]:
+        """
+        Same result as compute_stats on the column's values, computed from the typed
+        buffers: numeric cells are gathered into one array('d') and strings are counted
+        by integer code, so no per-cell Python objects are created.
+        """
+        column = self.columns[col]
+        numbers, codes, valid = column.numbers, column.codes, column.valid
+
+        if self.row_indices is None and column.null_count == 0 and column.string_count == 0:
+            # Dense all-numeric column: the buffer itself is the list of values
+            numeric_values = numbers
+            code_counts = Counter()
+        else:
+            numeric_values = array('d')
+            code_counts = Counter()
+            for i in self._rows():
+                if not (valid[i >> 3] >> (i & 7)) & 1:
+                    continue
+                if codes is not None and codes[i]:
+                    code_counts[codes[i]] += 1
+                else:
+                    numeric_values.append(numbers[i])
+
+        n = len(numeric_values)
+        non_numeric_count = sum(code_counts.values())
+        stats = {'total_count': n + non_numeric_count}
+        if n:
+            mean = sum(numeric_values) / n
+            stats['numeric_count'] = n
+            stats['mean'] = mean
+            stats['min'] = min(numeric_values)
+            stats['max'] = max(numeric_values)
+            if n > 1:
+                # Same two-pass sample variance as compute_stats
+                variance = sum((x - mean) ** 2 for x in numeric_values) / (n - 1)
+                stats['stddev'] = math.sqrt(variance)
+            else:
+                stats['stddev'] = 0.0
+        else:
+            stats['numeric_count'] = 0
+            stats['mean'] = None
+            stats['min'] = None
+            stats['max'] = None
+            stats['stddev'] = None
+
+        if non_numeric_count:
+            code, count = code_counts.most_common(1)[0]
+            stats['non_numeric_count'] = non_numeric_count
+            stats['unique_non_numeric'] = len(code_counts)
+            stats['most_common_non_numeric'] = (self.string_pool[code - 1], count)
+        else:
+            stats['non_numeric_count'] = 0
+            stats['unique_non_numeric'] = 0
+            stats['most_common_non_numeric'] = None
+
+        if quantile_policy is not None:
+            stats.update(quantile_policy.summarize(numeric_values, self.headers[col]))
+        return stats
+
+# Load a CSV file straight into a ColumnarTable
+def load_csv_columnar(filepath: str, schema: Optional[Dict[str, str]] = None, use_mmap: bool = False, prefetch: bool = False) -> ColumnarTable:
+    """
+    Reads the file once with csv.reader (no per-row dicts) into typed column buffers.
+    With use_mmap the records are tokenized as bytes from a memory-mapped file instead,
+    so numeric cells are never decoded to str (not for compressed files, which cannot
+    be mapped).
+    """
+    use_mmap = use_mmap and compression_of(filepath) is None
+    if use_mmap:
+        headers, records = iter_mmap_records(filepath)
+    else:
+        headers, records = iter_csv_records(filepath, prefetch)
+    table = ColumnarTable(headers, schema, raw_bytes=use_mmap)
+    for record in records:
+        table.append_record(record)
+    return table
+
+# --- Optional NumPy Backend ---
+
+# Resolve the engine name to the numpy_backend module, or None for pure Python
+def get_numpy_backend(engine: str):
+    """
+    'python' always uses the pure-Python code. 'numpy' and 'auto' use numpy_backend
+    when NumPy can be imported and quietly fall back to pure Python otherwise.
+    """
+    if engine not in ('python', 'numpy', 'auto'):
+        raise ValueError(f"Unknown engine '{engine}'. Expected 'python', 'numpy' or 'auto'.")
+    if engine == 'python':
+        return None
+    try:
+        import numpy_backend
+    except ImportError:
+        return None
+    return numpy_backend
+
+# numpy_backend computes quantiles exactly, so it is skipped when a column is sketched
+def numpy_quantiles(quantile_policy: Optional[QuantilePolicy]) -> bool:
+    return quantile_policy is None or quantile_policy.numpy_compatible()
+
+# Build a ColumnarTable from DictReader-style rows (or return the table unchanged)
+def as_columnar_table(headers: List[str], rows: Union[ColumnarTable, List[Dict[str, Any]]]) -> ColumnarTable:
+    if isinstance(rows, ColumnarTable):
+        return rows
+    table = ColumnarTable(headers)
+    for row in rows:
+        table.append_record([row.get(h, None) for h in headers])
+    return table
+
+# --- Streaming Engine (single pass, online accumulators) ---
+
+class ColumnAccumulator:
+    """
+    Online equivalent of compute_stats for a single column.
+    Values are fed one at a time (already passed through try_parse_float), so memory
+    is O(distinct non-numeric values) instead of O(rows). The output has the same keys
+    and values as compute_stats, except that stddev is only equal to float rounding:
+    the mean is sum / count and comes out identical, but the variance comes from
+    Welford's update instead of compute_stats' second pass over the values, so stddev
+    can differ in the last bits (relative error around 1e-15, well within the 1e-9
+    tolerance the engines are compared with). Matching it exactly would mean keeping
+    every value, which is what this class avoids; no other option changes this.
+    With a sketch_policy, non-numeric values of the column may go into HyperLogLog /
+    Space-Saving sketches instead of the Counter ('auto' switches once the Counter
+    passes the policy's threshold), bounding memory for free-text columns.
+    With a quantile_policy, numeric values also go into a QuantileAccumulator (exact
+    values or a KLL sketch, see quantiles.py). Columns named by a nested_policy get a
+    NestedAccumulator, which HashAggregator feeds with the decoded cells and their
+    weights (nested_columns.py).
+    """
+    __slots__ = ('total_count', 'numeric_count', 'total', 'mean', 'm2', 'min', 'max', 'counter', 'policy', 'mode', 'hll', 'top_k', 'quantiles', 'nested')
+
+    def __init__(self, sketch_policy: Optional[SketchPolicy] = None, column: Optional[str] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None):
+        self.total_count = 0
+        self.numeric_count = 0
+        self.total = 0.0  # Running sum, used for the reported mean
+        self.mean = 0.0   # Welford running mean, used only for the m2 update
+        self.m2 = 0.0     # Sum of squared deviations from the running mean
+        self.min = None
+        self.max = None
+        self.counter = Counter()
+        self.policy = sketch_policy
+        self.mode = sketch_policy.mode_for(column) if sketch_policy else 'exact'
+        self.hll = None
+        self.top_k = None
+        if self.mode == 'sketch':
+            self.hll, self.top_k = sketch_policy.new_sketches()
+        self.quantiles = quantile_policy.new_accumulator(column) if quantile_policy else None
+        self.nested = NestedAccumulator() if nested_policy and nested_policy.applies_to(column) else None
+
+    def _switch_to_sketches(self) -> None:
+        self.hll, self.top_k = self.policy.sketch_counts(self.counter)
+        self.counter = Counter()
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            return
+        self.total_count += 1
+        if isinstance(value, (float, int)):
+            self.numeric_count += 1
+            self.total += value
+            delta = value - self.mean
+            self.mean += delta / self.numeric_count
+            self.m2 += delta * (value - self.mean)
+            # Same comparisons min()/max() make, so NaN handling matches compute_stats
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+            if self.quantiles is not None:
+                self.quantiles.add(value)
+        elif self.hll is not None:
+            self.hll.add(value)
+            self.top_k.add(value)
+        else:
+            self.counter[value] += 1
+            if self.mode == 'auto' and len(self.counter) > self.policy.threshold:
+                self._switch_to_sketches()
+
+    def merge(self, other: 'ColumnAccumulator') -> None:
+        """
+        Folds another accumulator into this one (Chan et al. parallel variance update).
+        """
+        if self.policy is None and other.policy is not None:
+            self.policy, self.mode = other.policy, other.mode # Fresh rollup/merge targets
+        if other.quantiles is not None:
+            if self.quantiles is None:
+                self.quantiles = QuantileAccumulator(other.quantiles.policy, other.quantiles.mode)
+            self.quantiles.merge(other.quantiles)
+        if other.nested is not None:
+            if self.nested is None:
+                self.nested = NestedAccumulator()
+            self.nested.merge(other.nested)
+        if other.numeric_count:
+            n_a, n_b = self.numeric_count, other.numeric_count
+            n = n_a + n_b
+            delta = other.mean - self.mean
+            self.mean += delta * n_b / n
+            self.m2 += other.m2 + delta * delta * n_a * n_b / n
+            self.numeric_count = n
+            self.total += other.total
+            if self.min is None or other.min < self.min:
+                self.min = other.min
+            if self.max is None or other.max > self.max:
+                self.max = other.max
+        self.total_count += other.total_count
+        if self.hll is None and other.hll is None:
+            self.counter.update(other.counter)
+            if self.mode == 'auto' and len(self.counter) > self.policy.threshold:
+                self._switch_to_sketches()
+            return
+        # At least one side is sketched: sketch the other side too, then merge sketches
+        if self.hll is None:
+            self._switch_to_sketches()
+        if other.hll is None:
+            other_hll, other_top_k = self.policy.sketch_counts(other.counter)
+        else:
+            other_hll, other_top_k = other.hll, other.top_k
+        self.hll.merge(other_hll)
+        self.top_k.merge(other_top_k)
+
+    def to_stats(self) -> Dict[str, Any]:
+        """
+        Returns a dict with the same keys, order and meaning as compute_stats.
+        """
+        stats = {'total_count': self.total_count}
+        n = self.numeric_count
+        if n:
+            stats['numeric_count'] = n
+            stats['mean'] = self.total / n
+            stats['min'] = self.min
+            stats['max'] = self.max
+            stats['stddev'] = math.sqrt(self.m2 / (n - 1)) if n > 1 else 0.0
+        else:
+            stats['numeric_count'] = 0
+            stats['mean'] = None
+            stats['min'] = None
+            stats['max'] = None
+            stats['stddev'] = None
+
+        non_numeric_count = self.total_count - n
+        if non_numeric_count and self.hll is not None:
+            stats['non_numeric_count'] = non_numeric_count
+            stats['unique_non_numeric'] = self.hll.count()
+            stats['most_common_non_numeric'] = self.top_k.top(1)[0]
+            stats['non_numeric_approximate'] = True
+        elif non_numeric_count:
+            stats['non_numeric_count'] = non_numeric_count
+            stats['unique_non_numeric'] = len(self.counter)
+            stats['most_common_non_numeric'] = self.counter.most_common(1)[0]
+        else:
+            stats['non_numeric_count'] = 0
+            stats['unique_non_numeric'] = 0
+            stats['most_common_non_numeric'] = None
+
+        if self.quantiles is not None:
+            stats.update(self.quantiles.stats())
+        if self.nested is not None:
+            stats['nested'] = self.nested.stats()
+        return stats
+
+# Read raw CSV records one at a time without building per-row dicts
+def iter_csv_records(filepath: str, prefetch: bool = False) -> Tuple[List[str], Iterator[List[str]]]:
+    """
+    Opens a CSV file and returns its headers plus a lazy iterator over the data records.
+    Blank lines are skipped, as csv.DictReader does, so row counts agree with load_csv.
+    With prefetch (and always for .gz / .zst files) a background thread reads and
+    decompresses the file ahead of the parser (prefetch_reader.py).
+    """
+    csvfile = open_csv_text(filepath, prefetch)
+    reader = csv.reader(csvfile)
+    headers = next(reader, [])
+
+    def records() -> Iterator[List[str]]:
+        with csvfile:
+            for record in reader:
+                if record:
+                    yield record
+    return headers, records()
+
+# Feed one raw CSV record into a list of per-column accumulators
+def update_accumulators(accumulators: List[ColumnAccumulator], record: List[str]) -> None:
+    """
+    Parses each field with try_parse_float and adds it to the matching accumulator.
+    Short records are padded with None, like csv.DictReader's restval.
+    """
+    width = len(record)
+    for i, acc in enumerate(accumulators):
+        acc.add(try_parse_float(record[i]) if i < width else None)
+
+# Analyze all columns of a CSV file in a single streaming pass
+def analyze_csv_streaming(filepath: str, sketch_policy: Optional[SketchPolicy] = None, quantile_policy: Optional[QuantilePolicy] = None) -> Tuple[List[str], int, Dict[str, Dict[str, Any]]]:
+    """
+    Streaming counterpart of load_csv + analyze_dataset.
+    Reads each record once and keeps only one ColumnAccumulator per column, so memory
+    no longer grows with the number of rows. Returns (headers, row_count, summary),
+    where summary has the same shape and values as analyze_dataset's output, with
+    stddev equal to float rounding only (see ColumnAccumulator).
+    """
+    headers, records = iter_csv_records(filepath)
+    accumulators = [ColumnAccumulator(sketch_policy, h, quantile_policy) for h in headers]
+    row_count = 0
+    for record in records:
+        update_accumulators(accumulators, record)
+        row_count += 1
+
+    # analyze_dataset returns an empty summary when there are no rows
+    if row_count == 0:
+        return headers, 0, {}
+    summary = {}
+    for col, acc in zip(headers, accumulators):
+        summary[col] = acc.to_stats()
+    return headers, row_count, summary
+
+# --- Hash-Aggregate Group-By (overall + several groupings in one scan) ---
+
+class HashAggregator:
+    """
+    Keeps the overall accumulators plus one hash table of per-group accumulators for
+    each requested grouping, all fed from a single pass over the records.
+    Each field is parsed exactly once per record (try_parse_float, or the schema's
+    typed converters) and the parsed key values are reused for grouping, matching
+    group_by's keys.
+
+    With rollup=True, a grouping whose keys are a subset of another requested grouping
+    (e.g. [page_id] vs [page_id, ad_id]) is not maintained during the scan; it is built
+    afterwards by merging the finer groups, which saves one table update per record.
+    Rolled-up groups can break most_common ties differently from analyze_groups (merged
+    Counters lose first-seen order) and stddev may differ in the last bits.
+
+    With a nested_policy, each nested JSON cell is decoded once per record and its
+    weighted per-key totals are added to the overall and every group's stats.
+    """
+
+    def __init__(self, headers: List[str], grouping_sets: List[List[str]], rollup: bool = False, sketch_policy: Optional[SketchPolicy] = None, schema: Optional[Dict[str, str]] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None):
+        self.headers = list(headers)
+        self.converters = column_converters(self.headers, schema)
+        self.grouping_sets = [tuple(keys) for keys in grouping_sets]
+        self.sketch_policy = sketch_policy
+        self.quantile_policy = quantile_policy
+        self.nested_policy = nested_policy
+        self.nested_indices = [i for i, h in enumerate(self.headers) if nested_policy and nested_policy.applies_to(h)]
+        self.weight_index = self.headers.index(nested_policy.weight_column) if nested_policy and nested_policy.weight_column in self.headers else None
+        self.row_count = 0
+        self.overall = self.new_accumulators()
+
+        # Map each grouping to the finer grouping it can be rolled up from (if any)
+        self.rollup_from = {}
+        if rollup:
+            for keys in self.grouping_sets:
+                for finer in self.grouping_sets:
+                    if len(finer) > len(keys) and set(keys) <= set(finer):
+                        self.rollup_from[keys] = finer
+                        break
+
+        # Only groupings that cannot be rolled up get a table during the scan
+        self.tables = {}
+        self.key_indices = {}
+        for keys in self.grouping_sets:
+            if keys in self.rollup_from or keys in self.tables:
+                continue
+            self.tables[keys] = {}
+            # Missing key columns group under None, as group_by does
+            self.key_indices[keys] = [self.headers.index(k) if k in self.headers else None for k in keys]
+
+    def new_accumulators(self) -> List[ColumnAccumulator]:
+        return [ColumnAccumulator(self.sketch_policy, h, self.quantile_policy, self.nested_policy) for h in self.headers]
+
+    def add_record(self, record: List[str]) -> None:
+        """
+        Parses one raw CSV record and updates the overall and per-group accumulators.
+        """
+        self.add_values(self.parse_record(record))
+
+    def parse_record(self, record: List[str]) -> List[Any]:
+        """
+        Parses the fields of one raw CSV record with the column converters (None for
+        missing fields).
+        """
+        width = len(record)
+        converters = self.converters
+        return [converters[i](record[i]) if i < width else None for i in range(len(self.headers))]
+
+    def add_values(self, values: List[Any]) -> None:
+        """
+        Updates the overall and per-group accumulators with one parsed record.
+        """
+        self.row_count += 1
+        for acc, value in zip(self.overall, values):
+            acc.add(value)
+        touched = [self.overall] if self.nested_indices else None
+        for keys, table in self.tables.items():
+            key = tuple(values[i] if i is not None else None for i in self.key_indices[keys])
+            accumulators = table.get(key)
+            if accumulators is None:
+                accumulators = self.new_accumulators()
+                table[key] = accumulators
+            for acc, value in zip(accumulators, values):
+                acc.add(value)
+            if touched is not None:
+                touched.append(accumulators)
+        if touched is not None:
+            self.add_nested(values, touched)
+
+    def add_nested(self, values: List[Any], touched: List[List[ColumnAccumulator]]) -> None:
+        """
+        Decodes the record's nested cells once and adds them to every accumulator list
+        the record went into.
+        """
+        weight = nested_weight(values[self.weight_index]) if self.weight_index is not None else None
+        for i in self.nested_indices:
+            value = values[i]
+            if not isinstance(value, str):
+                continue
+            pairs = decode_nested(value)
+            if pairs:
+                for accumulators in touched:
+                    accumulators[i].nested.add(pairs, weight)
+
+    def merge(self, other: 'HashAggregator') -> None:
+        """
+        Folds the state of another aggregator built with the same headers and groupings.
+        """
+        self.row_count += other.row_count
+        for acc, other_acc in zip(self.overall, other.overall):
+            acc.merge(other_acc)
+        for keys, table in self.tables.items():
+            for key, other_accumulators in other.tables[keys].items():
+                accumulators = table.get(key)
+                if accumulators is None:
+                    table[key] = other_accumulators
+                else:
+                    for acc, other_acc in zip(accumulators, other_accumulators):
+                        acc.merge(other_acc)
+
+    def group_table(self, keys: List[str]) -> Dict[Tuple, List[ColumnAccumulator]]:
+        """
+        Returns the accumulator table for a grouping, rolling it up from a finer one if needed.
+        """
+        keys = tuple(keys)
+        if keys in self.tables:
+            return self.tables[keys]
+        return rollup_groups(self.group_table(self.rollup_from[keys]), self.rollup_from[keys], keys)
+
+    def overall_summary(self) -> Dict[str, Dict[str, Any]]:
+        if self.row_count == 0:
+            return {}
+        return {col: acc.to_stats() for col, acc in zip(self.headers, self.overall)}
+
+    def group_summaries(self, keys: List[str]) -> Dict[Tuple, Dict[str, Dict[str, Any]]]:
+        """
+        Returns {group_key: summary} with the same shape as analyze_groups' output.
+        """
+        group_summaries = {}
+        for key, accumulators in self.group_table(keys).items():
+            group_summaries[key] = {col: acc.to_stats() for col, acc in zip(self.headers, accumulators)}
+        return group_summaries
+
+# Roll a finer grouping up into a coarser one without rescanning
+def rollup_groups(table: Dict[Tuple, List[ColumnAccumulator]], fine_keys: Tuple, coarse_keys: Tuple) -> Dict[Tuple, List[ColumnAccumulator]]:
+    """
+    Merges the accumulators of every fine group into its coarse group.
+    Fine groups are visited in first-seen order, so coarse groups keep first-seen order too.
+    """
+    positions = [fine_keys.index(k) for k in coarse_keys]
+    rolled = {}
+    for fine_key, accumulators in table.items():
+        key = tuple(fine_key[p] for p in positions)
+        merged = rolled.get(key)
+        if merged is None:
+            merged = [ColumnAccumulator() for _ in accumulators]
+            rolled[key] = merged
+        for acc, fine_acc in zip(merged, accumulators):
+            acc.merge(fine_acc)
+    return rolled
+
+# Read only the header line of a CSV file
+def read_csv_headers(filepath: str) -> List[str]:
+    with open_csv_text(filepath) as csvfile:
+        return next(csv.reader(csvfile), [])
+
+# Keep only the named columns of each raw record, so the rest are never parsed
+def project_records(headers: List[str], records: Iterator[List[str]], columns: List[str]) -> Tuple[List[str], Iterator[List[str]]]:
+    """
+    Returns the projected headers (in file order; names not in the file are skipped)
+    and records. Short records are padded with None, as parse_record does.
+    """
+    indices = [i for i, h in enumerate(headers) if h in columns]
+    width = indices[-1] + 1 if indices else 0
+
+    def projected() -> Iterator[List[str]]:
+        for record in records:
+            if len(record) >= width:
+                yield [record[i] for i in indices]
+            else:
+                yield [record[i] if i < len(record) else None for i in indices]
+    return [headers[i] for i in indices], projected()
+
+# Predicate over raw records that parses only the filtered columns
+def record_filter(headers: List[str], schema: Optional[Dict[str, str]], row_filters: List[RowFilter]):
+    """
+    A record is kept if every filter matches its column's parsed value (the same
+    converters as HashAggregator, so filters see the values that are aggregated).
+    """
+    converters = column_converters(headers, schema)
+    checks = []
+    for row_filter in row_filters:
+        if row_filter.column not in headers:
+            raise ValueError(f"Filter column '{row_filter.column}' not found in the CSV headers.")
+        i = headers.index(row_filter.column)
+        checks.append((i, converters[i], row_filter))
+
+    def keep(record: List[str]) -> bool:
+        width = len(record)
+        for i, convert, row_filter in checks:
+            if not row_filter.matches(convert(record[i]) if i < width else None):
+                return False
+        return True
+    return keep
+
+STREAM_BATCH_ROWS = 10_000
+
+# Overall + grouped analysis of a CSV file in one scan
+def analyze_csv_grouped(filepath: str, grouping_sets: List[List[str]], rollup: bool = False, sketch_policy: Optional[SketchPolicy] = None, schema: Optional[Dict[str, str]] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None, sort_group_policy: Optional[SortGroupPolicy] = None, columns: Optional[List[str]] = None, row_filters: Optional[List[RowFilter]] = None, prefetch: bool = False, key_converters: Optional[Dict[str, Any]] = None) -> Tuple[List[str], int, Dict[str, Dict[str, Any]], Dict[Tuple, Dict]]:
+    """
+    Replaces load_csv + analyze_dataset + one analyze_groups call per grouping.
+    Returns (headers, row_count, overall_summary, {tuple(keys): group_summaries}).
+    Groupings selected by sort_group_policy are collected for an external sort instead
+    of a hash table (external_groupby.py); their group_summaries is a SortedGroups,
+    whose items() computes the groups in key order and which must be closed afterwards.
+    With columns, only those columns are parsed and summarised (projection pushdown;
+    the returned headers are the projected ones). Rows failing any of row_filters are
+    dropped after parsing only the filtered columns, and are not counted.
+    prefetch overlaps reading / decompressing the file with parsing and aggregation.
+    key_converters replaces the converters of some columns ({column: function of the
+    raw field}), e.g. to keep join keys as text (comparative_stats.join_key).
+    """
+    headers, records = iter_csv_records(filepath, prefetch)
+    if columns is not None:
+        headers, records = project_records(headers, records, columns)
+    keep = record_filter(headers, schema, row_filters) if row_filters else None
+    sorted_sets = [keys for keys in grouping_sets if sort_group_policy is not None and sort_group_policy.applies_to(keys)]
+    aggregator = HashAggregator(headers, [keys for keys in grouping_sets if keys not in sorted_sets], rollup=rollup, sketch_policy=sketch_policy, schema=schema, quantile_policy=quantile_policy, nested_policy=nested_policy)
+    for column, converter in (key_converters or {}).items():
+        aggregator.converters[headers.index(column)] = converter
+    sorters = [ExternalSorter(headers, keys, sort_group_policy) for keys in sorted_sets]
+    # Records are handled in batches so reading, parsing and aggregating can be timed
+    # separately (instrumentation.py) at a negligible per-batch cost
+    while True:
+        with stage("read"):
+            batch = list(islice(records, STREAM_BATCH_ROWS))
+        if not batch:
+            break
+        if keep is not None:
+            with stage("filter", len(batch)):
+                batch = [record for record in batch if keep(record)]
+        with stage("parse", len(batch)):
+            parsed = [aggregator.parse_record(record) for record in batch]
+        with stage("aggregate", len(batch)):
+            for values in parsed:
+                aggregator.add_values(values)
+            for sorter in sorters:
+                for values in parsed:
+                    sorter.add(values)
+    with stage("finalize"):
+        new_aggregator = partial(HashAggregator, headers, [], sketch_policy=sketch_policy, quantile_policy=quantile_policy, nested_policy=nested_policy)
+        grouped = {tuple(keys): aggregator.group_summaries(keys) for keys in grouping_sets if keys not in sorted_sets}
+        grouped.update({sorter.keys: SortedGroups(sorter, new_aggregator) for sorter in sorters})
+        grouped = {tuple(keys): grouped[tuple(keys)] for keys in grouping_sets}
+        overall = aggregator.overall_summary()
+    return headers, aggregator.row_count, overall, grouped
+
 # Convert tuple keys to strings for JSON output (useful if saving results)
 def stringify_keys(d: Dict[Tuple, Any]) -> Dict[str, Any]:
     return {str(k): v for k, v in d.items()}
 
-# ======= Main Execution Logic =======
+# Group summaries for the JSON summary: the full dict, or where the groups were written
+# (a SortedGroups to its JSON Lines file, or any grouping to the sink if there is one)
+def group_results(grouped_by: Union[Dict[Tuple, Any], SortedGroups], file_path: str, sort_group_policy: Optional[SortGroupPolicy], sink: Optional[GroupSink] = None, grouping: str = '') -> Dict[str, Any]:
+    if sink is not None:
+        with stage("write_groups"):
+            result = sink.write_groups(grouping, grouped_by.items(), presorted=isinstance(grouped_by, SortedGroups))
+        if isinstance(grouped_by, SortedGroups):
+            grouped_by.close()
+        return result
+    if not isinstance(grouped_by, SortedGroups):
+        return stringify_keys(grouped_by)
+    with stage("write_groups"):
+        path = sort_group_policy.output_path(file_path, grouped_by.keys)
+        group_count = grouped_by.write_jsonl(path)
+    grouped_by.close()
+    print(f"Wrote {group_count} groups to {path}")
+    return {'groups_file': path, 'group_count': group_count}
 
-if __name__ == "__main__":
-    # Define your datasets and base directory
-    datasets_to_analyze = [
-        "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_ads_president_scored_anon.csv",
-        "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_posts_president_scored_anon.csv",
-        "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_tw_posts_president_scored_anon.csv"
-    ]
+# --- Job Specs (job_spec.py, stats_cli.py) ---
 
-    # Base directory for your files (Adjust this to your actual path)
-    # Based on your path /Users/namrathaaddala/Downloads/period_03/...
-    base_directory = "/Users/namrathaaddala/Downloads/period_03/"
+# Overall and grouped stats of one job spec dataset, reading only the columns it references
+def analyze_job_dataset(dataset: DatasetSpec, schema: Union[str, Dict[str, str], None] = "infer") -> Dict[str, Any]:
+    schema = resolve_schema(dataset.path, schema)
+    quantile_policy = QuantilePolicy() if 'quantiles' in dataset.stats else None
+    columns = dataset.referenced_columns(read_csv_headers(dataset.path)) if dataset.columns is not None else None
+    # Group keys are grouped by their text, as in comparison_index
+    key_converters = {column: join_key for column in dataset.key_columns()}
+    headers, row_count, overall, grouped = analyze_csv_grouped(dataset.path, dataset.group_by, schema=schema, quantile_policy=quantile_policy, columns=columns, row_filters=dataset.filters, key_converters=key_converters)
+    print(f"{dataset.name}: {row_count} rows after filters, {len(headers)} columns read")
+    results = {'file_path': dataset.path, 'row_count': row_count, 'overall_stats': dataset.select_stats(overall, headers)}
+    for keys, groups in grouped.items():
+        results[grouping_name(keys)] = {group_key_text(key): dataset.select_stats(summary, headers) for key, summary in groups.items()}
+    return results
 
-    # Dictionary to store all results for potential JSON export
-    all_analysis_results = {}
+# Per-key summaries of one dataset of a comparison: (row_count, {join key: (rows, {column: stats})})
+def comparison_index(dataset: DatasetSpec, key: str, schema: Union[str, Dict[str, str], None] = "infer") -> Tuple[int, Dict[str, Tuple[int, Dict[str, Any]]]]:
+    """
+    The key column is kept as text (join_key) rather than parsed as a number, so long
+    ids stay exact; rows with no key are counted but left out of the index.
+    """
+    schema = resolve_schema(dataset.path, schema)
+    quantile_policy = QuantilePolicy() if 'quantiles' in dataset.stats else None
+    headers = read_csv_headers(dataset.path)
+    if key not in headers:
+        raise ValueError(f"Comparison key '{key}' is not a column of {dataset.path}.")
+    columns = None
+    if dataset.columns is not None:
+        needed = set(dataset.referenced_columns(headers)) | {key}
+        columns = [h for h in headers if h in needed]
+    headers, row_count, _, grouped = analyze_csv_grouped(dataset.path, [[key]], schema=schema, quantile_policy=quantile_policy, columns=columns, row_filters=dataset.filters, key_converters={key: join_key})
+    index = {}
+    for (value,), summary in grouped[(key,)].items():
+        if value is not None:
+            index[value] = (summary[key]['total_count'], dataset.select_stats(summary, headers))
+    return row_count, index
 
-    for dataset_file_name in datasets_to_analyze:
-        file_path = os.path.join(base_directory, dataset_file_name)
+# Per-key stats of a job spec comparison side by side, hash joined on the group summaries
+def analyze_comparison(comparison: Comparison, datasets: Dict[str, DatasetSpec], schema: Union[str, Dict[str, str], None] = "infer") -> Dict[str, Any]:
+    indexes, infos = {}, {}
+    for name, key in comparison.keys.items():
+        dataset = datasets[name]
+        row_count, indexes[name] = comparison_index(dataset, key, schema)
+        infos[name] = {'file_path': dataset.path, 'key': key, 'row_count': row_count, 'key_count': len(indexes[name])}
+    with stage("join"):
+        results = comparison_results(comparison, infos, hash_join(indexes, comparison.how))
+    print(describe_comparison(comparison.name, results))
+    return results
 
-        print(f"\n\n--- Processing Dataset: {dataset_file_name} ---")
-        print(f"Full path: {file_path}")
+# --- Per-Dataset Driver ---
 
-        if not os.path.exists(file_path):
-            print(f"Error: File not found at '{file_path}'. Skipping to next dataset.")
-            continue # Skip to the next file if this one doesn't exist
+NESTED_REPORT_KEYS = 5 # Nested keys printed per column (all are kept in the JSON summary)
 
-        try:
-            headers, rows = load_csv(file_path)
-            print(f"Loaded {len(rows)} rows with {len(headers)} columns.")
+# Print one column's stats in the console report
+def print_stats(stats: Dict[str, Any], indent: str) -> None:
+    for stat_name, stat_value in stats.items():
+        if isinstance(stat_value, float):
+            print(f"{indent}{stat_name}: {stat_value:.4f}")
+        elif stat_name == 'quantiles' and stat_value:
+            print(f"{indent}{stat_name}: " + ", ".join(f"{label}={value:.4f}" for label, value in stat_value.items()))
+        elif stat_name == 'nested':
+            # Largest weighted shares first (most frequent keys when there are no weights)
+            keys = sorted(stat_value['keys'].items(), key=lambda item: (item[1]['weighted_share'] is not None, item[1]['weighted_share'] or 0.0, item[1]['count']), reverse=True)
+            print(f"{indent}{stat_name}: {stat_value['rows']} rows, {len(keys)} keys")
+            for key, key_stats in keys[:NESTED_REPORT_KEYS]:
+                share = key_stats['weighted_share']
+                print(f"{indent}  {key}: count={key_stats['count']}, mean={key_stats['mean']:.4f}, weighted_share={'-' if share is None else f'{share:.4f}'}")
+        else:
+            print(f"{indent}{stat_name}: {stat_value}")
 
-            current_dataset_results = {}
+# Run the overall and grouped analyses for one CSV file and print them
+def process_dataset(file_path: str, dataset_file_name: Optional[str] = None, streaming_mode: bool = True, stats_engine: str = "auto", parallel_workers: int = 1, sketch_policy: Optional[SketchPolicy] = None, use_cache: bool = False, incremental_state_dir: Optional[str] = None, instrumentation: Optional[Instrumentation] = None, schema: Union[str, Dict[str, str], None] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None, use_mmap: bool = False, sort_group_policy: Optional[SortGroupPolicy] = None, result_sink: Optional[ResultSinkPolicy] = None, prefetch: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Analyzes one dataset and prints its report to the console.
+    Returns the results dict stored in all_datasets_summary.json, or None if the file
+    is missing or could not be analyzed. Module-level so dataset_scheduler can run it
+    in a worker process.
+    With incremental_state_dir (streaming mode only), accumulator state is saved there
+    and later runs only parse rows appended to the file since (incremental_stats.py);
+    it takes precedence over parallel_workers and sort_group_policy.
+    With instrumentation, per-stage timings are printed and stored under 'stage_timings'.
+    schema is None, 'infer' or a {column: type} dict (schema_inference.py); it only
+    changes how cells are parsed, not the results.
+    With a quantile_policy, numeric columns also get 'quantiles' (quantiles.py), and
+    with a nested_policy, JSON-string columns get 'nested' (nested_columns.py).
+    use_mmap (non-streaming mode) loads the rows with the memory-mapped reader.
+    sort_group_policy (single-process streaming scan only) computes the groupings it
+    selects by external sort; their groups are written to JSON Lines files and the
+    JSON summary only records the file and group count (external_groupby.py).
+    With a result_sink, all group summaries are streamed to one NDJSON / Parquet file
+    per dataset with a seek index, and the JSON summary only points to it
+    (result_sink.py).
+    prefetch reads the CSV ahead in a background thread (prefetch_reader.py). .gz and
+    .zst files are always read that way; they are scanned by a single process, as the
+    parallel and incremental scans need byte offsets into the uncompressed file.
+    """
+    dataset_file_name = dataset_file_name or file_path
+    print(f"\n\n--- Processing Dataset: {dataset_file_name} ---")
+    print(f"Full path: {file_path}")
 
-            # --- Overall analysis ---
-            print("\n=== Overall Stats ===")
-            overall_stats = analyze_dataset(headers, rows)
-            current_dataset_results['overall_stats'] = overall_stats
-            for col, stats in overall_stats.items():
-                print(f"--- Column: {col} ---")
-                for stat_name, stat_value in stats.items():
-                    if isinstance(stat_value, float):
-                        print(f"  {stat_name}: {stat_value:.4f}")
-                    else:
-                        print(f"  {stat_name}: {stat_value}")
+    if not os.path.exists(file_path):
+        print(f"Error: File not found at '{file_path}'. Skipping to next dataset.")
+        return None # Skip to the next file if this one doesn't exist
 
+    with recorder_for(instrumentation, dataset_file_name) as recorder:
+        try:
+            with stage("infer_schema"):
+                schema = resolve_schema(file_path, schema)
+            if streaming_mode:
+                headers = read_csv_headers(file_path)
+            else:
+                with stage("load") as record:
+                    if use_cache:
+                        import dataset_cache
+                        rows = dataset_cache.load_table(file_path, schema=schema)
+                        headers = rows.headers
+                    else:
+                        headers, rows = load_csv(file_path, columnar=True, schema=schema, use_mmap=use_mmap, prefetch=prefetch)
+                    record.add_rows(len(rows))
+                print(f"Loaded {len(rows)} rows with {len(headers)} columns.")
 
-            # --- Group by 'page_id' (if available) ---
+            # --- Work out the grouping columns from the header ---
             # Check for different possible naming conventions based on your previous code
             page_id_col = None
             if "page_id" in headers:
@@ -192,25 +1149,6 @@ if __name__ == "__main__":
             elif "Facebook_Id" in headers: # From your second snippet
                 page_id_col = "Facebook_Id"
 
-            if page_id_col:
-                print(f"\n\n=== Sample Grouped by '{page_id_col}' ===")
-                grouped_by_page = analyze_groups(headers, rows, [page_id_col])
-                current_dataset_results[f'grouped_by_{page_id_col}'] = stringify_keys(grouped_by_page) # Store full dict
-                # Only show first 2 groups for brevity in console
-                for key, summary in list(grouped_by_page.items())[:2]:
-                    print(f"\nGroup: {key}")
-                    for col, stats in summary.items():
-                        print(f"  --- Column: {col} ---")
-                        for stat_name, stat_value in stats.items():
-                            if isinstance(stat_value, float):
-                                print(f"    {stat_name}: {stat_value:.4f}")
-                            else:
-                                print(f"    {stat_name}: {stat_value}")
-            else:
-                print(f"\nSkipping 'Group by page_id' as neither 'page_id' nor 'Facebook_Id' column found.")
-
-
-            # --- Group by ['page_id', 'ad_id'] or ['Facebook_Id', 'post_id'] (if available) ---
             ad_id_col = None
             post_id_col = None
             if "ad_id" in headers:
@@ -226,28 +1164,205 @@ if __name__ == "__main__":
             elif post_id_col: # If ad_id not found, try post_id
                 group_keys_combined.append(post_id_col)
 
+            grouping_sets = []
+            if page_id_col:
+                grouping_sets.append([page_id_col])
             if len(group_keys_combined) >= 2: # Ensure we have at least two keys for combined grouping
-                print(f"\n\n=== Sample Grouped by {group_keys_combined} ===")
-                grouped_by_combined = analyze_groups(headers, rows, group_keys_combined)
-                current_dataset_results[f'grouped_by_{"_".join(group_keys_combined)}'] = stringify_keys(grouped_by_combined) # Store full dict
-                # Only show first 2 groups for brevity in console
-                for key, summary in list(grouped_by_combined.items())[:2]:
-                    print(f"\nGroup: {key}")
-                    for col, stats in summary.items():
-                        print(f"  --- Column: {col} ---")
-                        for stat_name, stat_value in stats.items():
-                            if isinstance(stat_value, float):
-                                print(f"    {stat_name}: {stat_value:.4f}")
-                            else:
-                                print(f"    {stat_name}: {stat_value}")
+                grouping_sets.append(group_keys_combined)
+
+            # --- Compute everything (one scan in streaming mode) ---
+            compressed = compression_of(file_path) is not None
+            if streaming_mode and incremental_state_dir and not compressed:
+                from incremental_stats import analyze_csv_incremental
+                if parallel_workers > 1 or sort_group_policy is not None:
+                    print("Warning: incremental_state_dir is set, so parallel_workers and sort_group_policy are not used for this scan.")
+                with stage("scan") as record:
+                    headers, row_count, overall_stats, grouped, reused_rows = analyze_csv_incremental(file_path, grouping_sets, incremental_state_dir, sketch_policy=sketch_policy, schema=schema, quantile_policy=quantile_policy, nested_policy=nested_policy)
+                    record.add_rows(row_count - reused_rows)
+                print(f"Streamed {row_count - reused_rows} new rows ({reused_rows} rows from saved state) with {len(headers)} columns.")
+            elif streaming_mode and parallel_workers > 1 and not compressed:
+                from parallel_stats import analyze_csv_parallel
+                with stage("scan") as record:
+                    headers, row_count, overall_stats, grouped = analyze_csv_parallel(file_path, grouping_sets, max_workers=parallel_workers, sketch_policy=sketch_policy, schema=schema, quantile_policy=quantile_policy, nested_policy=nested_policy)
+                    record.add_rows(row_count)
+                print(f"Streamed {row_count} rows with {len(headers)} columns using {parallel_workers} workers.")
+            elif streaming_mode:
+                headers, row_count, overall_stats, grouped = analyze_csv_grouped(file_path, grouping_sets, sketch_policy=sketch_policy, schema=schema, quantile_policy=quantile_policy, nested_policy=nested_policy, sort_group_policy=sort_group_policy, prefetch=prefetch)
+                print(f"Streamed {row_count} rows with {len(headers)} columns.")
             else:
-                print(f"\nSkipping 'Group by combined keys' as required columns not found (need at least two: {page_id_col} and ad_id/post_id).")
+                with stage("analyze_overall", len(rows)):
+                    overall_stats = analyze_dataset(headers, rows, engine=stats_engine, sketch_policy=sketch_policy, quantile_policy=quantile_policy, nested_policy=nested_policy)
+                with stage("analyze_groups", len(rows) * len(grouping_sets)):
+                    grouped = {tuple(keys): analyze_groups(headers, rows, keys, engine=stats_engine, sketch_policy=sketch_policy, quantile_policy=quantile_policy, nested_policy=nested_policy) for keys in grouping_sets}
 
-            # Store results for this dataset
-            all_analysis_results[dataset_file_name] = current_dataset_results
+            current_dataset_results = {}
+
+            # --- Console report (and the results stored in the JSON summary) ---
+            with stage("report"):
+                sink = result_sink.open(file_path) if result_sink is not None else None
+
+                # The sink is closed (last block and index written) even if the report fails
+                try:
+                    # --- Overall analysis ---
+                    print("\n=== Overall Stats ===")
+                    current_dataset_results['overall_stats'] = overall_stats
+                    for col, stats in overall_stats.items():
+                        print(f"--- Column: {col} ---")
+                        print_stats(stats, "  ")
+
+
+                    # --- Group by 'page_id' (if available) ---
+                    if page_id_col:
+                        print(f"\n\n=== Sample Grouped by '{page_id_col}' ===")
+                        grouped_by_page = grouped[(page_id_col,)]
+                        # Only show first 2 groups for brevity in console
+                        for key, summary in islice(grouped_by_page.items(), 2):
+                            print(f"\nGroup: {key}")
+                            for col, stats in summary.items():
+                                print(f"  --- Column: {col} ---")
+                                print_stats(stats, "    ")
+                        current_dataset_results[f'grouped_by_{page_id_col}'] = group_results(grouped_by_page, file_path, sort_group_policy, sink, page_id_col) # Full dict, or the file it was written to
+                    else:
+                        print(f"\nSkipping 'Group by page_id' as neither 'page_id' nor 'Facebook_Id' column found.")
+
+
+                    # --- Group by ['page_id', 'ad_id'] or ['Facebook_Id', 'post_id'] (if available) ---
+                    if len(group_keys_combined) >= 2:
+                        print(f"\n\n=== Sample Grouped by {group_keys_combined} ===")
+                        grouped_by_combined = grouped[tuple(group_keys_combined)]
+                        # Only show first 2 groups for brevity in console
+                        for key, summary in islice(grouped_by_combined.items(), 2):
+                            print(f"\nGroup: {key}")
+                            for col, stats in summary.items():
+                                print(f"  --- Column: {col} ---")
+                                print_stats(stats, "    ")
+                        current_dataset_results[f'grouped_by_{"_".join(group_keys_combined)}'] = group_results(grouped_by_combined, file_path, sort_group_policy, sink, "_".join(group_keys_combined)) # Full dict, or the file it was written to
+                    else:
+                        print(f"\nSkipping 'Group by combined keys' as required columns not found (need at least two: {page_id_col} and ad_id/post_id).")
+                finally:
+                    if sink is not None:
+                        sink.close()
+                if sink is not None:
+                    print(f"Group summaries written to {sink.path} (index: {sink.index_path})")
 
         except Exception as e:
             print(f"An unexpected error occurred while processing {dataset_file_name}: {e}")
+            return None
+
+    if instrumentation is not None:
+        recorder.print_summary()
+        current_dataset_results['stage_timings'] = recorder.summary()
+    return current_dataset_results
+
+# ======= Main Execution Logic =======
+
+if __name__ == "__main__":
+    from dataset_scheduler import run_dataset_jobs
+
+    # Define your datasets and base directory
+    datasets_to_analyze = [
+        "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_ads_president_scored_anon.csv",
+        "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_posts_president_scored_anon.csv",
+        "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_tw_posts_president_scored_anon.csv"
+    ]
+
+    # Base directory for your files (Adjust this to your actual path)
+    # Based on your path /Users/namrathaaddala/Downloads/period_03/...
+    base_directory = "/Users/namrathaaddala/Downloads/period_03/"
+
+    # Set to True to run the overall and grouped analyses in a single streaming pass
+    # (HashAggregator). Set to False to load every row and use analyze_groups instead.
+    streaming_mode = True
+
+    # Engine for the non-streaming path: 'python', 'numpy' or 'auto' (NumPy when installed)
+    stats_engine = "auto"
+
+    # Worker processes for streaming mode; > 1 splits each file into chunks (parallel_stats.py)
+    parallel_workers = 1
+
+    # Opt-in approximate counting for high-cardinality text columns (sketches.py), e.g.
+    # SketchPolicy(threshold=100_000) switches a column to HyperLogLog / Space-Saving
+    # once it has more than 100k distinct values. None keeps every count exact.
+    sketch_policy = None
+
+    # Non-streaming mode only: reuse the parsed ColumnarTable from earlier runs
+    # (memory-mapped from .stats_cache next to the CSV, see dataset_cache.py)
+    use_cache = True
+
+    # Non-streaming mode only: tokenize CSVs from a memory-mapped file instead of csv.reader
+    # (mmap_reader.py); numeric cells are parsed from bytes without building a str each.
+    # Faster on mostly numeric files, slower when most rows have quoted JSON fields.
+    use_mmap = False
+
+    # Streaming mode only: keep pickled accumulator state in base_directory and only
+    # parse rows appended since the last run (incremental_stats.py). The saved prefix
+    # is still read and hashed each run, so this saves parsing, not I/O. Falls back to a
+    # full scan when the file was changed in any other way; parallel_workers and
+    # sort_group_policy are not used while it is on.
+    incremental = False
+    incremental_state_dir = os.path.join(base_directory, ".incremental_state") if incremental else None
+
+    # Per-stage wall/CPU time and rows (load, read, parse, group_by, aggregate, report),
+    # printed per dataset and stored under 'stage_timings' in the JSON summary (see
+    # instrumentation.py). trace_memory=True adds tracemalloc peaks (slow); profile_dir /
+    # trace_dir write a cProfile dump / Chrome trace per dataset. None turns it off.
+    instrumentation = Instrumentation(trace_memory=False, profile_dir=None, trace_dir=None)
+
+    # Column types for parsing (schema_inference.py): "infer" samples the first rows of
+    # each file once (cached in .stats_cache), a {column: type} dict sets them by hand,
+    # None parses every cell with try_parse_float. Results are the same either way.
+    schema = "infer"
+
+    # Opt-in p25/p50/p75/p95/p99 of every numeric column, overall and per group
+    # (quantiles.py), e.g. QuantilePolicy(threshold=10_000) keeps values exactly up to
+    # 10k per column and group, then summarizes them in a mergeable KLL sketch (about
+    # 1% rank error). None leaves quantiles out.
+    quantile_policy = None
+
+    # Opt-in unpacking of the JSON-string columns delivery_by_region /
+    # demographic_distribution into per-region / per-demographic stats weighted by
+    # impressions (nested_columns.py), e.g. NestedPolicy(columns=("delivery_by_region",
+    # "demographic_distribution"), weight_column="impressions"). None treats them as
+    # plain text only.
+    nested_policy = None
+
+    # Streaming mode only (not with incremental or parallel_workers > 1): compute these
+    # groupings by external sort instead of one hash table entry per group, spilling
+    # sorted runs to disk above memory_budget_mb; their groups are written to a JSON
+    # Lines file next to each CSV (external_groupby.py). None keeps the hash group-by.
+    sort_group_policy = None # e.g. SortGroupPolicy(groupings=[["page_id", "ad_id"]], memory_budget_mb=512)
+
+    # Stream every group summary to <dataset>_groups.ndjson.gz next to each CSV, in gzip
+    # blocks with a .index.json to look groups up (result_sink.read_group), instead of
+    # keeping them all for all_datasets_summary.json, which then only points to the files.
+    # format="parquet" and compression="zstd" / None are also available; None turns it off.
+    result_sink = ResultSinkPolicy(output_dir=None, format="ndjson", compression="gzip", block_groups=1000)
+
+    # Read each CSV ahead in a background thread while it is parsed, in blocks through a
+    # bounded queue (prefetch_reader.py). .csv.gz / .csv.zst datasets are always read
+    # (and decompressed) this way.
+    prefetch = True
+
+    # Datasets analyzed at the same time (dataset_scheduler.py), capped by a memory budget.
+    # Estimated memory per dataset is file size x memory factor (low in streaming mode).
+    dataset_workers = 3
+    memory_budget_mb = 8192
+    memory_factor = 1.0 if streaming_mode else 4.0
+
+    # Dictionary to store all results for potential JSON export
+    all_analysis_results = {}
+
+    jobs = []
+    for dataset_file_name in datasets_to_analyze:
+        file_path = os.path.join(base_directory, dataset_file_name)
+        analyze = partial(process_dataset, dataset_file_name=dataset_file_name, streaming_mode=streaming_mode, stats_engine=stats_engine, parallel_workers=parallel_workers, sketch_policy=sketch_policy, use_cache=use_cache, incremental_state_dir=incremental_state_dir, instrumentation=instrumentation, schema=schema, quantile_policy=quantile_policy, nested_policy=nested_policy, use_mmap=use_mmap, sort_group_policy=sort_group_policy, result_sink=result_sink, prefetch=prefetch)
+        jobs.append((analyze, file_path))
+
+    results = run_dataset_jobs(jobs, max_workers=dataset_workers, memory_budget_mb=memory_budget_mb, memory_factor=memory_factor)
+    for dataset_file_name, current_dataset_results in zip(datasets_to_analyze, results):
+        # Store results for this dataset
+        if current_dataset_results is not None:
+            all_analysis_results[dataset_file_name] = current_dataset_results
 
     # --- Optional: Save all results to a single JSON file ---
     output_json_path = os.path.join(base_directory, "all_datasets_summary.json")
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Dict, Any, Callable
+
+# Benchmark suite for the pure-Python, pandas and Polars engines.
+#
+# Synthetic CSVs are generated locally (no download) with the column mix of the three
+# president datasets: heavy-tailed engagement metrics, scores with blanks, low- and
+# high-cardinality text (quoted commas, quotes and newlines included), JSON-string
+# columns like delivery_by_region, and a page_id / ad_id (Facebook_Id / post_id) key
+# pair with many pages and nearly one child id per row.
+#
+# Every (dataset, rows, engine) run happens in a fresh spawned process, so the peak
+# RSS it reports (ru_maxrss) belongs to that run alone. Each stage (load, overall,
+# one per grouping) is timed separately where the engine allows it; single-pass
+# engines report one 'scan' stage. The best of --repeat runs is kept.
+#
+# Usage:
+#   python benchmark_engines.py --rows 10000 100000 1000000 --output bench.json
+#   python benchmark_engines.py --baseline bench.json --tolerance 0.25
+# The second form exits with status 1 if any run got slower (or used more memory)
+# than the baseline by more than the tolerance.
+
+ENGINES = ["python", "python-streaming", "numpy", "pandas", "polars", "polars-lazy"]
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+# --- Synthetic datasets ---
+
+WORDS = ("vote election president america jobs economy border freedom rally donate "
+         "today tonight family future healthcare taxes security democracy campaign join").split()
+REGIONS = ["California", "Texas", "Florida", "New York", "Pennsylvania", "Ohio", "Georgia", "Michigan", "Arizona", "Wisconsin"]
+DEMOGRAPHICS = [f"{gender}_{age}" for gender in ("female", "male", "unknown") for age in ("18-24", "25-34", "35-44", "45-54", "55-64", "65+")]
+
+# Column layout of each synthetic dataset: (column name, value kind)
+DATASET_SHAPES = {
+    "fb_ads": [
+        ("page_id", "parent_id"), ("ad_id", "child_id"), ("ad_creation_time", "date"),
+        ("bylines", "category"), ("currency", "currency"), ("spend", "heavy_int"),
+        ("impressions", "heavy_int"), ("estimated_audience_size", "heavy_int"),
+        ("delivery_by_region", "json_regions"), ("demographic_distribution", "json_demographics"),
+        ("publisher_platforms", "platforms"), ("illuminating_scored_message", "score"),
+        ("illuminating_mentions", "category"), ("scam_illuminating", "flag"),
+        ("election_integrity_Truth_illuminating", "flag"), ("ad_creative_body", "text"),
+    ],
+    "fb_posts": [
+        ("Facebook_Id", "parent_id"), ("post_id", "child_id"), ("Page Category", "category"),
+        ("Page Admin Top Country", "currency"), ("Post Created", "date"), ("Type", "category"),
+        ("Total Interactions", "heavy_int"), ("Likes", "heavy_int"), ("Comments", "heavy_int"),
+        ("Shares", "heavy_int"), ("Love", "heavy_int"), ("Wow", "heavy_int"), ("Haha", "heavy_int"),
+        ("Sad", "heavy_int"), ("Angry", "heavy_int"), ("Care", "heavy_int"), ("Post Views", "heavy_int"),
+        ("Overperforming Score", "score"), ("Message", "text"), ("Link", "url"),
+    ],
+    "tw_posts": [
+        ("id", "row_id"), ("url", "url"), ("source", "category"), ("retweetCount", "heavy_int"),
+        ("replyCount", "heavy_int"), ("likeCount", "heavy_int"), ("quoteCount", "heavy_int"),
+        ("viewCount", "heavy_int"), ("createdAt", "date"), ("lang", "currency"),
+        ("isReply", "flag"), ("isQuote", "flag"), ("month_year", "category"),
+        ("illuminating_scored_message", "score"), ("text", "text"),
+    ],
+}
+
+# Value generator for one column kind
+def value_maker(kind: str, rng: random.Random, rows: int) -> Callable[[int, Dict[str, Any]], Any]:
+    """
+    Returns fn(row_number, row_state) -> value. row_state carries the current parent
+    id so child ids are nested inside it, as ad_id is inside page_id.
+    """
+    n_parents = max(10, rows // 50)
+    if kind == "parent_id":
+        def make(i, state):
+            # Skewed: a few pages own most rows, as in the real exports
+            state["parent"] = int(n_parents * rng.random() ** 3)
+            return 10_000_000 + state["parent"]
+        return make
+    if kind == "child_id":
+        return lambda i, state: f"{10_000_000 + state['parent']}_{i}" if rng.random() > 0.05 else f"{10_000_000 + state['parent']}_0"
+    if kind == "row_id":
+        return lambda i, state: 1_700_000_000_000_000_000 + i
+    if kind == "date":
+        return lambda i, state: f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if kind == "category":
+        choices = [" ".join(rng.sample(WORDS, 2)) for _ in range(40)]
+        return lambda i, state: choices[int(len(choices) * rng.random() ** 2)]
+    if kind == "currency":
+        return lambda i, state: rng.choice(["USD", "USD", "USD", "EUR", "GBP", ""])
+    if kind == "heavy_int":
+        return lambda i, state: int(rng.lognormvariate(4, 2)) if rng.random() > 0.03 else ""
+    if kind == "score":
+        return lambda i, state: round(rng.random(), 4) if rng.random() > 0.1 else ""
+    if kind == "flag":
+        return lambda i, state: rng.choice(["True", "False", "False", "False"])
+    if kind == "platforms":
+        return lambda i, state: rng.choice(["['facebook']", "['facebook', 'instagram']", "['instagram']"])
+    if kind == "url":
+        return lambda i, state: f"https://example.com/p/{rng.getrandbits(40):x}"
+    if kind == "text":
+        def make(i, state):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 25)))
+            r = rng.random()
+            if r < 0.05:
+                text += ', "quoted"'
+            elif r < 0.08:
+                text += "\nsecond line"
+            return text
+        return make
+    if kind == "json_regions":
+        def make(i, state):
+            picked = rng.sample(REGIONS, rng.randint(1, 4))
+            weights = [rng.random() for _ in picked]
+            return json.dumps({region: round(w / sum(weights), 4) for region, w in zip(picked, weights)})
+        return make
+    if kind == "json_demographics":
+        def make(i, state):
+            picked = rng.sample(DEMOGRAPHICS, rng.randint(2, 6))
+            weights = [rng.random() for _ in picked]
+            return json.dumps([{"percentage": round(w / sum(weights), 4), "key": key} for key, w in zip(picked, weights)])
+        return make
+    raise ValueError(f"Unknown column kind '{kind}'.")
+
+# Write a synthetic CSV (reused if it already exists)
+def generate_dataset(shape: str, rows: int, data_dir: str, seed: int = 0) -> str:
+    """
+    Returns the path of <data_dir>/<shape>_<rows>_s<seed>.csv, writing it first if
+    needed. Generation is deterministic for a given (shape, rows, seed).
+    """
+    path = os.path.join(data_dir, f"{shape}_{rows}_s{seed}.csv")
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    rng = random.Random(seed)
+    columns = DATASET_SHAPES[shape]
+    makers = [value_maker(kind, rng, rows) for _, kind in columns]
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        state = {}
+        for i in range(rows):
+            writer.writerow([make(i, state) for make in makers])
+    os.replace(temp, path)
+    return path
+
+# --- Engine runners (each runs in its own process) ---
+
+# Grouping sets with the same column fallbacks as the three scripts
+def grouping_sets_for(headers: List[str]) -> List[List[str]]:
+    page_id_col = "page_id" if "page_id" in headers else ("Facebook_Id" if "Facebook_Id" in headers else None)
+    child_col = "ad_id" if "ad_id" in headers else ("post_id" if "post_id" in headers else None)
+    if not page_id_col:
+        return []
+    return [[page_id_col], [page_id_col, child_col]] if child_col else [[page_id_col]]
+
+# Stage name used in the results for one grouping
+def group_stage(keys: List[str]) -> str:
+    return "group:" + ",".join(keys)
+
+class StageTimer:
+    """
+    Records the wall time of consecutive stages: call stage(name) after each one.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.last = time.perf_counter()
+
+    def stage(self, name: str) -> None:
+        now = time.perf_counter()
+        self.stages[name] = now - self.last
+        self.last = now
+
+def run_pure_python(path: str, timer: StageTimer, engine: str) -> None:
+    from Pure_Python_Stats import load_csv, analyze_dataset, analyze_groups
+    headers, rows = load_csv(path, columnar=True)
+    timer.stage("load")
+    analyze_dataset(headers, rows, engine=engine)
+    timer.stage("overall")
+    for keys in grouping_sets_for(headers):
+        analyze_groups(headers, rows, keys, engine=engine)
+        timer.stage(group_stage(keys))
+
+def run_python_streaming(path: str, timer: StageTimer) -> None:
+    from Pure_Python_Stats import analyze_csv_grouped, read_csv_headers
+    analyze_csv_grouped(path, grouping_sets_for(read_csv_headers(path)))
+    timer.stage("scan")
+
+def run_pandas(path: str, timer: StageTimer) -> None:
+    import pandas as pd
+    df = pd.read_csv(path)
+    timer.stage("load")
+    df.describe(include="all")
+    for col in df.select_dtypes(exclude="number").columns:
+        df[col].value_counts().head(5)
+        df[col].nunique()
+    timer.stage("overall")
+    for keys in grouping_sets_for(list(df.columns)):
+        # Same statistics as groupby().describe(), computed with vectorized groupby
+        # kernels; describe() itself runs per group and takes minutes on near-unique keys
+        grouped = df.groupby(keys)[[col for col in df.select_dtypes(include="number").columns if col not in keys]]
+        grouped.agg(["count", "mean", "std", "min", "max"])
+        grouped.quantile([0.25, 0.5, 0.75])
+        timer.stage(group_stage(keys))
+
+def run_polars(path: str, timer: StageTimer) -> None:
+    import polars as pl
+    from Polars_stats import describe_exprs
+    df = pl.read_csv(path)
+    timer.stage("load")
+    df.describe()
+    for col in df.columns:
+        if df[col].dtype == pl.Utf8:
+            df.group_by(col).agg(pl.len().alias("count_of_values")).sort("count_of_values", descending=True).head(5)
+            df[col].n_unique()
+    timer.stage("overall")
+    for keys in grouping_sets_for(df.columns):
+        exprs = [pl.len().alias("rows")]
+        for col, dtype in df.schema.items():
+            if dtype.is_numeric() and col not in keys:
+                exprs.extend(describe_exprs(col))
+        df.group_by(keys).agg(exprs)
+        timer.stage(group_stage(keys))
+
+def run_polars_lazy(path: str, timer: StageTimer) -> None:
+    import io
+    from contextlib import redirect_stdout
+    from Polars_stats import analyze_dataset_polars_lazy
+    with redirect_stdout(io.StringIO()):
+        analyze_dataset_polars_lazy(path, streaming=False)
+    timer.stage("scan")
+
+# Peak resident set size of this process in MiB
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB elsewhere
+
+# Run one engine on one file and report its stage timings and peak RSS
+def run_engine(engine: str, path: str) -> Dict[str, Any]:
+    rss_before = peak_rss_mb()
+    timer = StageTimer()
+    if engine in ("python", "numpy"):
+        run_pure_python(path, timer, engine)
+    elif engine == "python-streaming":
+        run_python_streaming(path, timer)
+    elif engine == "pandas":
+        run_pandas(path, timer)
+    elif engine == "polars":
+        run_polars(path, timer)
+    elif engine == "polars-lazy":
+        run_polars_lazy(path, timer)
+    else:
+        raise ValueError(f"Unknown engine '{engine}'. Expected one of {ENGINES}.")
+    return {"stages": timer.stages, "peak_rss_mb": peak_rss_mb(), "startup_rss_mb": rss_before}
+
+# Engines whose libraries are installed here
+def available_engines(engines: List[str]) -> List[str]:
+    """
+    Only looks the libraries up: importing them would grow this process, and every
+    spawned run starts with its parent's peak RSS.
+    """
+    needs = {"numpy": "numpy", "pandas": "pandas", "polars": "polars", "polars-lazy": "polars"}
+    usable = []
+    for engine in engines:
+        if engine in needs and importlib.util.find_spec(needs[engine]) is None:
+            print(f"Skipping engine '{engine}': {needs[engine]} is not installed.")
+            continue
+        usable.append(engine)
+    return usable
+
+# --- Driver ---
+
+# Benchmark every engine on every (shape, rows) dataset
+def run_benchmarks(shapes: List[str], row_counts: List[int], engines: List[str], data_dir: str, repeat: int = 1, seed: int = 0) -> List[Dict[str, Any]]:
+    results = []
+    spawn = get_context("spawn")
+    for rows in row_counts:
+        for shape in shapes:
+            path = generate_dataset(shape, rows, data_dir, seed)
+            for engine in engines:
+                best = None
+                for _ in range(repeat):
+                    # A fresh process per run so ru_maxrss is this run's own peak
+                    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                        run = executor.submit(run_engine, engine, path).result()
+                    run["total_s"] = sum(run["stages"].values())
+                    if best is None or run["total_s"] < best["total_s"]:
+                        best = run
+                result = {
+                    "dataset": shape,
+                    "rows": rows,
+                    "engine": engine,
+                    "file_mb": os.path.getsize(path) / (1024 * 1024),
+                    "stages": best["stages"],
+                    "total_s": best["total_s"],
+                    "rows_per_s": rows / best["total_s"] if best["total_s"] > 0 else None,
+                    "peak_rss_mb": best["peak_rss_mb"],
+                    "startup_rss_mb": best["startup_rss_mb"]
+                }
+                results.append(result)
+                print(f"{shape:>9} {rows:>11,} {engine:>17}  {result['total_s']:9.3f} s  {result['rows_per_s'] or 0:>12,.0f} rows/s  {result['peak_rss_mb']:8.1f} MiB peak")
+    return results
+
+# Runs that got slower or used more memory than the baseline allows
+def find_regressions(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float = 0.25) -> List[str]:
+    """
+    Runs are matched on (dataset, rows, engine); runs without a baseline entry are
+    ignored. A run regresses when its total time or peak RSS exceeds the baseline
+    value by more than tolerance (0.25 = 25%).
+    """
+    previous = {(r["dataset"], r["rows"], r["engine"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result["dataset"], result["rows"], result["engine"]))
+        if old is None:
+            continue
+        for metric, unit in (("total_s", "s"), ("peak_rss_mb", "MiB")):
+            if result[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{result['dataset']} {result['rows']} rows, {result['engine']}: {metric} {old[metric]:.3f} -> {result[metric]:.3f} {unit}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pure-Python, pandas and Polars engines on synthetic datasets.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Row counts to generate (e.g. 10000 1000000 50000000).")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASET_SHAPES), choices=list(DATASET_SHAPES))
+    parser.add_argument("--engines", nargs="+", default=ENGINES, choices=ENGINES)
+    parser.add_argument("--data-dir", default="benchmark_data", help="Where synthetic CSVs are written and reused.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per engine and dataset; the fastest is kept.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown / memory growth over the baseline.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.datasets, args.rows, available_engines(args.engines), args.data_dir, args.repeat, args.seed)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}.")
@@ -1,128 +1,194 @@
-
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load the dataset
-file_path = "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_ads_president_scored_anon.csv"
-df = pd.read_csv(file_path)
-
-# Set plot style
-sns.set(style="whitegrid")
-
-# Select relevant numeric columns
-numeric_cols = ['likeCount', 'retweetCount', 'replyCount', 'quoteCount', 'viewCount']
-numeric_cols = [col for col in numeric_cols if col in df.columns]
-
-# Create Histograms
-for col in numeric_cols:
-    plt.figure(figsize=(8, 4))
-    sns.histplot(df[col], bins=50, kde=True)
-    plt.title(f'Distribution of {col}')
-    plt.xlabel(col)
-    plt.ylabel('Frequency')
-    plt.tight_layout()
-    plt.show()
-
-# Create Boxplots
-for col in numeric_cols:
-    plt.figure(figsize=(6, 4))
-    sns.boxplot(x=df[col])
-    plt.title(f'Boxplot of {col}')
-    plt.tight_layout()
-    plt.show()
-
-# Create bar plot for top authors if available
-if 'author_id' in df.columns:
-    plt.figure(figsize=(10, 6))
-    top_authors = df['author_id'].value_counts().head(10)
-    sns.barplot(x=top_authors.values, y=top_authors.index, palette="viridis")
-    plt.title("Top 10 Most Active Authors")
-    plt.xlabel("Number of Tweets")
-    plt.ylabel("Author ID")
-    plt.tight_layout()
-    plt.show()
-
-
-
-# Load the newly uploaded Facebook dataset
-file_path = "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_posts_president_scored_anon.csv"
-df = pd.read_csv(file_path)
-
-# Use whitegrid style for clarity
-sns.set(style="whitegrid")
-
-# Identify numeric columns for plotting
-numeric_cols = ['Likes', 'Comments', 'Shares', 'Love', 'Wow', 'Haha', 'Sad', 'Angry', 'Care', 'Post Views']
-numeric_cols = [col for col in numeric_cols if col in df.columns]
-
-# Create Histograms
-for col in numeric_cols:
-    plt.figure(figsize=(8, 4))
-    sns.histplot(df[col], bins=50, kde=True)
-    plt.title(f'Distribution of {col}')
-    plt.xlabel(col)
-    plt.ylabel('Frequency')
-    plt.tight_layout()
-    plt.show()
-
-# Create Boxplots
-for col in numeric_cols:
-    plt.figure(figsize=(6, 4))
-    sns.boxplot(x=df[col])
-    plt.title(f'Boxplot of {col}')
-    plt.tight_layout()
-    plt.show()
-
-# Create a bar plot for top Page Categories if available
-if 'Page Category' in df.columns:
-    plt.figure(figsize=(10, 5))
-    top_categories = df['Page Category'].value_counts().head(10)
-    sns.barplot(x=top_categories.values, y=top_categories.index, palette="Set2")
-    plt.title("Top 10 Page Categories")
-    plt.xlabel("Number of Posts")
-    plt.ylabel("Page Category")
-    plt.tight_layout()
-    plt.show()
-
-
-
-# Load the Facebook Ads dataset
-file_path = "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_tw_posts_president_scored_anon.csv"
-df = pd.read_csv(file_path)
-
-# Set seaborn style
-sns.set(style="whitegrid")
-
-# Identify numeric columns that are likely to be relevant
-numeric_cols = ['spend', 'impressions', 'Overperforming Score']
-numeric_cols = [col for col in numeric_cols if col in df.columns]
-
-# Plot histograms
-for col in numeric_cols:
-    plt.figure(figsize=(8, 4))
-    sns.histplot(df[col], bins=40, kde=True)
-    plt.title(f'Distribution of {col}')
-    plt.xlabel(col)
-    plt.ylabel('Frequency')
-    plt.tight_layout()
-    plt.show()
-
-# Plot boxplots to show spread and outliers
-for col in numeric_cols:
-    plt.figure(figsize=(6, 4))
-    sns.boxplot(x=df[col])
-    plt.title(f'Boxplot of {col}')
-    plt.tight_layout()
-    plt.show()
-
-# Create bar plot for top sponsors if available
-if 'Sponsor Name' in df.columns:
-    top_sponsors = df['Sponsor Name'].value_counts().head(10)
-    plt.figure(figsize=(10, 5))
-    sns.barplot(x=top_sponsors.values, y=top_sponsors.index, palette="Set2")
-    plt.title("Top 10 Sponsors by Ad Count")
-    plt.xlabel("Number of Ads")
-    plt.ylabel("Sponsor Name")
-    plt.tight_layout()
-    plt.show()
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
+
+from plot_aggregates import PlotSpec, dataset_aggregates
+
+# Histograms with KDE, box plots and a top-10 bar chart for each dataset.
+#
+# The figures are drawn from pre-aggregated data (plot_aggregates.py): histogram
+# counts, a KDE evaluated on a fixed grid and five-number box summaries, computed once
+# per CSV and kept in .stats_cache. Pandas_Stats.py can write them while it has the
+# data loaded (plot_specs), so this script never has to read the CSV again.
+#
+# batch_mode renders with the Agg backend (no display needed) in worker processes and
+# writes PNG files. Each figure is hashed over everything it is drawn from. Figures
+# whose hash matches the one in output_dir/.render_cache.json are not drawn again.
+
+RENDER_VERSION = 1 # Part of every figure hash; bump when the drawing code changes
+RENDER_MANIFEST = ".render_cache.json"
+
+DATASETS = [
+    {
+        'file_path': "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_ads_president_scored_anon.csv",
+        'spec': PlotSpec(['likeCount', 'retweetCount', 'replyCount', 'quoteCount', 'viewCount'], bins=50, category_col='author_id'),
+        'category_title': "Top 10 Most Active Authors",
+        'category_xlabel': "Number of Tweets",
+        'category_ylabel': "Author ID",
+        'palette': "viridis",
+        'category_figsize': (10, 6)
+    },
+    {
+        'file_path': "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_fb_posts_president_scored_anon.csv",
+        'spec': PlotSpec(['Likes', 'Comments', 'Shares', 'Love', 'Wow', 'Haha', 'Sad', 'Angry', 'Care', 'Post Views'], bins=50, category_col='Page Category'),
+        'category_title': "Top 10 Page Categories",
+        'category_xlabel': "Number of Posts",
+        'category_ylabel': "Page Category",
+        'palette': "Set2",
+        'category_figsize': (10, 5)
+    },
+    {
+        'file_path': "/Users/Guest/Downloads/Task_03_Descriptive_Stats/2024_tw_posts_president_scored_anon.csv",
+        'spec': PlotSpec(['spend', 'impressions', 'Overperforming Score'], bins=40, category_col='Sponsor Name'),
+        'category_title': "Top 10 Sponsors by Ad Count",
+        'category_xlabel': "Number of Ads",
+        'category_ylabel': "Sponsor Name",
+        'palette': "Set2",
+        'category_figsize': (10, 5)
+    },
+]
+
+# PlotSpec per CSV file name, for Pandas_Stats.py's plot_specs
+PLOT_SPECS = {os.path.basename(dataset['file_path']): dataset['spec'] for dataset in DATASETS}
+
+# --- Figures ---
+
+# File-name friendly version of a column or dataset name
+def safe_name(text: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '_', text).strip('_')
+
+# Aggregates of one dataset, or None if its file cannot be read (run in a worker)
+def aggregate_dataset(file_path: str, spec: PlotSpec, use_cache: bool) -> Optional[Dict[str, Any]]:
+    try:
+        return dataset_aggregates(file_path, spec, use_cache=use_cache)
+    except FileNotFoundError:
+        print(f"Error: File not found at {file_path}")
+        return None
+
+# One job per figure of a dataset: what to draw and the PNG path to draw it to
+def figure_jobs(dataset: Dict[str, Any], aggregates: Dict[str, Any], output_dir: str) -> List[Dict[str, Any]]:
+    name = safe_name(os.path.splitext(os.path.basename(dataset['file_path']))[0])
+    jobs = []
+    for col, column in aggregates['numeric'].items():
+        if column is None:
+            continue
+        jobs.append({'kind': 'hist', 'title': f'Distribution of {col}', 'xlabel': col, 'ylabel': 'Frequency', 'figsize': (8, 4),
+                     'data': {'histogram': column['histogram'], 'kde': column['kde']},
+                     'path': os.path.join(output_dir, f"{name}_hist_{safe_name(col)}.png")})
+        jobs.append({'kind': 'box', 'title': f'Boxplot of {col}', 'xlabel': col, 'ylabel': '', 'figsize': (6, 4),
+                     'data': column['box'],
+                     'path': os.path.join(output_dir, f"{name}_box_{safe_name(col)}.png")})
+    if aggregates['category'] is not None:
+        jobs.append({'kind': 'bar', 'title': dataset['category_title'], 'xlabel': dataset['category_xlabel'],
+                     'ylabel': dataset['category_ylabel'], 'figsize': dataset['category_figsize'],
+                     'palette': dataset['palette'], 'data': aggregates['category'],
+                     'path': os.path.join(output_dir, f"{name}_top_{safe_name(dataset['spec'].category_col)}.png")})
+    return jobs
+
+# Content hash of a figure: its data and labels, the drawing code and library versions
+def figure_hash(job: Dict[str, Any]) -> str:
+    import matplotlib
+    import seaborn as sns
+    content = {key: value for key, value in job.items() if key != 'path'}
+    content['versions'] = [RENDER_VERSION, matplotlib.__version__, sns.__version__]
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+# Draw one figure from its aggregates and return it
+def draw_figure(job: Dict[str, Any]):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set(style="whitegrid")
+    fig, ax = plt.subplots(figsize=job['figsize'])
+    data = job['data']
+    color = sns.color_palette()[0]
+    if job['kind'] == 'hist':
+        # Bin centers weighted by their counts reproduce histplot's bars exactly
+        edges = data['histogram']['edges']
+        centers = [(low + high) / 2 for low, high in zip(edges, edges[1:])]
+        sns.histplot(x=centers, weights=data['histogram']['counts'], bins=edges, color=color, ax=ax)
+        if data['kde'] is not None:
+            ax.plot(data['kde']['x'], data['kde']['y'], color=color)
+    elif job['kind'] == 'box':
+        stats = {key: data[key] for key in ('q1', 'med', 'q3', 'whislo', 'whishi', 'fliers')}
+        ax.bxp([stats], orientation='horizontal', patch_artist=True, widths=0.8,
+               boxprops={'facecolor': color}, medianprops={'color': '0.2'},
+               flierprops={'marker': 'd', 'markerfacecolor': '0.2', 'markeredgecolor': '0.2', 'markersize': 4})
+        ax.set_yticks([])
+    else:
+        sns.barplot(x=data['counts'], y=data['labels'], hue=data['labels'], palette=job['palette'], legend=False, ax=ax)
+    ax.set_title(job['title'])
+    ax.set_xlabel(job['xlabel'])
+    ax.set_ylabel(job['ylabel'])
+    fig.tight_layout()
+    return fig
+
+# Draw one figure to its PNG file with the Agg backend (run in a worker)
+def render_figure(job: Dict[str, Any]) -> str:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig = draw_figure(job)
+    fig.savefig(job['path'])
+    plt.close(fig)
+    return job['path']
+
+# Render the figures that changed since the last run; returns (rendered, skipped)
+def render_batch(jobs: List[Dict[str, Any]], output_dir: str, workers: Optional[int] = None) -> Tuple[int, int]:
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, RENDER_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    hashes = {job['path']: figure_hash(job) for job in jobs}
+    pending = [job for job in jobs
+               if manifest.get(os.path.basename(job['path'])) != hashes[job['path']] or not os.path.exists(job['path'])]
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for path in executor.map(render_figure, pending):
+                manifest[os.path.basename(path)] = hashes[path]
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return len(pending), len(jobs) - len(pending)
+
+# Show every figure on screen, one at a time
+def show_figures(jobs: List[Dict[str, Any]]) -> None:
+    import matplotlib.pyplot as plt
+    for job in jobs:
+        draw_figure(job)
+        plt.show()
+
+
+if __name__ == "__main__":
+    # Render every figure to a PNG file in output_dir with the Agg backend, in
+    # render_workers processes (None = one per CPU), skipping unchanged figures.
+    # False shows the figures one at a time with plt.show() instead.
+    batch_mode = True
+    output_dir = "figures"
+    render_workers = None
+
+    # Aggregate through .stats_cache (the Arrow copy Pandas_Stats.py uses) and keep the
+    # aggregates there; False reads the CSV columns every time
+    use_cache = True
+
+    # The datasets are aggregated in parallel too
+    with ProcessPoolExecutor(max_workers=render_workers) as executor:
+        all_aggregates = list(executor.map(partial(aggregate_dataset, use_cache=use_cache),
+                                           [dataset['file_path'] for dataset in DATASETS],
+                                           [dataset['spec'] for dataset in DATASETS]))
+
+    jobs = []
+    for dataset, aggregates in zip(DATASETS, all_aggregates):
+        if aggregates is not None:
+            jobs.extend(figure_jobs(dataset, aggregates, output_dir))
+
+    if batch_mode:
+        rendered, skipped = render_batch(jobs, output_dir, render_workers)
+        print(f"Rendered {rendered} figures to {output_dir} ({skipped} unchanged, skipped)")
+    else:
+        show_figures(jobs)
@@ -0,0 +1,94 @@
+import json
+import os
+import re
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+# Cross-dataset comparisons of job specs (job_spec.Comparison, stats_cli.py).
+#
+# Each dataset of a comparison is summarised per value of its own key column (page_id
+# in the ads, Facebook_Id in the posts), reading only the columns the dataset
+# references and applying its filters. Those per-key summaries are the dataset's hashed
+# index, and the indexes are hash joined on the key. The join handles one entry per
+# key instead of the raw rows, so tens of millions of rows per file cost no more to
+# join than their distinct keys.
+#
+# Keys are compared as text after join_key: surrounding whitespace is stripped and a
+# trailing ".0" is dropped from integers, so 123 and 123.0 match and long ids are not
+# rounded through floats. Polars_stats applies the same rule with expressions
+# (INTEGRAL_KEY_PATTERN).
+#
+# Each joined key becomes one row:
+#
+#   {"key": "10000008", "rows": {"fb_ads": 12, "fb_posts": 40},
+#    "stats": {"fb_ads": {"spend": {...}}, "fb_posts": {"Likes": {...}}}}
+#
+# rows is 0 and stats None for a dataset that does not have the key (outer joins).
+# Rows are sorted by key, so both engines write them in the same order.
+
+INTEGRAL_KEY_RE = re.compile(r'([+-]?\d+)\.0*')
+INTEGRAL_KEY_PATTERN = r'^([+-]?\d+)\.0*$' # The same rule for Polars' str.replace
+
+# --- Keys ---
+
+# Canonical join key of a raw CSV field, or None for a missing value
+def join_key(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    text = value.strip()
+    if not text:
+        return None
+    integral = INTEGRAL_KEY_RE.fullmatch(text)
+    return integral.group(1) if integral else text
+
+# --- Hash join ---
+
+# Sorted keys of a join of per-key indexes
+def join_keys(indexes: Dict[str, Dict[str, Any]], how: str) -> List[str]:
+    """
+    'inner' probes the other indexes with the keys of the smallest one; 'outer' takes
+    the union of all keys.
+    """
+    if how == 'outer':
+        keys = set()
+        for index in indexes.values():
+            keys.update(index)
+    else:
+        smallest, *others = sorted(indexes.values(), key=len)
+        keys = [key for key in smallest if all(key in index for index in others)]
+    return sorted(keys)
+
+# Joined rows of {dataset: {key: (rows, {column: stats})}} indexes
+def hash_join(indexes: Dict[str, Dict[str, Tuple[int, Dict[str, Any]]]], how: str) -> Iterator[Dict[str, Any]]:
+    for key in join_keys(indexes, how):
+        rows, stats = {}, {}
+        for name, index in indexes.items():
+            rows[name], stats[name] = index.get(key, (0, None))
+        yield {'key': key, 'rows': rows, 'stats': stats}
+
+# --- Results ---
+
+# Results of a comparison: its datasets and the joined rows (or the file they were written to)
+def comparison_results(comparison, datasets: Dict[str, Dict[str, Any]], rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    datasets holds file_path, key, row_count (after filters) and key_count per dataset.
+    Without comparison.output the rows are returned under 'keys', keyed by join key.
+    """
+    results = {'how': comparison.how, 'datasets': datasets}
+    if comparison.output is None:
+        results['keys'] = {row['key']: {'rows': row['rows'], 'stats': row['stats']} for row in rows}
+        results['key_count'] = len(results['keys'])
+        return results
+    key_count = 0
+    with open(comparison.output + '.tmp', 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+            key_count += 1
+    os.replace(comparison.output + '.tmp', comparison.output)
+    results['keys_file'] = comparison.output
+    results['key_count'] = key_count
+    return results
+
+# One-line console summary of a comparison's results
+def describe_comparison(name: str, results: Dict[str, Any]) -> str:
+    counts = ", ".join(f"{dataset} {info['key_count']} keys in {info['row_count']} rows" for dataset, info in results['datasets'].items())
+    return f"{name}: {results['key_count']} keys after the {results['how']} join ({counts})"
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import mmap
+import os
+from typing import List, Dict, Optional
+
+# Binary conversion cache shared by the three entry points.
+#
+# The first load of a CSV parses it as usual and writes a typed binary copy into a
+# .stats_cache directory next to the CSV; later runs memory-map that copy and read
+# only the columns they need. Each engine keeps its own file so its parsing rules
+# (dtype inference, try_parse_float) are unchanged:
+#   - Polars: Arrow IPC written with LazyFrame.sink_ipc, read with scan_ipc/read_ipc
+#   - pandas: Arrow IPC (Feather v2) via pyarrow
+#   - pure Python: the ColumnarTable buffers, read back as zero-copy memoryviews
+#
+# Entries are keyed by absolute path, size, mtime, a content hash of the first and
+# last MiB (a full-file hash would cost as much as parsing) and the schema the entry
+# was parsed with, so a copy typed under one schema is never served for another.
+# Entries for older versions of a CSV are deleted when a new one is written, and the
+# whole cache directory is kept under a size cap by evicting the least recently used
+# files.
+
+CACHE_DIR_NAME = ".stats_cache"
+DEFAULT_CACHE_LIMIT_MB = 10240
+HASH_SAMPLE_BYTES = 1024 * 1024
+PURE_MAGIC = b"PPCOL1\n\0"
+
+# --- Cache keys and housekeeping ---
+
+# Identity of the current contents of a CSV file (and of the schema it is parsed with)
+def cache_key(csv_path: str, schema: Optional[Dict[str, str]] = None) -> str:
+    csv_path = os.path.abspath(csv_path)
+    stat = os.stat(csv_path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{csv_path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8"))
+    if schema is not None:
+        digest.update(json.dumps(schema, sort_keys=True).encode("utf-8"))
+    with open(csv_path, "rb") as f:
+        digest.update(f.read(HASH_SAMPLE_BYTES))
+        if stat.st_size > HASH_SAMPLE_BYTES:
+            f.seek(max(HASH_SAMPLE_BYTES, stat.st_size - HASH_SAMPLE_BYTES))
+            digest.update(f.read(HASH_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+# Path of the cache entry for one engine ('polars', 'pandas' or 'pure') or other kind ('schema')
+def cache_path(csv_path: str, engine: str, extension: Optional[str] = None, schema: Optional[Dict[str, str]] = None) -> str:
+    csv_path = os.path.abspath(csv_path)
+    cache_dir = os.path.join(os.path.dirname(csv_path), CACHE_DIR_NAME)
+    extension = extension or ("bin" if engine == "pure" else "arrow")
+    return os.path.join(cache_dir, f"{os.path.basename(csv_path)}.{engine}.{cache_key(csv_path, schema)}.{extension}")
+
+# Return the entry path if it exists (marking it recently used), else None
+def lookup(entry_path: str) -> Optional[str]:
+    if not os.path.exists(entry_path):
+        return None
+    os.utime(entry_path) # mtime doubles as the last-used time for eviction
+    return entry_path
+
+# Move a freshly written temp file into place and clean up the cache directory
+def commit(temp_path: str, entry_path: str, limit_mb: float = DEFAULT_CACHE_LIMIT_MB) -> None:
+    os.replace(temp_path, entry_path)
+    # Drop entries for older versions of the same CSV and engine
+    cache_dir = os.path.dirname(entry_path)
+    prefix = os.path.basename(entry_path).rsplit(".", 2)[0] + "."
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and path != entry_path and not name.endswith(".tmp"):
+            os.remove(path)
+    evict(cache_dir, limit_mb, keep=entry_path)
+
+# Delete least recently used entries until the directory is under limit_mb
+def evict(cache_dir: str, limit_mb: float = DEFAULT_CACHE_LIMIT_MB, keep: Optional[str] = None) -> None:
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isfile(path) and not name.endswith(".tmp"):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit_mb * 1024 * 1024:
+            break
+        if path != keep:
+            os.remove(path)
+            total -= size
+
+# Create the cache directory and return a temp path next to the final entry
+def temp_path_for(entry_path: str) -> str:
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    return f"{entry_path}.{os.getpid()}.tmp"
+
+# --- Polars ---
+
+# Make sure the Polars IPC entry exists (built by streaming the CSV) and return its path
+def polars_cache(csv_path: str, limit_mb: float = DEFAULT_CACHE_LIMIT_MB, schema: Optional[Dict[str, str]] = None) -> str:
+    """
+    schema (see schema_inference.py) is only used when the entry is built.
+    """
+    from schema_inference import scan_csv_polars
+    entry = cache_path(csv_path, "polars", schema=schema)
+    if lookup(entry) is None:
+        temp = temp_path_for(entry)
+        scan_csv_polars(csv_path, schema).sink_ipc(temp)
+        commit(temp, entry, limit_mb)
+    return entry
+
+# LazyFrame over the cached copy; projection pushdown reads only the used columns
+def scan_polars(csv_path: str, limit_mb: float = DEFAULT_CACHE_LIMIT_MB, schema: Optional[Dict[str, str]] = None):
+    import polars as pl
+    return pl.scan_ipc(polars_cache(csv_path, limit_mb, schema))
+
+# Eager DataFrame from the cached copy (scan_ipc memory-maps the file)
+def load_polars(csv_path: str, columns: Optional[List[str]] = None, limit_mb: float = DEFAULT_CACHE_LIMIT_MB, schema: Optional[Dict[str, str]] = None):
+    lf = scan_polars(csv_path, limit_mb, schema)
+    return (lf.select(columns) if columns else lf).collect()
+
+# --- pandas ---
+
+# DataFrame as pd.read_csv would return it, from a cached Arrow IPC copy when possible
+def load_pandas(csv_path: str, columns: Optional[List[str]] = None, limit_mb: float = DEFAULT_CACHE_LIMIT_MB, schema: Optional[Dict[str, str]] = None):
+    """
+    Falls back to plain pd.read_csv when pyarrow is not installed. schema (see
+    schema_inference.py) gives the read_csv dtypes when the entry is built.
+    Frames Arrow cannot hold as they are (object columns mixing numbers and strings,
+    as read_csv returns for a column with a few non-numeric cells) are returned
+    without being cached, so they are read exactly as by read_csv.
+    """
+    from schema_inference import read_csv_pandas
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        return read_csv_pandas(csv_path, schema, columns)
+
+    entry = cache_path(csv_path, "pandas", schema=schema)
+    if lookup(entry) is None:
+        df = read_csv_pandas(csv_path, schema)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return df[columns] if columns else df
+        temp = temp_path_for(entry)
+        # Uncompressed so the file can be memory-mapped on the next run
+        feather.write_feather(table, temp, compression="uncompressed")
+        commit(temp, entry, limit_mb)
+        return df[columns] if columns else df
+    with pa.memory_map(entry) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns:
+        table = table.select(columns)
+    return table.to_pandas()
+
+# --- Pure Python (ColumnarTable) ---
+
+# Write a ColumnarTable's buffers to an entry file
+def save_table(table, entry_path: str) -> None:
+    """
+    Layout: magic, 8-byte header length, JSON header (headers, row count, string pool,
+    per-column buffer offsets), then each column's numbers / codes / validity buffers,
+    each aligned to 8 bytes.
+    """
+    n = table.num_rows
+    columns = []
+    offset = 0
+    for column in table.columns:
+        info = {"null_count": column.null_count, "string_count": column.string_count}
+        for name, size in (("numbers", 8 * n), ("codes", 4 * n if column.codes is not None else 0), ("valid", len(column.valid))):
+            info[name] = [offset, size]
+            offset += (size + 7) // 8 * 8
+        columns.append(info)
+    header = json.dumps({"headers": table.headers, "num_rows": n, "string_pool": table.string_pool, "columns": columns}).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    with open(entry_path, "wb") as f:
+        f.write(PURE_MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for column in table.columns:
+            for buffer in (column.numbers, column.codes, column.valid):
+                if buffer is None:
+                    continue
+                data = bytes(buffer)
+                f.write(data)
+                f.write(b"\0" * (-len(data) % 8))
+
+# Read a ColumnarTable back as read-only memoryviews over a memory map
+def read_table(entry_path: str, columns: Optional[List[str]] = None):
+    from Pure_Python_Stats import ColumnarTable, TypedColumn
+    with open(entry_path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if bytes(view[:8]) != PURE_MAGIC:
+        raise ValueError(f"'{entry_path}' is not a pure-Python stats cache file.")
+    header_length = int.from_bytes(view[8:16], "little")
+    header = json.loads(bytes(view[16:16 + header_length]))
+    data_start = 16 + header_length
+
+    wanted = [i for i, h in enumerate(header["headers"]) if columns is None or h in columns]
+    table = ColumnarTable([header["headers"][i] for i in wanted])
+    table.num_rows = header["num_rows"]
+    table.string_pool = header["string_pool"]
+    table.string_codes = {s: i + 1 for i, s in enumerate(table.string_pool)}
+    for position, i in enumerate(wanted):
+        info = header["columns"][i]
+        column = TypedColumn()
+        start, size = info["numbers"]
+        column.numbers = view[data_start + start:data_start + start + size].cast("d")
+        start, size = info["codes"]
+        column.codes = view[data_start + start:data_start + start + size].cast("I") if size else None
+        start, size = info["valid"]
+        column.valid = view[data_start + start:data_start + start + size]
+        column.null_count = info["null_count"]
+        column.string_count = info["string_count"]
+        table.columns[position] = column
+    return table
+
+# ColumnarTable for a CSV, parsed once and then served from the cache
+def load_table(csv_path: str, columns: Optional[List[str]] = None, limit_mb: float = DEFAULT_CACHE_LIMIT_MB, schema: Optional[Dict[str, str]] = None):
+    """
+    Tables read from the cache are read-only (their buffers are memoryviews over the
+    mapped file); everything in Pure_Python_Stats and numpy_backend only reads them.
+    schema (see schema_inference.py) speeds up parsing when the entry is built.
+    """
+    from Pure_Python_Stats import load_csv_columnar
+    entry = cache_path(csv_path, "pure", schema=schema)
+    if lookup(entry) is None:
+        table = load_csv_columnar(csv_path, schema)
+        temp = temp_path_for(entry)
+        save_table(table, temp)
+        commit(temp, entry, limit_mb)
+    return read_table(entry, columns)
@@ -0,0 +1,80 @@
+import io
+import multiprocessing
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import redirect_stdout
+from typing import List, Any, Callable, Optional, Tuple
+
+# Runs one analysis per dataset file concurrently in worker processes.
+# Each job's console output is captured in the worker and printed by the parent in
+# the original dataset order, so the log reads exactly like a sequential run.
+# Concurrency is capped both by max_workers and by a memory budget: each job is
+# estimated to need memory_factor x its file size, and a job only starts when the
+# running total stays within the budget (a single job is always allowed to run).
+
+# --- Helper Functions ---
+
+# Run one job in a worker, returning (captured_output, result)
+def run_captured(fn: Callable[[str], Any], file_path: str) -> Tuple[str, Any]:
+    buffer = io.StringIO()
+    result = None
+    with redirect_stdout(buffer):
+        try:
+            result = fn(file_path)
+        except Exception:
+            print(f"An unexpected error occurred while processing {file_path}:")
+            print(traceback.format_exc())
+    return buffer.getvalue(), result
+
+# Estimated peak memory of a job, in bytes
+def estimate_memory(file_path: str, memory_factor: float) -> int:
+    try:
+        return int(os.path.getsize(file_path) * memory_factor)
+    except OSError:
+        return 0 # Missing files are reported by the job itself
+
+# Run every (fn, file_path) job and return the results in job order
+def run_dataset_jobs(jobs: List[Tuple[Callable[[str], Any], str]], max_workers: Optional[int] = None, memory_budget_mb: Optional[float] = None, memory_factor: float = 2.0, start_method: Optional[str] = None) -> List[Any]:
+    """
+    fn must be a module-level function (or functools.partial of one) so it can be
+    sent to a worker process. Console output of job i is printed as soon as jobs
+    0..i have finished; with several large files, wall-clock time approaches the
+    time of the slowest file. start_method='spawn' avoids forking a parent that
+    has loaded a multithreaded library (Polars warns about fork).
+    """
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs) or 1))
+    budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+    estimates = [estimate_memory(file_path, memory_factor) for _, file_path in jobs]
+
+    results = [None] * len(jobs)
+    outputs = {}
+    next_to_print = 0
+    next_to_submit = 0
+    running = {}
+    memory_in_use = 0
+
+    mp_context = multiprocessing.get_context(start_method) if start_method else None
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        while next_to_print < len(jobs):
+            # Start jobs in order while there is a free worker and memory headroom
+            while next_to_submit < len(jobs) and len(running) < max_workers:
+                estimate = estimates[next_to_submit]
+                if budget is not None and running and memory_in_use + estimate > budget:
+                    break
+                fn, file_path = jobs[next_to_submit]
+                running[executor.submit(run_captured, fn, file_path)] = next_to_submit
+                memory_in_use += estimate
+                next_to_submit += 1
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                memory_in_use -= estimates[index]
+                outputs[index], results[index] = future.result()
+
+            # Flush output for every finished job whose predecessors are printed
+            while next_to_print in outputs:
+                print(outputs.pop(next_to_print), end='', flush=True)
+                next_to_print += 1
+    return results
@@ -0,0 +1,239 @@
+import heapq
+import json
+import math
+import os
+import pickle
+import sys
+import tempfile
+from operator import itemgetter
+from typing import List, Dict, Any, Tuple, Optional, Callable, Iterator, Sequence
+
+from prefetch_reader import dataset_stem
+
+# Sort-based group-by for groupings with about one group per row, like
+# (page_id, ad_id) on the ads export.
+#
+# A hash group-by keeps one set of accumulators per group for the whole scan. Here the
+# scan only collects the parsed records. They are sorted by group key in runs that fit
+# the policy's memory budget, and every full run is written to a temporary spill file.
+# Afterwards the runs are merged (heapq.merge) and each group is aggregated as soon as
+# its last record has been read. Only one group's accumulators exist at a time, and
+# results can be written to a JSON Lines file as they are produced.
+#
+# Records keep their file order within a group (stable sorts, stable merge), so every
+# group gets exactly the stats the hash group-by would give it. Groups come out sorted
+# by key: None first, then numbers, then NaN, then strings.
+
+SPILL_CHUNK_ROWS = 10_000 # Records per pickle.dump in a spill file
+SIZE_SAMPLE_EVERY = 64    # Measure one record in this many to estimate run memory
+
+# --- Helper Functions ---
+
+# Sortable stand-in for a group key (parsed values may mix None, floats and strings)
+def sort_key(key: Tuple) -> Tuple:
+    sortable = []
+    for value in key:
+        if value is None:
+            sortable.append((0, 0.0))
+        elif isinstance(value, float):
+            sortable.append((2, 0.0) if math.isnan(value) else (1, value))
+        else:
+            sortable.append((3, value))
+    return tuple(sortable)
+
+# Rough in-memory size of one collected record (the list, its values and the key tuple)
+def record_bytes(values: List[Any]) -> int:
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values) + 200
+
+# --- Policy ---
+
+class SortGroupPolicy:
+    """
+    Decides which groupings are computed by sorting instead of hashing.
+    groupings lists the key lists to sort (e.g. [['page_id', 'ad_id']]); None sorts
+    every grouping with more than one key. Runs are spilled to spill_dir (the system
+    temp directory if None) once the records collected for one grouping exceed
+    memory_budget_mb, and group results are written to output_dir (next to the CSV
+    file if None): JSON Lines from the pure-Python engine, CSV from pandas.
+    """
+
+    def __init__(self, groupings: Optional[Sequence[Sequence[str]]] = None, memory_budget_mb: float = 256, spill_dir: Optional[str] = None, output_dir: Optional[str] = None):
+        if memory_budget_mb <= 0:
+            raise ValueError("memory_budget_mb must be positive.")
+        self.groupings = None if groupings is None else [tuple(keys) for keys in groupings]
+        self.memory_budget_mb = memory_budget_mb
+        self.spill_dir = spill_dir
+        self.output_dir = output_dir
+
+    def applies_to(self, keys: Sequence[str]) -> bool:
+        if self.groupings is None:
+            return len(keys) > 1
+        return tuple(keys) in self.groupings
+
+    def output_path(self, file_path: str, keys: Sequence[str], extension: str = '.jsonl') -> str:
+        directory = self.output_dir or os.path.dirname(os.path.abspath(file_path))
+        name = dataset_stem(file_path, tag_compression=True)
+        return os.path.join(directory, f"{name}_grouped_by_{'_'.join(keys)}{extension}")
+
+# --- External sort ---
+
+class ExternalSorter:
+    """
+    Collects (group key, parsed record) pairs for one grouping and returns them sorted
+    by key, spilling sorted runs to temporary files when over the memory budget.
+    """
+
+    def __init__(self, headers: List[str], keys: Sequence[str], policy: SortGroupPolicy):
+        self.keys = tuple(keys)
+        # Missing key columns group under None, as group_by does
+        self.key_indices = [headers.index(k) if k in headers else None for k in keys]
+        self.policy = policy
+        self.budget_bytes = policy.memory_budget_mb * 1024 * 1024
+        self.run = []
+        self.sampled = 0       # Records of the current run measured so far
+        self.sampled_bytes = 0 # and their size
+        self.runs = []         # Spill files, each holding one sorted run
+
+    def add(self, values: List[Any]) -> None:
+        key = tuple(values[i] if i is not None else None for i in self.key_indices)
+        self.run.append((sort_key(key), key, values))
+        if len(self.run) % SIZE_SAMPLE_EVERY == 1:
+            self.sampled += 1
+            self.sampled_bytes += record_bytes(values)
+            if self.sampled_bytes * len(self.run) > self.budget_bytes * self.sampled:
+                self.spill()
+
+    def spill(self) -> None:
+        """
+        Sorts the current run and writes it to a new temporary file.
+        """
+        self.run.sort(key=itemgetter(0))
+        spill_file = tempfile.TemporaryFile(dir=self.policy.spill_dir)
+        for start in range(0, len(self.run), SPILL_CHUNK_ROWS):
+            pickle.dump(self.run[start:start + SPILL_CHUNK_ROWS], spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.runs.append(spill_file)
+        self.run = []
+        self.sampled = 0
+        self.sampled_bytes = 0
+
+    @staticmethod
+    def read_run(spill_file) -> Iterator[Tuple]:
+        spill_file.seek(0)
+        while True:
+            try:
+                chunk = pickle.load(spill_file)
+            except EOFError:
+                return
+            yield from chunk
+
+    def sorted_records(self) -> Iterator[Tuple]:
+        """
+        Yields (sort key, key, values) in key order, records of a group in file order.
+        Can be called again after a full pass.
+        """
+        if self.run:
+            self.run.sort(key=itemgetter(0))
+        if not self.runs:
+            return iter(self.run)
+        # Spilled runs come first in file order, the in-memory tail run last
+        return heapq.merge(*[self.read_run(f) for f in self.runs], iter(self.run), key=itemgetter(0))
+
+    def close(self) -> None:
+        for spill_file in self.runs:
+            spill_file.close()
+        self.runs = []
+        self.run = []
+
+class SortedGroups:
+    """
+    Group summaries of a sorted grouping, computed while they are iterated.
+    items() yields (group key, summary) like dict.items() on analyze_groups' output, in
+    key order; each pass merges the runs again. new_aggregator() must return an object
+    with add_values and overall_summary (a HashAggregator without groupings).
+    """
+
+    def __init__(self, sorter: ExternalSorter, new_aggregator: Callable[[], Any]):
+        self.sorter = sorter
+        self.new_aggregator = new_aggregator
+        self.keys = sorter.keys
+
+    def items(self) -> Iterator[Tuple[Tuple, Dict[str, Dict[str, Any]]]]:
+        current = None
+        aggregator = None
+        key = None
+        for sortable, record_key, values in self.sorter.sorted_records():
+            if sortable != current:
+                if aggregator is not None:
+                    yield key, aggregator.overall_summary()
+                current, key, aggregator = sortable, record_key, self.new_aggregator()
+            aggregator.add_values(values)
+        if aggregator is not None:
+            yield key, aggregator.overall_summary()
+
+    def write_jsonl(self, path: str) -> int:
+        """
+        Writes one {"group": [...], "stats": {...}} line per group and returns the
+        number of groups.
+        """
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for key, summary in self.items():
+                f.write(json.dumps({'group': list(key), 'stats': summary}))
+                f.write('\n')
+                count += 1
+        return count
+
+    def close(self) -> None:
+        self.sorter.close()
+
+# --- pandas ---
+
+DESCRIBE_STATS = ('count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max')
+
+# groupby(keys)[numeric_cols].describe() of one chunk, from vectorized aggregations
+def describe_chunk(chunk, keys: List[str], numeric_cols: List[str]):
+    """
+    describe() runs a separate describe per group (milliseconds each, so near-unique
+    keys take minutes). One agg() and three quantile() calls over the whole chunk
+    give the same numbers. Columns are named '<column>_<stat>' in describe's order.
+    """
+    import pandas as pd
+    grouped = chunk.groupby(keys, sort=False, dropna=False)[numeric_cols]
+    aggregated = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+    stats = {stat: aggregated.xs(stat, axis=1, level=1) for stat in ('count', 'mean', 'std', 'min', 'max')}
+    stats['count'] = stats['count'].astype('float64') # describe() reports counts as floats
+    for label, p in (('25%', 0.25), ('50%', 0.5), ('75%', 0.75)):
+        stats[label] = grouped.quantile(p)
+    # Both aggregations list the groups in the same (sorted, first-seen) order
+    columns = {f"{col}_{stat}": stats[stat][col].to_numpy() for col in numeric_cols for stat in DESCRIBE_STATS}
+    return pd.DataFrame(columns, index=aggregated.index)
+
+# Sort-based replacement for df.groupby(keys).describe(), written to CSV in chunks
+def describe_groups_pandas_sorted(df, keys: List[str], path: str, chunk_rows: int = 100_000) -> int:
+    """
+    Sorts the rows by keys, then describes the groups of about chunk_rows rows at a
+    time (chunks end on a group boundary) and appends them to a CSV file with one row
+    per group and one column per (column, stat). Returns the number of groups. Unlike
+    groupby().describe().transpose(), no frame with one column per group is built,
+    and each chunk is described with vectorized aggregations (describe_chunk).
+    """
+    import numpy as np
+    numeric_cols = [col for col in df.select_dtypes(include='number').columns if col not in keys]
+    ordered = df[keys + numeric_cols].sort_values(keys, kind='stable', na_position='first', ignore_index=True)
+    # Row positions where a new group starts (groups are contiguous after the sort)
+    codes = ordered.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    starts = [0] + (np.flatnonzero(np.diff(codes)) + 1).tolist() + [len(ordered)] if len(ordered) else [0]
+    group_count = 0
+    start_index = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        while start_index < len(starts) - 1:
+            # Extend the chunk to the first group start at or after chunk_rows rows
+            begin = starts[start_index]
+            end_index = start_index + 1
+            while end_index < len(starts) - 1 and starts[end_index] - begin < chunk_rows:
+                end_index += 1
+            described = describe_chunk(ordered.iloc[begin:starts[end_index]], keys, numeric_cols)
+            described.to_csv(f, header=group_count == 0)
+            group_count += len(described)
+            start_index = end_index
+    return group_count
@@ -0,0 +1,154 @@
+import csv
+import hashlib
+import os
+import pickle
+from typing import List, Dict, Any, Tuple, Optional
+
+from Pure_Python_Stats import HashAggregator, column_converters, read_csv_headers
+from nested_columns import NestedPolicy
+from parallel_stats import READ_BLOCK_SIZE, find_chunk_boundaries, open_byte_range
+from quantiles import QuantilePolicy
+from sketches import SketchPolicy
+
+# Incremental re-analysis of CSV exports that grow by appending rows.
+#
+# After each run the HashAggregator (count, running sum, Welford mean/M2, min/max and
+# Counters per column, overall and per group) is pickled into a state file together
+# with the byte offset of the last complete record and a hash of every byte before it.
+# The next run checks that hash, parses only the bytes appended since and keeps feeding
+# the same aggregator, so the result is bit-for-bit what a cold sequential scan of the
+# whole file gives (the accumulators are resumed, not merged). If the header, the
+# prefix hash, the groupings or the sketch / quantile / nested policies differ, or the file has shrunk, the
+# state is discarded and the file is analyzed from the start.
+#
+# State files are plain pickles written by this module; only point state_dir at a
+# directory you trust.
+
+STATE_VERSION = 2
+
+# --- Helper Functions ---
+
+# Path of the state file for one CSV
+def state_path(csv_path: str, state_dir: str) -> str:
+    csv_path = os.path.abspath(csv_path)
+    tag = hashlib.blake2b(csv_path.encode('utf-8'), digest_size=6).hexdigest()
+    return os.path.join(state_dir, f"{os.path.basename(csv_path)}.{tag}.state")
+
+# Feed bytes [start, end) of a file into a hash object
+def update_hash(digest, filepath: str, start: int, end: int) -> None:
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+
+# Offset just after the last complete record in [start, end of file)
+def last_record_end(filepath: str, start: int) -> int:
+    """
+    start must be a record boundary. Uses the same quote-parity rule as
+    parallel_stats.find_chunk_boundaries: a newline ends a record only when an even
+    number of '"' bytes precede it. A final record without a trailing newline (for
+    example one that is still being written) is not complete.
+    """
+    boundary = start
+    in_quotes = 0
+    offset = start
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            pos = 0
+            newline = block.find(b'\n')
+            while newline != -1:
+                in_quotes ^= block.count(b'"', pos, newline) & 1
+                pos = newline + 1
+                if not in_quotes:
+                    boundary = offset + pos
+                newline = block.find(b'\n', pos)
+            in_quotes ^= block.count(b'"', pos) & 1
+            offset += len(block)
+    return boundary
+
+# Settings a saved state must have been built with to be reused
+def state_settings(headers: List[str], grouping_sets: List[List[str]], sketch_policy: Optional[SketchPolicy], quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None) -> Dict[str, Any]:
+    return {
+        'version': STATE_VERSION,
+        'headers': list(headers),
+        'grouping_sets': [list(keys) for keys in grouping_sets],
+        'sketch_policy': vars(sketch_policy) if sketch_policy is not None else None,
+        'quantile_policy': vars(quantile_policy) if quantile_policy is not None else None,
+        'nested_policy': vars(nested_policy) if nested_policy is not None else None
+    }
+
+# Load a state file, or None if it is missing or unreadable
+def load_state(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+# Write a state file atomically
+def save_state(path: str, state: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp, path)
+
+# Parse the records in bytes [start, end) into an aggregator
+def aggregate_range(aggregator: HashAggregator, filepath: str, start: int, end: int) -> None:
+    if end <= start:
+        return
+    with open_byte_range(filepath, start, end) as text:
+        for record in csv.reader(text):
+            if record: # Skip blank lines, as iter_csv_records does
+                aggregator.add_record(record)
+
+# --- Driver ---
+
+# Overall + grouped analysis that only parses rows appended since the last run
+def analyze_csv_incremental(filepath: str, grouping_sets: List[List[str]], state_dir: str, sketch_policy: Optional[SketchPolicy] = None, schema: Optional[Dict[str, str]] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None) -> Tuple[List[str], int, Dict[str, Dict[str, Any]], Dict[Tuple, Dict], int]:
+    """
+    Returns (headers, row_count, overall_summary, {tuple(keys): group_summaries},
+    reused_rows), the first four exactly as analyze_csv_grouped returns them.
+    reused_rows is the number of rows taken from the saved state (0 on a full scan).
+    The scan is always sequential so resumed results equal a cold run.
+    """
+    headers = read_csv_headers(filepath)
+    settings = state_settings(headers, grouping_sets, sketch_policy, quantile_policy, nested_policy)
+    path = state_path(filepath, state_dir)
+    file_size = os.path.getsize(filepath)
+
+    # Resume from the saved state if it was built from a prefix of this file
+    digest = hashlib.blake2b(digest_size=32)
+    state = load_state(path)
+    aggregator = None
+    if state is not None and state.get('settings') == settings and state['offset'] <= file_size:
+        update_hash(digest, filepath, 0, state['offset'])
+        if digest.hexdigest() == state['prefix_hash']:
+            aggregator = state['aggregator']
+            aggregator.converters = column_converters(headers, schema) # Parsing only, results are unaffected
+            offset = state['offset']
+    if aggregator is None:
+        digest = hashlib.blake2b(digest_size=32)
+        offset, _ = find_chunk_boundaries(filepath, 1)
+        update_hash(digest, filepath, 0, offset)
+        aggregator = HashAggregator(headers, grouping_sets, sketch_policy=sketch_policy, schema=schema, quantile_policy=quantile_policy, nested_policy=nested_policy)
+    reused_rows = aggregator.row_count
+
+    # Complete records are saved; an unterminated last record is only reported
+    boundary = last_record_end(filepath, offset)
+    aggregate_range(aggregator, filepath, offset, boundary)
+    update_hash(digest, filepath, offset, boundary)
+    save_state(path, {'settings': settings, 'offset': boundary, 'prefix_hash': digest.hexdigest(), 'aggregator': aggregator})
+    aggregate_range(aggregator, filepath, boundary, file_size)
+
+    grouped = {tuple(keys): aggregator.group_summaries(keys) for keys in grouping_sets}
+    return headers, aggregator.row_count, aggregator.overall_summary(), grouped, reused_rows
@@ -0,0 +1,224 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Any, Callable, Iterator, Optional
+
+# Lightweight per-stage instrumentation (load, parse, aggregate, report).
+#
+# A StageRecorder collects, per stage name: number of calls, wall time, CPU time,
+# rows processed and (with trace_memory) the tracemalloc peak inside the stage.
+# Code is instrumented with the stage() context manager or the @instrumented
+# decorator; both report to the recorder that is currently active in this process
+# and cost one global lookup when none is (the default). Stages may nest; an outer
+# stage's time and memory peak include its inner stages.
+#
+# A recorder can also write a cProfile/pstats dump and a Chrome trace-event JSON
+# (open in chrome://tracing or https://ui.perfetto.dev) for its whole run.
+# tracemalloc slows Python code down considerably, so trace_memory is off by default;
+# it only sees memory allocated through Python, not Polars' native buffers.
+
+_active = None # The StageRecorder currently recording in this process, if any
+
+class StageRecord:
+    """
+    Totals of one stage name.
+    """
+    __slots__ = ('calls', 'wall_s', 'cpu_s', 'rows', 'peak_mb')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.rows = None
+        self.peak_mb = None
+
+    def add_rows(self, rows: Optional[int]) -> None:
+        if rows is not None:
+            self.rows = (self.rows or 0) + rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'wall_s': self.wall_s, 'cpu_s': self.cpu_s, 'rows': self.rows, 'peak_mb': self.peak_mb}
+
+class StageRecorder:
+    """
+    Records the stages of one dataset's run. Use as a context manager to make it
+    the active recorder; profile_path / trace_path (optional) are written on exit.
+    """
+
+    def __init__(self, name: str, trace_memory: bool = False, profile_path: Optional[str] = None, trace_path: Optional[str] = None):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.profile_path = profile_path
+        self.trace_path = trace_path
+        self.stages = {}
+        self.events = []
+        self.memory_stack = [] # Highest peak seen by finished inner stages, per open stage
+        self.profiler = None
+        self.started_tracemalloc = False
+        self.previous = None
+        self.origin = time.perf_counter()
+
+    def __enter__(self) -> 'StageRecorder':
+        global _active
+        self.previous, _active = _active, self
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        if self.profile_path:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.origin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _active
+        _active = self.previous
+        if self.profiler is not None:
+            self.profiler.disable()
+            os.makedirs(os.path.dirname(os.path.abspath(self.profile_path)), exist_ok=True)
+            self.profiler.dump_stats(self.profile_path)
+            self.profiler = None
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        if self.trace_path:
+            self.write_chrome_trace(self.trace_path)
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[StageRecord]:
+        record = self.stages.get(name)
+        if record is None:
+            record = StageRecord()
+            self.stages[name] = record
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            # Remember the enclosing stage's peak so far before resetting it
+            if self.memory_stack:
+                self.memory_stack[-1] = max(self.memory_stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.memory_stack.append(0)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            record.calls += 1
+            record.wall_s += wall
+            record.cpu_s += time.process_time() - cpu_start
+            record.add_rows(rows)
+            if tracing:
+                peak = max(self.memory_stack.pop(), tracemalloc.get_traced_memory()[1])
+                record.peak_mb = max(record.peak_mb or 0.0, peak / (1024 * 1024))
+                if self.memory_stack:
+                    self.memory_stack[-1] = max(self.memory_stack[-1], peak)
+            if self.trace_path:
+                self.events.append({'name': name, 'ph': 'X', 'ts': (wall_start - self.origin) * 1e6, 'dur': wall * 1e6, 'pid': os.getpid(), 'tid': threading.get_ident()})
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns {stage_name: {calls, wall_s, cpu_s, rows, peak_mb}} in first-run order.
+        """
+        return {name: record.to_dict() for name, record in self.stages.items()}
+
+    def print_summary(self) -> None:
+        print(f"\n=== Stage timings: {self.name} ===")
+        print(f"  {'stage':<24} {'calls':>7} {'wall s':>10} {'cpu s':>10} {'rows':>12} {'peak MiB':>10}")
+        for name, record in self.stages.items():
+            rows = f"{record.rows:,}" if record.rows is not None else "-"
+            peak = f"{record.peak_mb:.1f}" if record.peak_mb is not None else "-"
+            print(f"  {name:<24} {record.calls:>7} {record.wall_s:>10.4f} {record.cpu_s:>10.4f} {rows:>12} {peak:>10}")
+
+    def write_chrome_trace(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms', 'otherData': {'dataset': self.name}}, f)
+
+class Instrumentation:
+    """
+    Instrumentation settings shared by all datasets of a run; picklable, so it can be
+    passed to dataset_scheduler workers. recorder() makes the StageRecorder for one
+    dataset, with its cProfile dump / Chrome trace named after the dataset file.
+    """
+
+    def __init__(self, trace_memory: bool = False, profile_dir: Optional[str] = None, trace_dir: Optional[str] = None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.trace_dir = trace_dir
+
+    def recorder(self, dataset_name: str) -> StageRecorder:
+        base = os.path.splitext(os.path.basename(dataset_name))[0]
+        profile_path = os.path.join(self.profile_dir, f"{base}.pstats") if self.profile_dir else None
+        trace_path = os.path.join(self.trace_dir, f"{base}.trace.json") if self.trace_dir else None
+        return StageRecorder(dataset_name, self.trace_memory, profile_path, trace_path)
+
+# --- Hooks used by the analysis code ---
+
+# Record a stage on the active recorder (does nothing when none is active)
+@contextmanager
+def stage(name: str, rows: Optional[int] = None) -> Iterator[StageRecord]:
+    """
+    Yields the stage's StageRecord, so rows known only at the end can be added with
+    record.add_rows(n); without an active recorder the record is simply discarded.
+    """
+    if _active is None:
+        yield StageRecord()
+        return
+    with _active.stage(name, rows) as record:
+        yield record
+
+# Decorator form of stage() for whole functions
+def instrumented(name: str) -> Callable:
+    def decorate(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return fn(*args, **kwargs)
+            with _active.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Give a per-dataset function an instrumentation=None keyword that records its stages
+def records_stages(fn: Callable) -> Callable:
+    """
+    For functions called as fn(file_path, ..., dataset_name=None, ...) that print their
+    report: with instrumentation set, the stages run inside the call are recorded and
+    the timing table is printed after the report.
+    """
+    @wraps(fn)
+    def wrapper(file_path: str, *args, instrumentation: Optional[Instrumentation] = None, **kwargs):
+        recorder = recorder_for(instrumentation, kwargs.get('dataset_name') or file_path)
+        with recorder:
+            result = fn(file_path, *args, **kwargs)
+        recorder.print_summary()
+        return result
+    return wrapper
+
+# Recorder for a dataset, or a no-op context when instrumentation is off
+def recorder_for(instrumentation: Optional[Instrumentation], dataset_name: str):
+    if instrumentation is None:
+        return NullRecorder()
+    return instrumentation.recorder(dataset_name)
+
+class NullRecorder:
+    """
+    Stand-in for StageRecorder when instrumentation is off.
+    """
+
+    def __enter__(self) -> 'NullRecorder':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+    def print_summary(self) -> None:
+        pass
@@ -0,0 +1,333 @@
+import json
+import os
+from typing import List, Dict, Any, Optional, Sequence, Set
+
+from comparative_stats import join_key
+from prefetch_reader import dataset_stem
+
+# Declarative analysis jobs for stats_cli.py.
+#
+# A job spec is a JSON file listing datasets and, for each one, the columns to
+# summarise, the groupings, row filters and the statistics to report:
+#
+#   {
+#     "engine": "polars",
+#     "output": "job_summary.json",
+#     "datasets": [
+#       {
+#         "name": "fb_ads",
+#         "path": "2024_fb_ads_president_scored_anon.csv",
+#         "columns": ["spend", "impressions"],
+#         "group_by": [["page_id"]],
+#         "filters": [{"column": "ad_creation_time", "op": ">=", "value": "2024-09-01"}],
+#         "stats": ["count", "mean", "max"]
+#       }
+#     ]
+#   }
+#
+# Only the referenced columns (summarised, grouping and filter columns) are read and
+# parsed, and filters drop rows before they are aggregated. See job_spec.example.json
+# for the three datasets of the standalone scripts.
+#
+# Stats are reported with the keys of Pure_Python_Stats.compute_stats. Polars and
+# pandas only report the keys that apply to a column's type (numeric or not).
+# Group key columns are read as text by every engine and grouped by their join_key
+# (comparative_stats.py), so ids above 2**53 are not rounded through floats. Groups are
+# keyed by group_key_text, a JSON list of those texts (["10000000"], not
+# "(10000000.0,)"), so a job writes the same keys whichever engine runs it.
+#
+# A spec can also list comparisons: per-key stats of several datasets side by side,
+# joined on a shared key such as the Facebook page id (comparative_stats.py):
+#
+#   "comparisons": [
+#     {"name": "fb_pages", "keys": {"fb_ads": "page_id", "fb_posts": "Facebook_Id"}, "how": "inner"}
+#   ]
+
+JOB_ENGINES = ('python', 'polars', 'pandas')
+FILTER_OPS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'contains')
+STAT_NAMES = ('count', 'mean', 'min', 'max', 'stddev', 'unique', 'most_common', 'quantiles')
+DEFAULT_STATS = ('count', 'mean', 'min', 'max', 'stddev', 'unique', 'most_common')
+
+# compute_stats keys reported for each stat name
+STAT_KEYS = {
+    'count': ('total_count', 'numeric_count', 'non_numeric_count'),
+    'mean': ('mean',),
+    'min': ('min',),
+    'max': ('max',),
+    'stddev': ('stddev',),
+    'unique': ('unique_non_numeric', 'non_numeric_approximate'),
+    'most_common': ('most_common_non_numeric', 'non_numeric_approximate'),
+    'quantiles': ('quantiles', 'quantiles_approximate')
+}
+
+STAT_SEPARATOR = '\x1f' # Between column and stats key in the engines' aggregate names
+COMPARISON_JOINS = ('inner', 'outer')
+
+# --- Filters ---
+
+class RowFilter:
+    """
+    One row condition: column op value. Comparisons follow Python / the engine's
+    ordering, 'in' takes a list of values and 'contains' a substring. Missing values
+    (and, in the pure-Python engine, values that cannot be compared with value) never
+    match, as in SQL.
+    """
+
+    def __init__(self, column: str, op: str, value: Any):
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unknown filter op '{op}'. Expected one of {', '.join(FILTER_OPS)}.")
+        if op == 'in' and not isinstance(value, (list, tuple)):
+            raise ValueError(f"Filter on '{column}': 'in' needs a list of values.")
+        if op == 'contains' and not isinstance(value, str):
+            raise ValueError(f"Filter on '{column}': 'contains' needs a string.")
+        self.column = column
+        self.op = op
+        self.value = list(value) if op == 'in' else value
+
+    def matches(self, value: Any) -> bool:
+        """
+        Tests one value as parsed by the pure-Python engine (None, float or str).
+        """
+        if value is None:
+            return False
+        op = self.op
+        try:
+            if op == '==':
+                return value == self.value
+            if op == '!=':
+                return value != self.value
+            if op == '<':
+                return value < self.value
+            if op == '<=':
+                return value <= self.value
+            if op == '>':
+                return value > self.value
+            if op == '>=':
+                return value >= self.value
+            if op == 'in':
+                return value in self.value
+            return isinstance(value, str) and self.value in value
+        except TypeError:
+            return False
+
+    def numeric(self) -> bool:
+        """
+        True if the value (every value for 'in') is a number.
+        """
+        values = self.value if self.op == 'in' else [self.value]
+        return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+
+    def polars_expr(self, text_column: bool = False):
+        """
+        text_column: the column was read as text (a key column); numeric values are
+        then compared with it parsed as a number, as the other engines do.
+        """
+        import polars as pl
+        col = pl.col(self.column)
+        value = self.value
+        if text_column and self.numeric() and self.op != 'contains':
+            col = col.cast(pl.Float64, strict=False)
+            value = [float(v) for v in value] if self.op == 'in' else float(value)
+        if self.op == 'in':
+            return col.is_in(value)
+        if self.op == 'contains':
+            return col.cast(pl.Utf8).str.contains(self.value, literal=True)
+        return {
+            '==': col == value, '!=': col != value,
+            '<': col < value, '<=': col <= value,
+            '>': col > value, '>=': col >= value
+        }[self.op]
+
+    def pandas_mask(self, series, text_column: bool = False):
+        """
+        text_column as in polars_expr.
+        """
+        import pandas as pd
+        if text_column and self.numeric() and self.op != 'contains':
+            series = pd.to_numeric(series, errors='coerce')
+        if self.op == 'in':
+            return series.isin(self.value)
+        if self.op == 'contains':
+            return series.astype('string').str.contains(self.value, regex=False, na=False)
+        mask = {
+            '==': series == self.value, '!=': series != self.value,
+            '<': series < self.value, '<=': series <= self.value,
+            '>': series > self.value, '>=': series >= self.value
+        }[self.op]
+        return mask & series.notna()
+
+# --- Spec ---
+
+class DatasetSpec:
+    """
+    One dataset of a job: columns to summarise (None for all), groupings (lists of
+    key columns), filters (all must match) and stat names from STAT_NAMES.
+    """
+
+    def __init__(self, name: str, path: str, columns: Optional[Sequence[str]] = None, group_by: Sequence[Sequence[str]] = (), filters: Sequence[RowFilter] = (), stats: Sequence[str] = DEFAULT_STATS):
+        for stat in stats:
+            if stat not in STAT_NAMES:
+                raise ValueError(f"Unknown stat '{stat}' in dataset '{name}'. Expected one of {', '.join(STAT_NAMES)}.")
+        self.name = name
+        self.path = path
+        self.columns = None if columns is None else list(columns)
+        self.group_by = [list(keys) for keys in group_by]
+        self.filters = list(filters)
+        self.stats = list(stats)
+
+    def summary_columns(self, headers: Sequence[str]) -> List[str]:
+        """
+        Columns to report, in file order (columns missing from the file are skipped).
+        """
+        if self.columns is None:
+            return list(headers)
+        return [h for h in headers if h in self.columns]
+
+    def referenced_columns(self, headers: Sequence[str]) -> List[str]:
+        """
+        Columns the engines need to read, in file order: the summarised columns plus
+        grouping and filter columns.
+        """
+        if self.columns is None:
+            return list(headers)
+        needed = set(self.columns)
+        needed.update(k for keys in self.group_by for k in keys)
+        needed.update(f.column for f in self.filters)
+        return [h for h in headers if h in needed]
+
+    def key_columns(self) -> Set[str]:
+        """
+        Columns of the groupings, which the engines read as text.
+        """
+        return {k for keys in self.group_by for k in keys}
+
+    def stat_keys(self) -> Set[str]:
+        return {key for stat in self.stats for key in STAT_KEYS[stat]}
+
+    def select_stats(self, summary: Dict[str, Dict[str, Any]], headers: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Keeps the summarised columns and requested stats of a {column: stats} summary.
+        """
+        keys = self.stat_keys()
+        return {col: {key: value for key, value in summary[col].items() if key in keys}
+                for col in self.summary_columns(headers) if col in summary}
+
+class Comparison:
+    """
+    Per-key stats of two or more datasets side by side. keys maps each dataset name to
+    its key column; every dataset is summarised per key value with its own columns,
+    filters and stats, and the summaries are joined on the key. 'inner' keeps the keys
+    found in every dataset, 'outer' those found in any. With output, the joined keys
+    are written to that JSON Lines file instead of the results.
+    """
+
+    def __init__(self, name: str, keys: Dict[str, str], how: str = 'inner', output: Optional[str] = None):
+        if len(keys) < 2:
+            raise ValueError(f"Comparison '{name}' needs a key column for at least two datasets.")
+        if how not in COMPARISON_JOINS:
+            raise ValueError(f"Unknown join '{how}' in comparison '{name}'. Expected 'inner' or 'outer'.")
+        self.name = name
+        self.keys = dict(keys)
+        self.how = how
+        self.output = output
+
+class JobSpec:
+    """
+    A whole job: its datasets and comparisons, the engine that runs them, where the
+    JSON results go, the schema setting (as in the scripts' main blocks) and how many
+    datasets run at once.
+    """
+
+    def __init__(self, datasets: Sequence[DatasetSpec], engine: str = 'python', output: Optional[str] = None, schema: Any = 'infer', workers: Optional[int] = None, comparisons: Sequence[Comparison] = ()):
+        if engine not in JOB_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Expected 'python', 'polars' or 'pandas'.")
+        names = [dataset.name for dataset in datasets]
+        # Comparison results sit next to the dataset results, so all names are shared
+        all_names = names + [comparison.name for comparison in comparisons]
+        if len(set(all_names)) != len(all_names):
+            raise ValueError("Dataset and comparison names in a job spec must be unique.")
+        for comparison in comparisons:
+            unknown = set(comparison.keys) - set(names)
+            if unknown:
+                raise ValueError(f"Comparison '{comparison.name}' refers to unknown dataset(s): {', '.join(sorted(unknown))}")
+        self.datasets = list(datasets)
+        self.comparisons = list(comparisons)
+        self.engine = engine
+        self.output = output
+        self.schema = schema
+        self.workers = workers
+
+# Read a job spec file; relative dataset and output paths are relative to the file
+def load_job_spec(spec_path: str) -> JobSpec:
+    with open(spec_path, encoding='utf-8') as f:
+        spec = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(spec_path))
+    datasets = []
+    for i, entry in enumerate(spec.get('datasets', [])):
+        if 'path' not in entry:
+            raise ValueError(f"Dataset {i} in {spec_path} has no 'path'.")
+        filters = [RowFilter(f['column'], f['op'], f.get('value')) for f in entry.get('filters', [])]
+        datasets.append(DatasetSpec(
+            name=entry.get('name') or dataset_stem(entry['path']),
+            path=os.path.join(base_dir, entry['path']),
+            columns=entry.get('columns'),
+            group_by=entry.get('group_by', []),
+            filters=filters,
+            stats=entry.get('stats', DEFAULT_STATS)
+        ))
+    comparisons = []
+    for i, entry in enumerate(spec.get('comparisons', [])):
+        if 'keys' not in entry:
+            raise ValueError(f"Comparison {i} in {spec_path} has no 'keys'.")
+        comparisons.append(Comparison(
+            name=entry.get('name') or '_'.join(entry['keys']),
+            keys=entry['keys'],
+            how=entry.get('how', 'inner'),
+            output=os.path.join(base_dir, entry['output']) if entry.get('output') else None
+        ))
+    output = spec.get('output')
+    return JobSpec(datasets, engine=spec.get('engine', 'python'), output=os.path.join(base_dir, output) if output else None,
+                   schema=spec.get('schema', 'infer'), workers=spec.get('workers'), comparisons=comparisons)
+
+# --- Engine results ---
+
+# {column: {key: value}} from a row of aggregates named column, key (and label) joined by STAT_SEPARATOR
+def unpack_stats(row: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    'spend\\x1fmean' becomes summary['spend']['mean'] and 'spend\\x1fquantiles\\x1fp50'
+    summary['spend']['quantiles']['p50']. NumPy scalars are converted to Python values.
+    """
+    summary = {}
+    for name, value in row.items():
+        parts = name.split(STAT_SEPARATOR)
+        if len(parts) < 2:
+            continue
+        value = value.item() if hasattr(value, 'item') else value
+        stats = summary.setdefault(parts[0], {})
+        if len(parts) == 3:
+            stats.setdefault(parts[1], {})[parts[2]] = value
+        else:
+            stats[parts[1]] = value
+    return summary
+
+# Name of a grouping in the results, as in process_dataset ('grouped_by_page_id_ad_id')
+def grouping_name(keys: Sequence[str]) -> str:
+    return f"grouped_by_{'_'.join(keys)}"
+
+# Text of one group's key values in the results, the same for every engine ('["10000000", "abc"]')
+def group_key_text(key: Sequence[Any]) -> str:
+    """
+    The engines pass the key columns' text (already join keys); numbers are still
+    written without a trailing ".0" when integral, and each value goes through
+    comparative_stats.join_key. Missing values (None, NaN) become null.
+    """
+    texts = []
+    for value in key:
+        value = value.item() if hasattr(value, 'item') else value
+        if isinstance(value, float):
+            if value != value:
+                value = None
+            elif value.is_integer():
+                value = int(value)
+        texts.append(None if value is None else join_key(str(value)))
+    return json.dumps(texts)
@@ -0,0 +1,195 @@
+import mmap
+from typing import List, Any, Callable, Iterator, Optional, Tuple
+
+# CSV records tokenized straight from a memory-mapped file, for load_csv's columnar path.
+#
+# The file is mapped read-only instead of being decoded into Python text, so the OS
+# page cache is the only copy of the raw data and pages already parsed can be dropped
+# again under memory pressure. Records come out as lists of bytes fields:
+#   - A record without a quote is cut from the map at the next newline and split on
+#     commas (both in C).
+#   - A record with quotes is split on quotes and then commas when every quote opens
+#     or closes a field (split_quoted_line). Others (fields with newlines, stray
+#     quotes) go through parse_quoted_record, which follows csv.reader's default
+#     dialect: "" inside quotes is a quote, quoted fields may contain commas and
+#     newlines, and text after a closing quote is kept.
+# Records end at \n or \r\n (not a lone \r); blank lines are skipped, as in
+# iter_csv_records.
+#
+# Python's float() cannot parse a memoryview, so each field is still a small bytes
+# copy. The saving is in what is not allocated per cell: bytes_converter parses numeric
+# fields with float(bytes) without decoding them to str, and text columns decode a
+# distinct value only once (BYTES_CACHE_SIZE). csv.DictReader builds a str for every
+# cell plus a dict per row.
+#
+# The tokenizer itself is Python, so it only wins where parsing dominates: on mostly
+# numeric files with few quoted fields it loads 10-25% faster than csv.reader, but on
+# exports where most rows quote a JSON column it is slower. Hence load_csv's use_mmap
+# is opt-in.
+
+BLOCK_SIZE = 1 << 16 # Bytes of whole lines split at a time
+BYTES_CACHE_SIZE = 65_536 # Distinct raw values remembered per text column
+QUOTE = ord('"')
+COMMA = ord(',')
+MISSING = object()
+
+# --- Tokenizer ---
+
+# Parse one record that contains a quote, starting at pos; returns (fields, next pos)
+def parse_quoted_record(buffer: mmap.mmap, pos: int, size: int) -> Tuple[List[bytes], int]:
+    fields = []
+    while True:
+        if pos < size and buffer[pos] == QUOTE:
+            parts = []
+            pos += 1
+            while True:
+                end = buffer.find(b'"', pos)
+                if end == -1: # Unclosed quote: csv.reader ends the field at end of file
+                    parts.append(buffer[pos:size])
+                    fields.append(b''.join(parts))
+                    return fields, size
+                parts.append(buffer[pos:end])
+                if buffer[end + 1:end + 2] == b'"': # Escaped quote
+                    parts.append(b'"')
+                    pos = end + 2
+                    continue
+                pos = end + 1
+                break
+        else:
+            parts = []
+        # Unquoted field, or the rest of a quoted one, up to the next comma or newline
+        newline = buffer.find(b'\n', pos)
+        line_end = newline if newline != -1 else size
+        comma = buffer.find(b',', pos, line_end)
+        end = comma if comma != -1 else line_end
+        tail = buffer[pos:end]
+        if comma == -1 and tail.endswith(b'\r'):
+            tail = tail[:-1]
+        if tail or not parts:
+            parts.append(tail)
+        fields.append(b''.join(parts) if len(parts) > 1 else parts[0])
+        if comma == -1:
+            return fields, line_end + 1
+        pos = comma + 1
+
+# Split a one-line record with quotes in C (bytes.split); None if it needs parse_quoted_record
+def split_quoted_line(line: bytes) -> Optional[List[bytes]]:
+    """
+    After line.split(b'"'), odd parts are quoted text and even parts lie between quotes.
+    That matches csv.reader only if every quote opens or closes a field (or is part of
+    a "" escape), i.e. the even parts are empty or border on commas; otherwise None.
+    """
+    parts = line.split(b'"')
+    last = len(parts) - 1
+    if last & 1:
+        return None # Odd number of quotes: a quoted field goes on past this line
+    fields = []
+    pending = []
+    for i, part in enumerate(parts):
+        if i & 1:
+            pending.append(part)
+        elif not part:
+            if 0 < i < last:
+                pending.append(b'"') # Escaped quote inside a quoted field
+        elif (i and part[0] != COMMA) or (i < last and part[-1] != COMMA):
+            return None
+        else:
+            pieces = part.split(b',')
+            pending.append(pieces[0])
+            fields.append(b''.join(pending))
+            fields.extend(pieces[1:-1])
+            pending = [pieces[-1]]
+    fields.append(b''.join(pending))
+    return fields
+
+# Iterate over the records of a mapped file as lists of bytes fields
+def iter_buffer_records(buffer: mmap.mmap, pos: int = 0) -> Iterator[List[bytes]]:
+    """
+    Works on blocks of whole lines (BLOCK_SIZE) so the per-line work stays in C; a
+    block without quotes is split into lines and fields with two list operations.
+    """
+    size = len(buffer)
+    while pos < size:
+        end = buffer.rfind(b'\n', pos, pos + BLOCK_SIZE)
+        if end == -1 or pos + BLOCK_SIZE >= size:
+            end = buffer.find(b'\n', pos + BLOCK_SIZE) if pos + BLOCK_SIZE < size else size
+            end = end if end != -1 else size
+        block = buffer[pos:end + 1] # With the newline, so the last line's \r\n is replaced too
+        if b'"' not in block:
+            yield from [line.split(b',') for line in block.replace(b'\r\n', b'\n').split(b'\n') if line]
+            pos = end + 1
+            continue
+        line_start = resume = pos
+        pos = end + 1
+        for line in block[:end - line_start].split(b'\n'):
+            line_end = line_start + len(line)
+            if line_start < resume: # Already read by parse_quoted_record
+                line_start = line_end + 1
+                continue
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            if b'"' in line:
+                fields = split_quoted_line(line)
+                if fields is None: # Record may go on past this line
+                    fields, resume = parse_quoted_record(buffer, line_start, size)
+                    yield fields
+                    if resume > pos:
+                        pos = resume
+                        break
+                    line_start = line_end + 1
+                    continue
+                yield fields
+            elif line:
+                yield line.split(b',')
+            line_start = line_end + 1
+
+# Read raw CSV records from a memory-mapped file (same records as iter_csv_records)
+def iter_mmap_records(filepath: str) -> Tuple[List[str], Iterator[List[bytes]]]:
+    """
+    Maps the file and returns its headers (decoded) plus a lazy iterator over the data
+    records as lists of bytes fields. The map is closed when the iterator finishes.
+    """
+    with open(filepath, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return [], iter(())
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    records = iter_buffer_records(buffer)
+    headers = [field.decode('utf-8') for field in next(records, [])]
+
+    def data_records() -> Iterator[List[bytes]]:
+        try:
+            yield from records
+        finally:
+            records.close()
+            buffer.close()
+    return headers, data_records()
+
+# --- Field converters ---
+
+# Wrap a str converter (try_parse_float, parse_number, parse_text) to take bytes fields
+def bytes_converter(converter: Callable[[Optional[str]], Any], numeric: bool) -> Callable[[Optional[bytes]], Any]:
+    """
+    numeric=True tries float() on the bytes first and only decodes fields it rejects;
+    otherwise the parsed value of each distinct field is cached, so repeated text values
+    are decoded once. Either way the result equals converter(field.decode('utf-8')).
+    """
+    if numeric:
+        def convert(value: Optional[bytes]) -> Any:
+            if not value or value.isspace():
+                return None
+            try:
+                return float(value)
+            except ValueError:
+                return converter(value.decode('utf-8'))
+        return convert
+
+    cache = {}
+
+    def convert_cached(value: Optional[bytes]) -> Any:
+        result = cache.get(value, MISSING)
+        if result is MISSING:
+            if len(cache) >= BYTES_CACHE_SIZE:
+                cache.clear()
+            result = cache[value] = converter(value.decode('utf-8'))
+        return result
+    return convert_cached
@@ -0,0 +1,271 @@
+import ast
+import json
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Optional, Sequence
+
+# Nested JSON-string columns of the Facebook ads export (delivery_by_region,
+# demographic_distribution), unpacked into per-key numeric values.
+#
+# A cell is decoded once per distinct string (lru_cache; the pandas and Polars helpers
+# only decode the distinct values of a column) with orjson when it is installed, else
+# json, and Python-literal exports ("{'Texas': 0.5}") are read with ast.literal_eval.
+# It is then flattened into (key, value) pairs:
+#   {"Texas": 0.25, "Ohio": 0.75}                  -> ("Texas", 0.25), ("Ohio", 0.75)
+#   [{"percentage": 0.4, "key": "male_18-24"}]     -> ("male_18-24", 0.4)
+#   [{"percentage": "0.4", "age": "18-24", "gender": "male"}] -> ("18-24_male", 0.4)
+#   ["facebook", "instagram"]                      -> ("facebook", 1.0), ("instagram", 1.0)
+# Nested objects get dotted keys, and a key listed twice in one cell is summed.
+#
+# Per group, every key gets count (rows listing it), mean, min and max of its value
+# and weighted_share: sum(value * weight) / sum(weight) over the group's rows with a
+# decodable cell, where weight is the policy's weight_column (impressions by default).
+# For delivery_by_region that is the share of the page's impressions delivered to
+# each region. Rows without a numeric weight only count towards the unweighted stats.
+
+NESTED_CACHE_SIZE = 65_536
+DEFAULT_NESTED_COLUMNS = ('delivery_by_region', 'demographic_distribution')
+VALUE_FIELDS = ('percentage', 'value', 'share') # Field holding the number in a list of objects
+
+# --- Decoding and flattening ---
+
+# orjson.loads if installed (several times faster), else json.loads
+def json_decoder():
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+    return orjson.loads
+
+_loads = json_decoder()
+
+# Float value of a JSON scalar, or None if it is not a number
+def as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+# Add the (key, value) pairs of one decoded cell to pairs
+def flatten_nested(decoded: Any, pairs: Dict[str, float], prefix: str = '') -> None:
+    if isinstance(decoded, dict):
+        for key, value in decoded.items():
+            number = as_number(value)
+            if number is not None:
+                pairs[f"{prefix}{key}"] = pairs.get(f"{prefix}{key}", 0.0) + number
+            elif isinstance(value, (dict, list)):
+                flatten_nested(value, pairs, f"{prefix}{key}.")
+    elif isinstance(decoded, list):
+        for item in decoded:
+            if isinstance(item, str):
+                pairs[f"{prefix}{item}"] = pairs.get(f"{prefix}{item}", 0.0) + 1.0
+            elif isinstance(item, dict):
+                field = next((f for f in VALUE_FIELDS if f in item), None)
+                number = as_number(item[field]) if field is not None else None
+                if number is None:
+                    continue
+                key = '_'.join(str(v) for k, v in item.items() if k != field)
+                pairs[f"{prefix}{key}"] = pairs.get(f"{prefix}{key}", 0.0) + number
+
+# Decode and flatten one cell; () if it is not a JSON / Python literal object or list
+@lru_cache(maxsize=NESTED_CACHE_SIZE)
+def decode_nested(text: str) -> Tuple[Tuple[str, float], ...]:
+    text = text.strip()
+    if not text or text[0] not in '{[':
+        return ()
+    try:
+        decoded = _loads(text)
+    except ValueError: # json.JSONDecodeError and orjson.JSONDecodeError both subclass it
+        try:
+            decoded = ast.literal_eval(text)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return ()
+    pairs = {}
+    flatten_nested(decoded, pairs)
+    return tuple(pairs.items())
+
+# Weight of a row: a parsed number that is not NaN, else None
+def nested_weight(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+        return float(value)
+    return None
+
+# --- Policy and accumulator (pure-Python engine) ---
+
+class NestedPolicy:
+    """
+    Which columns to unpack and which column weights their values.
+    """
+
+    def __init__(self, columns: Sequence[str] = DEFAULT_NESTED_COLUMNS, weight_column: Optional[str] = 'impressions'):
+        self.columns = tuple(columns)
+        self.weight_column = weight_column
+
+    def applies_to(self, column: Optional[str]) -> bool:
+        return column in self.columns
+
+class NestedAccumulator:
+    """
+    Mergeable per-key totals of one nested column (overall or in one group).
+    keys maps each key to [count, sum, min, max, weighted sum].
+    """
+    __slots__ = ('rows', 'weight_total', 'keys')
+
+    def __init__(self):
+        self.rows = 0            # Rows with a decodable, non-empty cell
+        self.weight_total = 0.0  # Sum of their weights
+        self.keys = {}
+
+    def add(self, pairs: Tuple[Tuple[str, float], ...], weight: Optional[float]) -> None:
+        """
+        Adds one decoded cell (see decode_nested); empty cells are ignored.
+        """
+        if not pairs:
+            return
+        self.rows += 1
+        if weight is not None:
+            self.weight_total += weight
+        keys = self.keys
+        for key, value in pairs:
+            totals = keys.get(key)
+            if totals is None:
+                keys[key] = [1, value, value, value, value * weight if weight is not None else 0.0]
+                continue
+            totals[0] += 1
+            totals[1] += value
+            if value < totals[2]:
+                totals[2] = value
+            if value > totals[3]:
+                totals[3] = value
+            if weight is not None:
+                totals[4] += value * weight
+
+    def add_value(self, value: Any, weight: Optional[float]) -> None:
+        """
+        Adds one parsed cell (only strings can hold nested values).
+        """
+        if isinstance(value, str):
+            self.add(decode_nested(value), weight)
+
+    def merge(self, other: 'NestedAccumulator') -> None:
+        self.rows += other.rows
+        self.weight_total += other.weight_total
+        for key, other_totals in other.keys.items():
+            totals = self.keys.get(key)
+            if totals is None:
+                self.keys[key] = list(other_totals)
+                continue
+            totals[0] += other_totals[0]
+            totals[1] += other_totals[1]
+            totals[2] = min(totals[2], other_totals[2])
+            totals[3] = max(totals[3], other_totals[3])
+            totals[4] += other_totals[4]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns {'rows', 'weight_total', 'keys': {key: {count, mean, min, max,
+        weighted_share}}}, keys in first-seen order; weighted_share is None when the
+        rows have no weight.
+        """
+        keys = {}
+        for key, (count, total, low, high, weighted) in self.keys.items():
+            keys[key] = {
+                'count': count,
+                'mean': total / count,
+                'min': low,
+                'max': high,
+                'weighted_share': weighted / self.weight_total if self.weight_total else None
+            }
+        return {'rows': self.rows, 'weight_total': self.weight_total, 'keys': keys}
+
+# --- pandas ---
+
+# Long (row, key, value) form of a nested column, decoding each distinct string once
+def nested_long_pandas(series):
+    """
+    Returns a DataFrame with columns row (position in series), key and value.
+    """
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(series)
+    decoded = [decode_nested(u) if isinstance(u, str) else () for u in uniques]
+    lengths = np.array([len(pairs) for pairs in decoded] + [0], dtype=np.intp) # -1 (missing) -> 0
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    flat_keys = np.array([key for pairs in decoded for key, _ in pairs], dtype=object)
+    flat_values = np.array([value for pairs in decoded for _, value in pairs], dtype=np.float64)
+
+    # Expand every row into its code's pairs without a Python loop over rows
+    row_lengths = lengths[codes]
+    rows = np.repeat(np.arange(len(codes)), row_lengths)
+    row_starts = np.repeat(offsets[codes] - (np.cumsum(row_lengths) - row_lengths), row_lengths)
+    positions = row_starts + np.arange(len(rows))
+    return pd.DataFrame({'row': rows, 'key': flat_keys[positions], 'value': flat_values[positions]})
+
+# Per-group, per-key stats of a nested column (same definitions as NestedAccumulator)
+def nested_stats_pandas(df, column: str, keys: List[str], weight_column: Optional[str] = 'impressions'):
+    """
+    Returns a DataFrame indexed by keys + ['key'] with columns count, mean, min, max
+    and weighted_share (keys=[] gives the overall stats, indexed by 'key' only).
+    """
+    import numpy as np
+    import pandas as pd
+    long = nested_long_pandas(df[column])
+    if weight_column in df.columns:
+        weights = pd.to_numeric(df[weight_column], errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        weights = np.full(len(df), np.nan)
+    group_cols = {k: df[k].to_numpy()[long['row']] for k in keys}
+    long = long.assign(**group_cols, weighted=long['value'] * weights[long['row']])
+    by = keys + ['key']
+    stats = long.groupby(by, sort=False, dropna=False).agg(count=('value', 'size'), mean=('value', 'mean'), min=('value', 'min'), max=('value', 'max'), weighted=('weighted', 'sum'))
+
+    # Weight total per group over rows with a non-empty cell (each row once)
+    rows = long.drop_duplicates('row')
+    rows = rows.assign(weight=weights[rows['row']])
+    if keys:
+        weight_total = rows.groupby(keys, sort=False, dropna=False)['weight'].sum()
+        totals = weight_total.reindex(stats.index.droplevel('key')).to_numpy()
+    else:
+        totals = np.full(len(stats), rows['weight'].sum())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats['weighted_share'] = np.where(totals != 0, stats['weighted'].to_numpy() / totals, np.nan)
+    return stats.drop(columns='weighted')
+
+# --- Polars ---
+
+# Decode a Polars string Series into List[Struct{key, value}], decoding each distinct string once
+def decode_polars(series):
+    import polars as pl
+    dtype = pl.List(pl.Struct({'key': pl.Utf8, 'value': pl.Float64}))
+    uniques = series.drop_nulls().unique()
+    pairs = [[{'key': key, 'value': value} for key, value in decode_nested(text)] for text in uniques]
+    mapping = pl.DataFrame({'raw': uniques, 'pairs': pl.Series(pairs, dtype=dtype)})
+    return series.to_frame('raw').join(mapping, on='raw', how='left', maintain_order='left')['pairs']
+
+# Per-group, per-key stats of a nested column as a LazyFrame (same definitions as NestedAccumulator)
+def nested_stats_polars(lf, column: str, keys: List[str], weight_column: Optional[str] = 'impressions'):
+    """
+    Returns a LazyFrame with keys + ['key', count, mean, min, max, weighted_share],
+    so it can be collected together with the other plans (keys=[] gives the overall
+    stats).
+    """
+    import polars as pl
+    dtype = pl.List(pl.Struct({'key': pl.Utf8, 'value': pl.Float64}))
+    names = lf.collect_schema().names()
+    weight = pl.col(weight_column).cast(pl.Float64, strict=False).fill_nan(None) if weight_column in names else pl.lit(None, dtype=pl.Float64)
+    rows = (lf.select([pl.col(k) for k in keys] + [weight.alias('_weight'), pl.col(column).cast(pl.Utf8).map_batches(decode_polars, return_dtype=dtype).alias('_pairs')])
+              .filter(pl.col('_pairs').list.len() > 0))
+    group_keys = keys or [pl.lit(0).alias('_all')]
+    per_key = (rows.explode('_pairs').unnest('_pairs')
+                   .group_by(group_keys + ['key'], maintain_order=True)
+                   .agg(pl.len().alias('count'), pl.col('value').mean().alias('mean'), pl.col('value').min().alias('min'), pl.col('value').max().alias('max'), (pl.col('value') * pl.col('_weight')).sum().alias('_weighted')))
+    totals = rows.group_by(group_keys).agg(pl.col('_weight').sum().alias('_weight_total'))
+    join_keys = keys or ['_all']
+    return (per_key.join(totals, on=join_keys, how='left', nulls_equal=True)
+                   .with_columns(pl.when(pl.col('_weight_total') != 0).then(pl.col('_weighted') / pl.col('_weight_total')).alias('weighted_share'))
+                   .drop(['_weighted', '_weight_total'] + ([] if keys else ['_all'])))
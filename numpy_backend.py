@@ -0,0 +1,240 @@
+import numpy as np
+from typing import List, Dict, Any, Tuple
+
+# Vectorized NumPy engine for Pure_Python_Stats.analyze_dataset / analyze_groups.
+# It works on a Pure_Python_Stats.ColumnarTable, wrapping its array('d'), array('I')
+# and bitmap buffers as NumPy arrays without copying.
+#
+# Agreement with the pure-Python engine:
+#   - total/numeric/non-numeric counts, min, max, unique counts and most_common
+#     (including first-seen tie breaking) are identical;
+#   - mean and stddev agree to a relative tolerance of NUMPY_RTOL, because NumPy
+#     uses pairwise summation where Python's sum() adds left to right;
+#   - exact quantiles (quantiles.py) are identical: the same ranks are picked, with
+#     np.partition for a whole column, and interpolated with the same formula.
+NUMPY_RTOL = 1e-9
+
+# --- Helper Functions ---
+
+# Wrap one column's buffers as NumPy arrays
+def column_arrays(table, col: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (numbers, is_numeric, codes) for every physical row of the table.
+    codes is 0 for numeric and None cells, otherwise 1 + the string-pool index.
+    """
+    column = table.columns[col]
+    n = table.num_rows
+    numbers = np.frombuffer(column.numbers, dtype=np.float64, count=n)
+    valid = np.unpackbits(np.frombuffer(column.valid, dtype=np.uint8), bitorder='little')[:n].astype(bool)
+    if column.codes is None:
+        codes = np.zeros(n, dtype=np.uint32)
+    else:
+        codes = np.frombuffer(column.codes, dtype=np.uint32, count=n)
+    return numbers, valid & (codes == 0), codes
+
+# Row positions covered by a table (all rows, or the rows of a view)
+def table_rows(table) -> np.ndarray:
+    if table.row_indices is not None:
+        return np.frombuffer(table.row_indices, dtype=np.uint32).astype(np.intp)
+    return np.arange(table.num_rows, dtype=np.intp)
+
+# Python's min()/max() keep a leading NaN and skip later ones; reproduce that
+def first_nan_aware(reduced: np.ndarray, first_values: np.ndarray) -> np.ndarray:
+    return np.where(np.isnan(first_values), np.nan, reduced)
+
+# Per-segment numeric stats for values already sorted by segment
+def segment_numeric_stats(values: np.ndarray, starts: np.ndarray) -> Dict[str, np.ndarray]:
+    counts = np.diff(np.append(starts, len(values)))
+    # inf / NaN values give NaN means and deviations, silently as in pure Python
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sums = np.add.reduceat(values, starts)
+        means = sums / counts
+        deviations = values - np.repeat(means, counts)
+        m2 = np.add.reduceat(deviations * deviations, starts)
+        stddev = np.where(counts > 1, np.sqrt(m2 / np.maximum(counts - 1, 1)), 0.0)
+    first_values = values[starts]
+    return {
+        'count': counts,
+        'mean': means,
+        'min': first_nan_aware(np.fmin.reduceat(values, starts), first_values),
+        'max': first_nan_aware(np.fmax.reduceat(values, starts), first_values),
+        'stddev': stddev,
+    }
+
+# Per-segment exact quantiles, same definition as quantiles.exact_quantiles
+def segment_quantiles(values: np.ndarray, value_segments: np.ndarray, num_segments: int, probabilities: Tuple[float, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    values must be grouped by segment. Returns (quantiles, has_values): one row of
+    quantiles per segment, and whether the segment had any non-NaN value.
+    """
+    keep = ~np.isnan(values)
+    values, value_segments = values[keep], value_segments[keep]
+    result = np.full((num_segments, len(probabilities)), np.nan)
+    has_values = np.zeros(num_segments, dtype=bool)
+    if len(values) == 0:
+        return result, has_values
+    if value_segments[0] == value_segments[-1]:
+        # One segment: select just the needed ranks in O(n)
+        starts = np.zeros(1, dtype=np.intp)
+        n = len(values)
+        positions = (n - 1) * np.asarray(probabilities, dtype=np.float64)
+        lower = np.floor(positions).astype(np.intp)
+        ordered = np.partition(values, np.unique(np.r_[lower, np.minimum(lower + 1, n - 1)]))
+    else:
+        ordered = values[np.lexsort((values, value_segments))]
+        starts = np.flatnonzero(np.r_[True, value_segments[1:] != value_segments[:-1]])
+    counts = np.diff(np.append(starts, len(ordered)))
+    positions = (counts[:, None] - 1) * np.asarray(probabilities, dtype=np.float64)[None, :]
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, counts[:, None] - 1)
+    frac = positions - lower
+    a = ordered[starts[:, None] + lower]
+    b = ordered[starts[:, None] + upper]
+    with np.errstate(invalid='ignore'):
+        quantiles = np.where((frac == 0) | (a == b), a, a + (b - a) * frac)
+    segments = value_segments[starts]
+    result[segments] = quantiles
+    has_values[segments] = True
+    return result, has_values
+
+# Per-segment string counts: (unique count, most common code, its count)
+def segment_string_stats(segment_ids: np.ndarray, codes: np.ndarray, num_segments: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    segment_ids and codes must be in row order within each segment so that
+    np.unique's first-occurrence index reproduces Counter's tie breaking.
+    """
+    total = np.bincount(segment_ids, minlength=num_segments)
+    base = int(codes.max(initial=0)) + 1
+    combined = segment_ids.astype(np.int64) * base + codes
+    uniq, first_index, counts = np.unique(combined, return_index=True, return_counts=True)
+    uniq_segments = uniq // base
+    uniq_codes = uniq % base
+    n_unique = np.bincount(uniq_segments, minlength=num_segments)
+    # Highest count first, then earliest first occurrence, within each segment
+    order = np.lexsort((first_index, -counts, uniq_segments))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = uniq_segments[order][1:] != uniq_segments[order][:-1]
+    top = order[is_first]
+    top_code = np.zeros(num_segments, dtype=np.int64)
+    top_count = np.zeros(num_segments, dtype=np.int64)
+    top_code[uniq_segments[top]] = uniq_codes[top]
+    top_count[uniq_segments[top]] = counts[top]
+    return total, n_unique, top_code, top_count
+
+# Assemble a compute_stats-shaped dict for one segment
+def build_stats(table, numeric: Dict[str, np.ndarray], numeric_pos: int, strings: Tuple, seg: int) -> Dict[str, Any]:
+    total, n_unique, top_code, top_count = strings
+    non_numeric_count = int(total[seg])
+    n = int(numeric['count'][numeric_pos]) if numeric_pos >= 0 else 0
+    stats = {'total_count': n + non_numeric_count}
+    if n:
+        stats['numeric_count'] = n
+        stats['mean'] = float(numeric['mean'][numeric_pos])
+        stats['min'] = float(numeric['min'][numeric_pos])
+        stats['max'] = float(numeric['max'][numeric_pos])
+        stats['stddev'] = float(numeric['stddev'][numeric_pos])
+    else:
+        stats['numeric_count'] = 0
+        stats['mean'] = None
+        stats['min'] = None
+        stats['max'] = None
+        stats['stddev'] = None
+    if non_numeric_count:
+        stats['non_numeric_count'] = non_numeric_count
+        stats['unique_non_numeric'] = int(n_unique[seg])
+        stats['most_common_non_numeric'] = (table.string_pool[int(top_code[seg]) - 1], int(top_count[seg]))
+    else:
+        stats['non_numeric_count'] = 0
+        stats['unique_non_numeric'] = 0
+        stats['most_common_non_numeric'] = None
+    return stats
+
+# Quantile stats of one segment, as QuantileAccumulator.stats() gives them
+def quantile_stats(labels: List[str], quantiles: np.ndarray, has_values: np.ndarray, seg: int) -> Dict[str, Any]:
+    if not has_values[seg]:
+        return {'quantiles': None}
+    return {'quantiles': dict(zip(labels, quantiles[seg].tolist()))}
+
+# Stats for every column, split into segments of a sorted row order
+def analyze_segments(table, rows: np.ndarray, segment_ids: np.ndarray, num_segments: int, quantile_policy=None) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    rows are physical row positions sorted (stably) by segment_ids.
+    Returns one {column: stats} summary per segment. quantile_policy columns get exact
+    quantiles (the policy must not sketch any column).
+    """
+    summaries = [{} for _ in range(num_segments)]
+    for col, name in enumerate(table.headers):
+        numbers, is_numeric, codes = column_arrays(table, col)
+        numeric_mask = is_numeric[rows]
+        values = numbers[rows][numeric_mask]
+        value_segments = segment_ids[numeric_mask]
+        numeric = {'count': np.zeros(0, dtype=np.int64)}
+        numeric_pos = np.full(num_segments, -1, dtype=np.intp)
+        if len(values):
+            starts = np.flatnonzero(np.r_[True, value_segments[1:] != value_segments[:-1]])
+            numeric = segment_numeric_stats(values, starts)
+            numeric_pos[value_segments[starts]] = np.arange(len(starts))
+
+        string_mask = codes[rows] != 0
+        strings = segment_string_stats(segment_ids[string_mask], codes[rows][string_mask].astype(np.int64), num_segments)
+        with_quantiles = quantile_policy is not None and quantile_policy.mode_for(name) != 'off'
+        if with_quantiles:
+            quantiles, has_values = segment_quantiles(values, value_segments, num_segments, quantile_policy.probabilities)
+        for seg in range(num_segments):
+            summaries[seg][name] = build_stats(table, numeric, int(numeric_pos[seg]), strings, seg)
+            if with_quantiles:
+                summaries[seg][name].update(quantile_stats(quantile_policy.labels, quantiles, has_values, seg))
+    return summaries
+
+# --- Public API (called from Pure_Python_Stats) ---
+
+# Vectorized analyze_dataset for a ColumnarTable
+def analyze_table(table, quantile_policy=None) -> Dict[str, Dict[str, Any]]:
+    rows = table_rows(table)
+    if len(rows) == 0:
+        return {}
+    return analyze_segments(table, rows, np.zeros(len(rows), dtype=np.intp), 1, quantile_policy)[0]
+
+# Vectorized analyze_groups for a ColumnarTable
+def analyze_table_groups(table, group_keys: List[str], quantile_policy=None) -> Dict[Tuple, Dict[str, Dict[str, Any]]]:
+    """
+    Assigns every row a group id from its key columns, sorts rows by group id and
+    computes all groups' stats with reduceat, instead of one Python loop per group.
+    Groups are returned in first-seen order with the same tuple keys as group_by.
+    """
+    rows = table_rows(table)
+    if len(rows) == 0:
+        return {}
+    key_cols = [table.headers.index(k) if k in table.headers else None for k in group_keys]
+
+    # Encode each key cell as (kind, number, code) so equal parsed values get equal rows
+    parts = []
+    for col in key_cols:
+        if col is None:
+            continue
+        numbers, is_numeric, codes = column_arrays(table, col)
+        parts.append(is_numeric[rows].astype(np.float64))
+        parts.append(np.where(is_numeric, numbers + 0.0, 0.0)[rows])  # + 0.0 folds -0.0 into 0.0
+        parts.append(codes[rows].astype(np.float64))
+    if parts:
+        key_matrix = np.ascontiguousarray(np.column_stack(parts))
+        _, first_index, inverse = np.unique(key_matrix, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    else:
+        first_index = np.zeros(1, dtype=np.intp)
+        inverse = np.zeros(len(rows), dtype=np.intp)
+
+    # Renumber groups in first-seen order, then sort rows by group (stable keeps row order)
+    group_order = np.argsort(first_index, kind='stable')
+    rank = np.empty_like(group_order)
+    rank[group_order] = np.arange(len(group_order))
+    segment_ids = rank[inverse]
+    order = np.argsort(segment_ids, kind='stable')
+    summaries = analyze_segments(table, rows[order], segment_ids[order], len(group_order), quantile_policy)
+
+    grouped = {}
+    for seg, group in enumerate(group_order):
+        first_row = int(rows[first_index[group]])
+        key = tuple(table.value(c, first_row) if c is not None else None for c in key_cols)
+        grouped[key] = summaries[seg]
+    return grouped
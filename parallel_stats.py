@@ -0,0 +1,145 @@
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional
+
+from Pure_Python_Stats import HashAggregator, read_csv_headers
+from nested_columns import NestedPolicy
+from quantiles import QuantilePolicy
+from sketches import SketchPolicy
+
+# Multi-process CSV analysis: the file is cut into byte ranges that start and end on
+# record boundaries, each range is aggregated by a HashAggregator in a worker process,
+# and the partial aggregators are merged (Chan et al. variance combine, min/max,
+# Counter addition) in file order. Merging in file order keeps groups in first-seen
+# order and keeps most_common tie breaking identical to a sequential run; mean and
+# stddev can differ from it in the last bits, and quantiles from KLL sketches (exact
+# quantiles are identical) by up to the sketch's rank error.
+
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+# --- Record-aligned chunking ---
+
+# Find byte ranges of roughly equal size that start on record boundaries
+def find_chunk_boundaries(filepath: str, num_chunks: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Returns (data_start, [(start, end), ...]) where data_start is the offset just after
+    the header record. A newline only ends a record when it is outside a quoted field,
+    i.e. when an even number of '"' bytes precede it ("" escapes count twice, so they
+    do not change the parity). This needs one sequential scan, but bytes.count/find do
+    it at memory speed, far faster than parsing.
+    """
+    file_size = os.path.getsize(filepath)
+    data_start = None
+    boundaries = []
+    pending = []
+    target = 0  # The first record boundary searched for is the end of the header
+    with open(filepath, 'rb') as f:
+        in_quotes = 0
+        offset = 0  # File offset of block[0]
+        while target is not None:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            pos = 0  # Quote parity is accounted for up to block[pos]
+            while target is not None:
+                search = max(target - offset, pos)
+                if search >= len(block):
+                    break
+                in_quotes ^= block.count(b'"', pos, search) & 1
+                pos = search
+                found = False
+                newline = block.find(b'\n', pos)
+                while newline != -1:
+                    in_quotes ^= block.count(b'"', pos, newline) & 1
+                    pos = newline + 1
+                    if not in_quotes:
+                        found = True
+                        break
+                    newline = block.find(b'\n', pos)
+                if not found:
+                    break  # The record continues into the next block
+                boundary = offset + pos
+                if data_start is None:
+                    data_start = boundary
+                    step = (file_size - data_start) / max(1, num_chunks)
+                    pending = [int(data_start + step * i) for i in range(1, num_chunks)]
+                else:
+                    boundaries.append(boundary)
+                while pending and pending[0] < boundary:
+                    pending.pop(0)
+                target = pending.pop(0) if pending else None
+            in_quotes ^= block.count(b'"', pos) & 1
+            offset += len(block)
+
+    if data_start is None:
+        # Header only (or a header with no trailing newline)
+        return file_size, []
+    edges = [data_start] + [b for b in boundaries if b < file_size] + [file_size]
+    chunks = [(edges[i], edges[i + 1]) for i in range(len(edges) - 1) if edges[i] < edges[i + 1]]
+    return data_start, chunks
+
+class ByteRangeReader(io.RawIOBase):
+    """
+    Read-only raw stream over bytes [start, end) of a file, so a chunk can be decoded
+    and parsed incrementally instead of being read into memory in one piece.
+    """
+
+    def __init__(self, filepath: str, start: int, end: int):
+        self.file = open(filepath, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self.remaining]
+        n = self.file.readinto(view)
+        self.remaining -= n
+        return n
+
+    def close(self) -> None:
+        self.file.close()
+        super().close()
+
+# Open a byte range of a CSV file as text for csv.reader
+def open_byte_range(filepath: str, start: int, end: int) -> io.TextIOWrapper:
+    return io.TextIOWrapper(io.BufferedReader(ByteRangeReader(filepath, start, end)), encoding='utf-8', newline='')
+
+# --- Worker and driver ---
+
+# Aggregate one chunk (runs in a worker process)
+def analyze_chunk(filepath: str, start: int, end: int, headers: List[str], grouping_sets: List[List[str]], sketch_policy: Optional[SketchPolicy] = None, schema: Optional[Dict[str, str]] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None) -> HashAggregator:
+    aggregator = HashAggregator(headers, grouping_sets, sketch_policy=sketch_policy, schema=schema, quantile_policy=quantile_policy, nested_policy=nested_policy)
+    with open_byte_range(filepath, start, end) as text:
+        for record in csv.reader(text):
+            if record: # Skip blank lines, as csv.DictReader does
+                aggregator.add_record(record)
+    return aggregator
+
+# Parallel counterpart of Pure_Python_Stats.analyze_csv_grouped
+def analyze_csv_parallel(filepath: str, grouping_sets: List[List[str]], max_workers: Optional[int] = None, chunks_per_worker: int = 4, sketch_policy: Optional[SketchPolicy] = None, schema: Optional[Dict[str, str]] = None, quantile_policy: Optional[QuantilePolicy] = None, nested_policy: Optional[NestedPolicy] = None) -> Tuple[List[str], int, Dict[str, Dict[str, Any]], Dict[Tuple, Dict]]:
+    """
+    Splits the file into record-aligned chunks, analyzes them in a ProcessPoolExecutor
+    and merges the partial results. Returns (headers, row_count, overall_summary,
+    {tuple(keys): group_summaries}), like analyze_csv_grouped.
+    A few chunks per worker keep all cores busy when chunks take uneven time.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    headers = read_csv_headers(filepath)
+    _, chunks = find_chunk_boundaries(filepath, max_workers * chunks_per_worker)
+
+    merged = HashAggregator(headers, grouping_sets, sketch_policy=sketch_policy, quantile_policy=quantile_policy, nested_policy=nested_policy)
+    if chunks:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(analyze_chunk, filepath, start, end, headers, grouping_sets, sketch_policy, schema, quantile_policy, nested_policy) for start, end in chunks]
+            # Merge in file order so first-seen ordering is the same as a sequential scan
+            for future in futures:
+                merged.merge(future.result())
+
+    grouped = {tuple(keys): merged.group_summaries(keys) for keys in grouping_sets}
+    return headers, merged.row_count, merged.overall_summary(), grouped
@@ -0,0 +1,247 @@
+import csv
+import json
+import os
+from typing import List, Dict, Any, Optional, Sequence, Union
+
+import dataset_cache
+from prefetch_reader import open_csv_text
+
+# Pre-aggregated data for bonus_script.py's figures.
+#
+# sns.histplot(kde=True) and sns.boxplot work on every raw value, and the KDE
+# evaluates one Gaussian per data point at each grid point. Here each numeric column
+# is reduced once to what the figures draw:
+#   - histogram: bin edges and counts (np.histogram, as histplot bins them)
+#   - kde: the curve on a fixed grid of KDE_GRID_POINTS between min and max (histplot's
+#     cut=0), with Scott's bandwidth like seaborn. The values are first linearly binned
+#     onto a fine grid spaced at most a quarter bandwidth apart (KDE_BINS_PER_BANDWIDTH,
+#     up to KDE_MAX_BINS points), so the spacing follows the bandwidth even on long
+#     tailed columns, and the kernels are centered on those points. Each grid point
+#     only sums the points within KDE_CUTOFF bandwidths, so the cost no longer grows
+#     with the row count. Scaled to counts like histplot's curve.
+#   - box: quartiles, 1.5 x IQR whiskers and outliers, as matplotlib's boxplot computes
+#     them. At most MAX_FLIERS outliers are kept (evenly spaced in sorted order,
+#     including both extremes).
+# plus the top values of a category column for the bar chart. The result is plain
+# JSON, cached in .stats_cache next to the CSV (dataset_cache.py) under the CSV's
+# content key, so figures are only re-aggregated when the file or the PlotSpec changes.
+# The stats engines can write the same entry from the frame they have already loaded
+# (share_from_frame), and then bonus_script.py does not read the data at all.
+
+KDE_GRID_POINTS = 200      # seaborn's default gridsize
+KDE_BINS_PER_BANDWIDTH = 4 # Fine grid points per KDE bandwidth
+KDE_MIN_BINS = 2048        # Fine grid size bounds (the upper one caps memory on long tails)
+KDE_MAX_BINS = 1 << 20
+KDE_CUTOFF = 8             # Kernels are truncated this many bandwidths from their center
+MAX_FLIERS = 2000          # Outlier points kept per box plot
+TOP_CATEGORIES = 10
+
+# --- Spec ---
+
+class PlotSpec:
+    """
+    What to aggregate for one dataset: numeric_cols for histograms and box plots
+    (columns not in the file are skipped), histogram bins, and an optional
+    category_col for a top-TOP_CATEGORIES bar chart.
+    """
+
+    def __init__(self, numeric_cols: Sequence[str], bins: int = 50, category_col: Optional[str] = None):
+        if bins < 1:
+            raise ValueError("bins must be at least 1.")
+        self.numeric_cols = list(numeric_cols)
+        self.bins = bins
+        self.category_col = category_col
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'numeric_cols': self.numeric_cols, 'bins': self.bins, 'category_col': self.category_col,
+                'kde_grid_points': KDE_GRID_POINTS, 'kde_bins': [KDE_BINS_PER_BANDWIDTH, KDE_MIN_BINS, KDE_MAX_BINS, KDE_CUTOFF], 'max_fliers': MAX_FLIERS}
+
+    def columns_in(self, headers: Sequence[str]) -> List[str]:
+        wanted = self.numeric_cols + ([self.category_col] if self.category_col else [])
+        return [col for col in wanted if col in headers]
+
+# --- Aggregates ---
+
+# Histogram edges and counts
+def histogram(values, bins: int) -> Dict[str, List[float]]:
+    import numpy as np
+    counts, edges = np.histogram(values, bins=bins)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+# Gaussian KDE on a fixed grid from linearly binned weights, scaled like histplot's curve
+def kde_curve(values, bin_width: float) -> Optional[Dict[str, List[float]]]:
+    """
+    None when there is no spread to estimate (fewer than two distinct values), where
+    seaborn draws no curve either.
+    """
+    import numpy as np
+    n = len(values)
+    if n < 2:
+        return None
+    low, high = float(values.min()), float(values.max())
+    std = float(values.std(ddof=1))
+    if high == low or std == 0:
+        return None
+    bandwidth = std * n ** (-1 / 5) # Scott's rule, as scipy's gaussian_kde
+    # Fine grid spacing of at most bandwidth / KDE_BINS_PER_BANDWIDTH, within the bin limits
+    bins = int(np.clip(np.ceil((high - low) / bandwidth * KDE_BINS_PER_BANDWIDTH) + 1, KDE_MIN_BINS, KDE_MAX_BINS))
+    step = (high - low) / (bins - 1)
+    # Linear binning: each value's weight is split between its two neighbouring grid points
+    position = (np.asarray(values, dtype=float) - low) / step
+    index = np.minimum(position.astype(np.int64), bins - 2)
+    upper = position - index
+    weights = np.bincount(index, 1 - upper, bins) + np.bincount(index + 1, upper, bins)
+    nonzero = np.flatnonzero(weights)
+    centers, weights = low + nonzero * step, weights[nonzero]
+    grid = np.linspace(low, high, KDE_GRID_POINTS)
+    # Only points within KDE_CUTOFF bandwidths of a grid point contribute to it
+    starts = np.searchsorted(centers, grid - KDE_CUTOFF * bandwidth)
+    stops = np.searchsorted(centers, grid + KDE_CUTOFF * bandwidth, side='right')
+    density = np.empty(KDE_GRID_POINTS)
+    for i, (x, start, stop) in enumerate(zip(grid, starts, stops)):
+        z = (centers[start:stop] - x) / bandwidth
+        density[i] = np.exp(-0.5 * z * z) @ weights[start:stop]
+    density /= n * bandwidth * np.sqrt(2 * np.pi)
+    return {'x': grid.tolist(), 'y': (density * n * bin_width).tolist()}
+
+# Box-plot statistics in the form matplotlib's Axes.bxp takes
+def box_summary(values) -> Dict[str, Any]:
+    import numpy as np
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    fliers = np.sort(values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)])
+    if len(fliers) > MAX_FLIERS:
+        fliers = fliers[np.linspace(0, len(fliers) - 1, MAX_FLIERS).round().astype(int)]
+    return {
+        'q1': float(q1), 'med': float(med), 'q3': float(q3),
+        'whislo': float(inside.min()) if len(inside) else float(q1),
+        'whishi': float(inside.max()) if len(inside) else float(q3),
+        'fliers': fliers.tolist(),
+        'flier_count': int(((values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)).sum())
+    }
+
+# Histogram, KDE and box plot of one numeric column (None if it has no values)
+def column_aggregates(values, bins: int) -> Optional[Dict[str, Any]]:
+    import numpy as np
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    hist = histogram(values, bins)
+    bin_width = hist['edges'][1] - hist['edges'][0]
+    return {'count': len(values), 'histogram': hist, 'kde': kde_curve(values, bin_width), 'box': box_summary(values)}
+
+# All aggregates of a PlotSpec from a pandas DataFrame
+def frame_aggregates(df, spec: PlotSpec) -> Dict[str, Any]:
+    import pandas as pd
+    numeric = {}
+    for col in spec.numeric_cols:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            numeric[col] = column_aggregates(df[col].dropna().to_numpy(), spec.bins)
+    category = None
+    if spec.category_col and spec.category_col in df.columns:
+        top = df[spec.category_col].value_counts().head(TOP_CATEGORIES)
+        category = {'labels': [str(label) for label in top.index], 'counts': top.tolist()}
+    return {'numeric': numeric, 'category': category}
+
+# --- Cache ---
+
+# .stats_cache entry holding a CSV's plot aggregates
+def aggregates_path(csv_path: str) -> str:
+    return dataset_cache.cache_path(csv_path, "plots", "json")
+
+# Cached aggregates for this spec, or None
+def load_aggregates(csv_path: str, spec: PlotSpec) -> Optional[Dict[str, Any]]:
+    entry = dataset_cache.lookup(aggregates_path(csv_path))
+    if entry is None:
+        return None
+    with open(entry, encoding='utf-8') as f:
+        cached = json.load(f)
+    return cached['aggregates'] if cached.get('spec') == spec.to_dict() else None
+
+# Store the aggregates for this spec (replacing any for an older version of the CSV)
+def save_aggregates(csv_path: str, spec: PlotSpec, aggregates: Dict[str, Any], limit_mb: float = dataset_cache.DEFAULT_CACHE_LIMIT_MB) -> None:
+    entry = aggregates_path(csv_path)
+    temp = dataset_cache.temp_path_for(entry)
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump({'spec': spec.to_dict(), 'aggregates': aggregates}, f)
+    dataset_cache.commit(temp, entry, limit_mb)
+
+# Write the aggregates from a frame a stats engine has already loaded, if not cached yet
+def share_from_frame(csv_path: str, df, plot_specs: Optional[Dict[str, PlotSpec]]) -> None:
+    """
+    plot_specs maps CSV file names (without directory) to their PlotSpec, like
+    bonus_script.PLOT_SPECS; files not in it are ignored.
+    """
+    spec = (plot_specs or {}).get(os.path.basename(csv_path))
+    if spec is not None and load_aggregates(csv_path, spec) is None:
+        save_aggregates(csv_path, spec, frame_aggregates(df, spec))
+
+# Aggregates for a CSV: from the cache, else from the columns it needs (cached afterwards)
+def dataset_aggregates(csv_path: str, spec: PlotSpec, use_cache: bool = True, schema: Union[str, Dict[str, str], None] = "infer") -> Dict[str, Any]:
+    """
+    use_cache=True reads the columns through dataset_cache.load_pandas (the Arrow copy
+    the pandas engine also uses) and stores the result; False always reads the CSV.
+    schema is resolved as in Pandas_Stats.py (schema_inference.py).
+    """
+    from schema_inference import read_csv_pandas, resolve_schema
+    if use_cache:
+        cached = load_aggregates(csv_path, spec)
+        if cached is not None:
+            return cached
+    with open_csv_text(csv_path) as f:
+        headers = next(csv.reader(f), [])
+    columns = spec.columns_in(headers)
+    schema = resolve_schema(csv_path, schema)
+    if use_cache:
+        df = dataset_cache.load_pandas(csv_path, columns=columns, schema=schema)
+    else:
+        df = read_csv_pandas(csv_path, schema, columns)
+    aggregates = frame_aggregates(df, spec)
+    if use_cache:
+        save_aggregates(csv_path, spec, aggregates)
+    return aggregates
+
+# --- Accuracy check ---
+
+# Exact Gaussian KDE (one kernel per value) on kde_curve's grid, for checking it
+def exact_kde_curve(values, bin_width: float) -> Optional[Dict[str, List[float]]]:
+    import numpy as np
+    binned = kde_curve(values, bin_width)
+    if binned is None:
+        return None
+    n = len(values)
+    bandwidth = float(values.std(ddof=1)) * n ** (-1 / 5)
+    grid = np.asarray(binned['x'])
+    density = np.zeros(KDE_GRID_POINTS)
+    # Blocks of values keep the grid x values matrix small
+    for start in range(0, n, 4096):
+        z = (grid[:, None] - np.asarray(values[start:start + 4096], dtype=float)[None, :]) / bandwidth
+        density += np.exp(-0.5 * z * z).sum(axis=1)
+    density /= n * bandwidth * np.sqrt(2 * np.pi)
+    return {'x': binned['x'], 'y': (density * n * bin_width).tolist()}
+
+# Largest error of kde_curve against the exact KDE, relative to the curve's peak
+def kde_error(values) -> float:
+    import numpy as np
+    binned, exact = np.asarray(kde_curve(values, 1.0)['y']), np.asarray(exact_kde_curve(values, 1.0)['y'])
+    return float(np.abs(binned - exact).max() / exact.max())
+
+# kde_curve's error on skewed samples (lognormal and Pareto, like spend and impressions)
+def check_kde(n: int = 200000, tolerance: float = 0.01, seed: int = 0) -> Dict[str, float]:
+    """
+    Raises AssertionError if any error is above tolerance.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    samples = {'normal': rng.normal(size=n), 'lognormal': rng.lognormal(0, 1.5, n),
+               'pareto': rng.pareto(1.2, n), 'pareto_heavy': rng.pareto(0.7, n)}
+    errors = {name: kde_error(values) for name, values in samples.items()}
+    failed = {name: error for name, error in errors.items() if error > tolerance}
+    assert not failed, f"KDE error above {tolerance:.0%}: {failed}"
+    return errors
+
+if __name__ == "__main__":
+    for name, error in check_kde().items():
+        print(f"{name}: max KDE error {error:.2e} of the peak")
@@ -0,0 +1,187 @@
+import gzip
+import io
+import os
+import queue
+import threading
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional, TextIO
+
+# Background prefetching of CSV input, including compressed exports (.csv.gz, .csv.zst).
+#
+# open_prefetched starts a producer thread that reads blocks of PREFETCH_BLOCK_SIZE
+# bytes (decompressing them for .gz / .zst files) into a queue of at most
+# PREFETCH_DEPTH blocks. The consumer reads from that queue as from a file, so disk
+# reads and decompression of the next blocks run while the current ones are parsed and
+# aggregated, and memory stays bounded by depth x block size. File reads, zlib and zstd
+# all release the GIL, which is what lets the producer make progress alongside Python
+# code.
+#
+# Parsing and aggregation in the pure-Python engine both need the GIL, so they stay in
+# one thread; only I/O and decompression move to the producer. For pandas and Polars,
+# prefetch_batches runs a batched reader in a thread, so the next batch is read and
+# parsed (in C / Rust, without the GIL) while the previous one is aggregated.
+#
+# zstd uses the zstandard package if it is installed, else pyarrow's codec.
+
+PREFETCH_BLOCK_SIZE = 1 << 20 # Bytes per block read ahead
+PREFETCH_DEPTH = 8            # Blocks (or batches) the producer may run ahead
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+END = object() # Marks the end of a prefetch queue
+
+# --- Helper Functions ---
+
+# 'gzip', 'zstd' or None, from the file extension
+def compression_of(path: str) -> Optional[str]:
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+# File name without its directory, compression suffix and extension ('x.csv.gz' -> 'x')
+def dataset_stem(path: str, tag_compression: bool = False) -> str:
+    """
+    tag_compression appends a compressed file's codec ('x_gzip'), for output files named
+    after the input: x.csv, x.csv.gz and x.csv.zst in one directory then keep separate
+    outputs instead of overwriting each other's.
+    """
+    name = os.path.basename(path)
+    compression = compression_of(name)
+    if compression is not None:
+        name = os.path.splitext(name)[0]
+    stem = os.path.splitext(name)[0]
+    return f"{stem}_{compression}" if tag_compression and compression is not None else stem
+
+# Binary stream of a file's contents, decompressed if needed (no prefetching)
+def open_binary(path: str) -> BinaryIO:
+    compression = compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            import pyarrow as pa
+            return pa.input_stream(path, compression='zstd')
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb', buffering=0)
+
+# Put an item on a bounded queue unless the consumer has stopped; False if it has
+def put_unless_stopped(items: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+# --- Prefetching ---
+
+class PrefetchReader(io.RawIOBase):
+    """
+    Raw binary stream whose bytes are read from source by a background thread,
+    block_size bytes at a time and at most depth blocks ahead. Errors in the thread
+    are raised on the next read. Closing stops the thread and closes source.
+    """
+
+    def __init__(self, source: BinaryIO, block_size: int = PREFETCH_BLOCK_SIZE, depth: int = PREFETCH_DEPTH):
+        super().__init__()
+        self.source = source
+        self.block_size = block_size
+        self.blocks = queue.Queue(maxsize=depth)
+        self.stop = threading.Event()
+        self.pending = memoryview(b'')
+        self.at_end = False
+        self.thread = threading.Thread(target=self._produce, name="csv-prefetch", daemon=True)
+        self.thread.start()
+
+    def _produce(self) -> None:
+        try:
+            while True:
+                block = self.source.read(self.block_size)
+                if not block:
+                    break
+                if not put_unless_stopped(self.blocks, block, self.stop):
+                    return
+        except BaseException as error:
+            put_unless_stopped(self.blocks, error, self.stop)
+            return
+        put_unless_stopped(self.blocks, END, self.stop)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self.pending:
+            if self.at_end:
+                return 0
+            block = self.blocks.get()
+            if block is END:
+                self.at_end = True
+                return 0
+            if isinstance(block, BaseException):
+                self.at_end = True
+                raise block
+            self.pending = memoryview(block)
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self.stop.set()
+            self.thread.join()
+            self.source.close()
+        super().close()
+
+# Buffered binary stream of a (possibly compressed) file, read ahead in a background thread
+def open_prefetched(path: str, block_size: int = PREFETCH_BLOCK_SIZE, depth: int = PREFETCH_DEPTH) -> BinaryIO:
+    return io.BufferedReader(PrefetchReader(open_binary(path), block_size, depth), buffer_size=block_size)
+
+# Text stream for csv.reader: plain open(), or prefetched when asked or when compressed
+def open_csv_text(path: str, prefetch: bool = False) -> TextIO:
+    if not prefetch and compression_of(path) is None:
+        return open(path, newline='', encoding='utf-8')
+    return io.TextIOWrapper(open_prefetched(path), encoding='utf-8', newline='')
+
+# Call read(source) with the path, or with a prefetched decompressing stream for .gz / .zst
+def with_csv_source(path: str, read: Callable[[Any], Any], prefetch: bool = False) -> Any:
+    """
+    For pd.read_csv / pl.read_csv, which take a path or a binary file object; a plain
+    file is passed by path unless prefetch is set.
+    """
+    if not prefetch and compression_of(path) is None:
+        return read(path)
+    with open_prefetched(path) as source:
+        return read(source)
+
+# Iterate over batches produced by a background thread, up to depth batches ahead
+def prefetch_batches(batches: Iterable[Any], depth: int = 2) -> Iterator[Any]:
+    """
+    Use with readers that release the GIL while producing a batch (pandas' chunked
+    read_csv, Polars' batched readers), so the next batch is parsed while the caller
+    works on the current one. Stopping early (break / close) stops the thread.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            for batch in batches:
+                if not put_unless_stopped(items, batch, stop):
+                    return
+        except BaseException as error:
+            put_unless_stopped(items, error, stop)
+            return
+        put_unless_stopped(items, END, stop)
+
+    thread = threading.Thread(target=produce, name="batch-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            batch = items.get()
+            if batch is END:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield batch
+    finally:
+        stop.set()
+        thread.join()
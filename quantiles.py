@@ -0,0 +1,281 @@
+import math
+from array import array
+from typing import List, Dict, Any, Optional, Iterable, Sequence
+
+# Quantiles (p25, median, p75, p95, p99 by default) of numeric columns, overall and
+# per group.
+#
+# Exact quantiles use linear interpolation between the two closest ranks, the default
+# of pandas' quantile() / describe() and np.quantile, and skip NaN as pandas does.
+#   Only the ranks next to each requested position are needed, so they are selected
+#   instead of sorting every value: select_ranks (quickselect) in the pure-Python
+#   engine and np.partition in numpy_backend, both O(n).
+# KLLSketch (Karnin, Lang & Liberty) keeps about 3 * k values however many are added,
+#   and sketches can be merged, so they work per group and across parallel chunks.
+#   With the default k=200 the rank of a reported quantile is typically within about
+#   1% of the requested one (p95 may come out as roughly p94-p96); a sketch that has
+#   seen fewer than k values is still exact.
+# QuantilePolicy decides per column which of the two is used.
+
+DEFAULT_PROBABILITIES = (0.25, 0.5, 0.75, 0.95, 0.99)
+SELECT_SORT_SIZE = 32   # select_ranks sorts parts this small instead of splitting them
+SELECT_MAX_DEPTH = 64   # and sorts whatever is left after this many splits
+
+# --- Helper Functions ---
+
+# Stats key for a probability: 0.5 -> 'p50', 0.999 -> 'p99.9'
+def quantile_label(probability: float) -> str:
+    return f"p{probability * 100:g}"
+
+# Value at fractional position frac between a and b
+def interpolate(a: float, b: float, frac: float) -> float:
+    if frac == 0 or a == b:
+        return a # Also keeps infinities from turning into NaN
+    return a + (b - a) * frac
+
+# Values at the given ranks (0-based positions in sorted order) of NaN-free numbers
+def select_ranks(values: Sequence[float], ranks: Iterable[int]) -> Dict[int, float]:
+    """
+    Quickselect for several ranks at once: each step splits the values around a
+    median-of-three pivot and only keeps the parts that hold a wanted rank, so the
+    work is O(n) per rank instead of a full sort. Parts of at most SELECT_SORT_SIZE
+    values, or past SELECT_MAX_DEPTH splits (a bad pivot sequence), are sorted.
+    """
+    result = {}
+    pending = [(values, 0, sorted(set(ranks)), 0)]
+    while pending:
+        items, base, wanted, depth = pending.pop()
+        if len(items) <= SELECT_SORT_SIZE or depth >= SELECT_MAX_DEPTH:
+            ordered = sorted(items)
+            for rank in wanted:
+                result[rank] = ordered[rank - base]
+            continue
+        pivot = sorted((items[0], items[len(items) // 2], items[-1]))[1]
+        lower = [x for x in items if x < pivot]
+        upper = [x for x in items if x > pivot]
+        equal_start, equal_end = base + len(lower), base + len(items) - len(upper)
+        below, above = [], []
+        for rank in wanted:
+            if rank < equal_start:
+                below.append(rank)
+            elif rank >= equal_end:
+                above.append(rank)
+            else:
+                result[rank] = pivot
+        if below:
+            pending.append((lower, base, below, depth + 1))
+        if above:
+            pending.append((upper, equal_end, above, depth + 1))
+    return result
+
+# Exact quantiles of NaN-free numbers (None for each probability if there are none)
+def exact_quantiles(values: Sequence[float], probabilities: Sequence[float]) -> List[Optional[float]]:
+    n = len(values)
+    if n == 0:
+        return [None] * len(probabilities)
+    positions = [(n - 1) * p for p in probabilities]
+    bounds = [(math.floor(position), min(math.floor(position) + 1, n - 1)) for position in positions]
+    ranked = select_ranks(values, [rank for pair in bounds for rank in pair])
+    return [interpolate(ranked[lower], ranked[upper], position - lower) for position, (lower, upper) in zip(positions, bounds)]
+
+# --- Streaming sketch ---
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch. Level h of compactors holds values that each stand for
+    2**h inputs; when the sketch is full, a full level is sorted and every other value
+    is promoted to the next level. The level sizes shrink geometrically (factor 2/3)
+    from the top down, which bounds the total at about 3 * k values. The kept half
+    alternates at each level instead of being drawn at random, so results are
+    reproducible for the same input order.
+    """
+    __slots__ = ('k', 'compactors', 'size', 'max_size', 'count', 'offsets')
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.compactors = [[]]
+        self.size = 0      # Values held
+        self.max_size = k  # Sum of the level capacities
+        self.count = 0     # Values added (total weight)
+        self.offsets = 0   # Bit h: which half level h keeps at its next compaction
+
+    def level_capacity(self, h: int) -> int:
+        depth = len(self.compactors) - h - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def is_exact(self) -> bool:
+        return len(self.compactors) == 1
+
+    def add(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.size += 1
+        self.count += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.compactors):
+            items = self.compactors[h]
+            if len(items) >= self.level_capacity(h):
+                if h + 1 == len(self.compactors):
+                    self.compactors.append([])
+                    self.max_size = sum(self.level_capacity(i) for i in range(len(self.compactors)))
+                items.sort()
+                odd = len(items) & 1 # An odd value out stays on this level
+                offset = (self.offsets >> h) & 1
+                self.offsets ^= 1 << h
+                self.compactors[h + 1].extend(items[offset:len(items) - odd:2])
+                self.compactors[h] = items[len(items) - odd:]
+                self.size = sum(len(level) for level in self.compactors)
+                if self.size < self.max_size:
+                    return
+            h += 1
+
+    def merge(self, other: 'KLLSketch') -> None:
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in zip(self.compactors, other.compactors):
+            level.extend(items)
+        self.count += other.count
+        self.max_size = sum(self.level_capacity(i) for i in range(len(self.compactors)))
+        self.size = sum(len(level) for level in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def quantiles(self, probabilities: Sequence[float]) -> List[Optional[float]]:
+        """
+        For each probability p, the held value whose weighted rank covers p * (count - 1).
+        """
+        if self.is_exact():
+            return exact_quantiles(self.compactors[0], probabilities)
+        weighted = sorted((value, 1 << h) for h, level in enumerate(self.compactors) for value in level)
+        result = []
+        for p in probabilities:
+            target = p * (self.count - 1)
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen > target:
+                    break
+            result.append(value)
+        return result
+
+# --- Per-column accumulator and policy ---
+
+class QuantileAccumulator:
+    """
+    Quantile state of one column (overall or in one group): an array('d') of the
+    values in exact mode, a KLLSketch in sketch mode. In 'auto' mode the values are
+    kept until there are more than the policy's threshold, then moved into a sketch.
+    """
+    __slots__ = ('policy', 'mode', 'values', 'sketch')
+
+    def __init__(self, policy: 'QuantilePolicy', mode: str):
+        self.policy = policy
+        self.mode = mode
+        self.values = array('d') if mode != 'sketch' else None
+        self.sketch = KLLSketch(policy.k) if mode == 'sketch' else None
+
+    def _switch_to_sketch(self) -> None:
+        self.sketch = KLLSketch(self.policy.k)
+        for value in self.values:
+            self.sketch.add(value)
+        self.values = None
+
+    def add(self, value: float) -> None:
+        if value != value:
+            return # NaN
+        if self.values is None:
+            self.sketch.add(value)
+            return
+        self.values.append(value)
+        if self.mode == 'auto' and len(self.values) > self.policy.threshold:
+            self._switch_to_sketch()
+
+    def extend(self, values: Iterable[float]) -> None:
+        if self.mode == 'exact':
+            self.values.extend(v for v in values if v == v)
+            return
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'QuantileAccumulator') -> None:
+        if self.values is not None and other.values is not None:
+            self.values.extend(other.values)
+            if self.mode == 'auto' and len(self.values) > self.policy.threshold:
+                self._switch_to_sketch()
+            return
+        # At least one side is sketched: sketch this side too, then merge
+        if self.values is not None:
+            self._switch_to_sketch()
+        if other.values is not None:
+            for value in other.values:
+                self.sketch.add(value)
+        else:
+            self.sketch.merge(other.sketch)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns {'quantiles': {label: value} or None} plus
+        'quantiles_approximate': True when the result comes from a compacted sketch.
+        """
+        probabilities = self.policy.probabilities
+        if self.values is not None:
+            values, approximate = exact_quantiles(self.values, probabilities), False
+        else:
+            values, approximate = self.sketch.quantiles(probabilities), not self.sketch.is_exact()
+        if values[0] is None:
+            return {'quantiles': None}
+        stats = {'quantiles': dict(zip(self.policy.labels, values))}
+        if approximate:
+            stats['quantiles_approximate'] = True
+        return stats
+
+class QuantilePolicy:
+    """
+    Decides per column how quantiles of its numeric values are computed.
+    columns maps a column name to 'exact', 'sketch', 'auto' or 'off'; other columns use
+    default_mode. 'auto' keeps the values exactly until a column (or group) has more
+    than threshold of them, then switches to a KLLSketch with parameter k; it only
+    matters for the streaming accumulators, the in-memory engines already hold every
+    value and compute 'auto' columns exactly.
+    """
+
+    def __init__(self, probabilities: Sequence[float] = DEFAULT_PROBABILITIES, threshold: int = 100_000, columns: Optional[Dict[str, str]] = None, default_mode: str = 'auto', k: int = 200):
+        for mode in [default_mode] + list((columns or {}).values()):
+            if mode not in ('exact', 'sketch', 'auto', 'off'):
+                raise ValueError(f"Unknown quantile mode '{mode}'. Expected 'exact', 'sketch', 'auto' or 'off'.")
+        for p in probabilities:
+            if not 0 <= p <= 1:
+                raise ValueError(f"Quantile probability {p} is not between 0 and 1.")
+        self.probabilities = tuple(probabilities)
+        self.labels = [quantile_label(p) for p in self.probabilities]
+        self.threshold = threshold
+        self.columns = dict(columns or {})
+        self.default_mode = default_mode
+        self.k = k
+
+    def mode_for(self, column: Optional[str]) -> str:
+        return self.columns.get(column, self.default_mode)
+
+    def new_accumulator(self, column: Optional[str]) -> Optional[QuantileAccumulator]:
+        mode = self.mode_for(column)
+        return QuantileAccumulator(self, mode) if mode != 'off' else None
+
+    def summarize(self, values: Iterable[float], column: Optional[str]) -> Dict[str, Any]:
+        """
+        Quantile stats of a column whose values are all in memory ({} for 'off' columns).
+        """
+        mode = self.mode_for(column)
+        if mode == 'off':
+            return {}
+        accumulator = QuantileAccumulator(self, 'sketch' if mode == 'sketch' else 'exact')
+        accumulator.extend(values)
+        return accumulator.stats()
+
+    def numpy_compatible(self) -> bool:
+        """
+        True if no column is sketched, so numpy_backend can compute every column exactly.
+        """
+        return 'sketch' not in [self.default_mode] + list(self.columns.values())
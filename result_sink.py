@@ -0,0 +1,259 @@
+import gzip
+import json
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from typing import List, Dict, Any, Tuple, Optional, Iterable
+
+from external_groupby import sort_key
+from prefetch_reader import dataset_stem
+
+# Streaming output of grouped summaries (Pure_Python_Stats.py's process_dataset).
+#
+# Without a sink, every group summary of every dataset stays in all_analysis_results
+# until one json.dump at the end, and for (page_id, ad_id) that dict is larger than
+# the CSV. A GroupSink writes the summaries to one file per dataset instead, and the
+# JSON summary only points to it. Groups that come from the sort-based group-by
+# (external_groupby.SortedGroups) are written as each one is computed; hash group-by
+# results are already a complete dict, which is sorted and then written.
+#
+# Each grouping's groups are written in key order (external_groupby.sort_key), in
+# blocks of block_groups groups:
+#   - ndjson: one {"grouping", "group", "stats"} line per group. Each block is
+#     compressed on its own (a gzip member or zstd frame), so the file is still a valid
+#     .gz / .zst stream for zcat / zstdcat.
+#   - parquet (pyarrow): columns grouping, group and stats (JSON text), one row group
+#     per block.
+# Next to it, an index (<file>.index.json) lists where each block is and, per
+# grouping, the first and last key of each of its blocks: one entry per block, not per
+# group. read_group bisects the first keys to find the one block that can hold a group
+# and decompresses only that block.
+#
+# zstd uses the zstandard package if it is installed, else pyarrow's codec.
+
+RESULT_FORMATS = ('ndjson', 'parquet')
+RESULT_COMPRESSIONS = (None, 'gzip', 'zstd')
+EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# --- Compression ---
+
+# (compress(data), decompress(data, raw_size)) for a compression name
+def block_codec(compression: Optional[str]):
+    if compression is None:
+        return (lambda data: data), (lambda data, size: data)
+    if compression == 'gzip':
+        return (lambda data: gzip.compress(data, compresslevel=6)), (lambda data, size: gzip.decompress(data))
+    try:
+        import zstandard
+    except ImportError:
+        import pyarrow as pa
+        codec = pa.Codec('zstd')
+        return (lambda data: codec.compress(data, asbytes=True)), (lambda data, size: codec.decompress(data, decompressed_size=size, asbytes=True))
+    compressor, decompressor = zstandard.ZstdCompressor(), zstandard.ZstdDecompressor()
+    return compressor.compress, (lambda data, size: decompressor.decompress(data, max_output_size=size))
+
+# --- Policy ---
+
+class ResultSinkPolicy:
+    """
+    Where and how grouped summaries are streamed: format 'ndjson' or 'parquet',
+    compression None, 'gzip' or 'zstd', and block_groups groups per compressed block /
+    row group. Files go to output_dir (next to the CSV file if None). Plain settings
+    only, so the policy can be passed to dataset_scheduler's worker processes.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, format: str = 'ndjson', compression: Optional[str] = 'gzip', block_groups: int = 1000):
+        if format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format '{format}'. Expected 'ndjson' or 'parquet'.")
+        if compression not in RESULT_COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}'. Expected None, 'gzip' or 'zstd'.")
+        if block_groups < 1:
+            raise ValueError("block_groups must be at least 1.")
+        self.output_dir = output_dir
+        self.format = format
+        self.compression = compression
+        self.block_groups = block_groups
+
+    def path_for(self, file_path: str) -> str:
+        directory = self.output_dir or os.path.dirname(os.path.abspath(file_path))
+        name = dataset_stem(file_path, tag_compression=True)
+        if self.format == 'parquet':
+            return os.path.join(directory, f"{name}_groups.parquet")
+        return os.path.join(directory, f"{name}_groups.ndjson{EXTENSIONS[self.compression]}")
+
+    def open(self, file_path: str) -> 'GroupSink':
+        """
+        Opens the sink for one dataset (file_path is the CSV being analyzed).
+        """
+        sink_class = ParquetGroupSink if self.format == 'parquet' else NdjsonGroupSink
+        return sink_class(self.path_for(file_path), self)
+
+# --- Sinks ---
+
+class GroupSink(ABC):
+    """
+    Writes the groups of one dataset, grouping by grouping, in sorted blocks.
+    Subclasses implement write_block and close_file.
+    """
+
+    def __init__(self, path: str, policy: ResultSinkPolicy):
+        self.path = path
+        self.index_path = path + '.index.json'
+        self.policy = policy
+        self.blocks = []    # Per format: where each block is
+        self.groupings = {} # {grouping: [[block, first key, last key], ...]} in key order
+        self.pending = []   # (grouping, key, stats) of the block being filled
+
+    def write_groups(self, grouping: str, items: Iterable[Tuple[Tuple, Dict[str, Any]]], presorted: bool = False) -> Dict[str, Any]:
+        """
+        Writes (group key, summary) pairs, e.g. dict.items() of analyze_groups' output
+        or SortedGroups.items(), and returns what the JSON summary should store.
+        Items are sorted by key first unless presorted (SortedGroups already are).
+        """
+        if not presorted:
+            items = sorted(items, key=lambda item: sort_key(item[0]))
+        self.groupings.setdefault(grouping, [])
+        count = 0
+        for key, stats in items:
+            self.pending.append((grouping, key, stats))
+            count += 1
+            if len(self.pending) >= self.policy.block_groups:
+                self.flush()
+        self.flush()
+        return {'groups_file': self.path, 'index_file': self.index_path, 'group_count': count}
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        grouping = self.pending[0][0]
+        self.groupings[grouping].append([len(self.blocks), list(self.pending[0][1]), list(self.pending[-1][1])])
+        self.write_block(self.pending)
+        self.pending = []
+
+    @abstractmethod
+    def write_block(self, rows: List[Tuple[str, Tuple, Dict[str, Any]]]) -> None:
+        """
+        Writes one block of rows (all of one grouping) and appends its location to blocks.
+        """
+
+    @abstractmethod
+    def close_file(self) -> None:
+        """
+        Closes the groups file.
+        """
+
+    def close(self) -> None:
+        """
+        Writes the last block and the index.
+        """
+        self.flush()
+        self.close_file()
+        index = {
+            'format': self.policy.format,
+            'compression': self.policy.compression,
+            'file': os.path.basename(self.path),
+            'blocks': self.blocks,
+            'groupings': self.groupings
+        }
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+
+    def __enter__(self) -> 'GroupSink':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class NdjsonGroupSink(GroupSink):
+    """
+    blocks holds [file offset, stored size, raw size] of each compressed block.
+    """
+
+    def __init__(self, path: str, policy: ResultSinkPolicy):
+        super().__init__(path, policy)
+        self.compress, _ = block_codec(policy.compression)
+        self.file = open(path, 'wb')
+
+    def write_block(self, rows: List[Tuple[str, Tuple, Dict[str, Any]]]) -> None:
+        raw = b''.join(json.dumps({'grouping': grouping, 'group': list(key), 'stats': stats}).encode('utf-8') + b'\n' for grouping, key, stats in rows)
+        data = self.compress(raw)
+        self.blocks.append([self.file.tell(), len(data), len(raw)])
+        self.file.write(data)
+
+    def close_file(self) -> None:
+        self.file.close()
+
+class ParquetGroupSink(GroupSink):
+    """
+    One row group per block; blocks holds the row count of each.
+    """
+
+    def __init__(self, path: str, policy: ResultSinkPolicy):
+        super().__init__(path, policy)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([('grouping', pa.string()), ('group', pa.string()), ('stats', pa.string())])
+        self.writer = pq.ParquetWriter(path, self.schema, compression=policy.compression or 'none')
+
+    def write_block(self, rows: List[Tuple[str, Tuple, Dict[str, Any]]]) -> None:
+        table = self.pa.table({
+            'grouping': [grouping for grouping, _, _ in rows],
+            'group': [json.dumps(list(key)) for _, key, _ in rows],
+            'stats': [json.dumps(stats) for _, _, stats in rows]
+        }, schema=self.schema)
+        self.writer.write_table(table, row_group_size=len(rows))
+        self.blocks.append(len(rows))
+
+    def close_file(self) -> None:
+        self.writer.close()
+
+# --- Reading ---
+
+# Load the index written next to a groups file
+def load_index(index_path: str) -> Dict[str, Any]:
+    with open(index_path, encoding='utf-8') as f:
+        return json.load(f)
+
+# Block of a grouping that can hold key (by its blocks' first and last keys), or None
+def find_block(blocks: List[List[Any]], key: Tuple) -> Optional[int]:
+    """
+    blocks is the index's [[block, first key, last key], ...] of one grouping, in key
+    order; the first keys are bisected.
+    """
+    target = sort_key(key)
+    i = bisect_right([sort_key(tuple(first)) for _, first, _ in blocks], target) - 1
+    if i < 0 or sort_key(tuple(blocks[i][2])) < target:
+        return None
+    return blocks[i][0]
+
+# Summary of one group, reading only the block that can hold it (None if not present)
+def read_group(index_path: str, grouping: str, key: Tuple, index: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    key is the group key tuple as in analyze_groups' output, e.g. (10000000.0,).
+    Pass a loaded index to look up many groups without re-reading it; the index has
+    one entry per block, not per group.
+    """
+    index = index or load_index(index_path)
+    block = find_block(index['groupings'].get(grouping, []), key)
+    if block is None:
+        return None
+    target = sort_key(key)
+    path = os.path.join(os.path.dirname(index_path), index['file'])
+    if index['format'] == 'parquet':
+        import pyarrow.parquet as pq
+        rows = pq.ParquetFile(path).read_row_group(block, columns=['group', 'stats'])
+        for group, stats in zip(rows.column('group').to_pylist(), rows.column('stats').to_pylist()):
+            if sort_key(tuple(json.loads(group))) == target:
+                return json.loads(stats)
+        return None
+    start, stored_size, raw_size = index['blocks'][block]
+    _, decompress = block_codec(index['compression'])
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = decompress(f.read(stored_size), raw_size)
+    for line in data.splitlines():
+        row = json.loads(line)
+        if sort_key(tuple(row['group'])) == target:
+            return row['stats']
+    return None
@@ -0,0 +1,168 @@
+import csv
+import json
+import re
+from typing import List, Dict, Any, Optional, Sequence, Union
+
+import dataset_cache
+from prefetch_reader import open_csv_text, with_csv_source
+
+# Per-column schema inference for the three engines.
+#
+# The first SCHEMA_SAMPLE_ROWS records are sampled to give every column one type:
+#   'int'     - every sampled value is an integer that fits in 64 bits
+#   'float'   - every sampled value is a decimal number
+#   'mixed'   - mostly numbers, plus some other tokens (e.g. "N/A")
+#   'bool'    - only True / False values
+#   'json'    - JSON-like strings such as delivery_by_region ("{...}" / "[...]")
+#   'id'      - short tokens without whitespace, mostly distinct (ids, urls, hashes)
+#   'text'    - any other string column (messages, categories)
+#   'unknown' - only blank cells in the sample
+# A schema is a plain {column: type} dict, so it can also be written by hand and
+# passed in explicitly. Inferred schemas are cached next to the CSV (dataset_cache).
+#
+# The pure-Python engine uses the schema to pick a converter per column (see
+# Pure_Python_Stats.column_converters); pandas_dtypes / polars_schema_overrides turn it
+# into arguments for pd.read_csv and pl.read_csv / pl.scan_csv.
+
+SCHEMA_SAMPLE_ROWS = 10_000
+COLUMN_TYPES = ('int', 'float', 'mixed', 'bool', 'json', 'id', 'text', 'unknown')
+
+# Numbers as written by the exports (what pandas and Polars both parse as numbers)
+INT_RE = re.compile(r'[+-]?\d+')
+FLOAT_RE = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+BOOL_VALUES = {'true', 'false'}
+
+# --- Inference ---
+
+# Type of one column from its sampled raw values
+def infer_column_type(values: List[str]) -> str:
+    values = [v.strip() for v in values if v is not None and v.strip()]
+    if not values:
+        return 'unknown'
+    numeric = [v for v in values if FLOAT_RE.fullmatch(v)]
+    if len(numeric) == len(values):
+        if all(INT_RE.fullmatch(v) and -2 ** 63 <= int(v) < 2 ** 63 for v in values):
+            return 'int'
+        return 'float'
+    if len(numeric) * 2 >= len(values):
+        return 'mixed'
+    if all(v.lower() in BOOL_VALUES for v in values):
+        return 'bool'
+    if sum(1 for v in values if v[0] in '{[') * 10 >= len(values) * 9:
+        return 'json'
+    if max(len(v) for v in values) <= 64 and not any(c.isspace() for v in values for c in v) and len(set(values)) * 2 > len(values):
+        return 'id'
+    return 'text'
+
+# Infer the schema of a CSV file from its first sample_rows records
+def infer_schema(filepath: str, sample_rows: int = SCHEMA_SAMPLE_ROWS) -> Dict[str, str]:
+    with open_csv_text(filepath) as csvfile:
+        reader = csv.reader(csvfile)
+        headers = next(reader, [])
+        samples = [[] for _ in headers]
+        for n, record in enumerate(reader):
+            if n >= sample_rows:
+                break
+            for i, value in enumerate(record[:len(headers)]):
+                samples[i].append(value)
+    return {header: infer_column_type(values) for header, values in zip(headers, samples)}
+
+# Schema for a CSV file, inferred once and then read from the cache
+def cached_schema(filepath: str, sample_rows: int = SCHEMA_SAMPLE_ROWS) -> Dict[str, str]:
+    entry = dataset_cache.cache_path(filepath, 'schema', extension='json')
+    if dataset_cache.lookup(entry) is not None:
+        with open(entry, encoding='utf-8') as f:
+            return json.load(f)
+    schema = infer_schema(filepath, sample_rows)
+    temp = dataset_cache.temp_path_for(entry)
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2)
+    dataset_cache.commit(temp, entry)
+    return schema
+
+# Turn a schema setting into a schema dict (or None for per-cell parsing)
+def resolve_schema(filepath: str, schema: Union[str, Dict[str, str], None]) -> Optional[Dict[str, str]]:
+    """
+    schema may be None (no schema), 'infer' (inferred and cached) or an explicit
+    {column: type} dict; columns missing from an explicit dict keep per-cell parsing.
+    """
+    if schema is None or isinstance(schema, dict):
+        if schema:
+            for column, column_type in schema.items():
+                if column_type not in COLUMN_TYPES:
+                    raise ValueError(f"Unknown type '{column_type}' for column '{column}'. Expected one of {COLUMN_TYPES}.")
+        return schema
+    if schema == 'infer':
+        return cached_schema(filepath)
+    raise ValueError(f"Unknown schema setting '{schema}'. Expected None, 'infer' or a {{column: type}} dict.")
+
+# --- pandas / Polars ---
+
+# dtype argument for pd.read_csv
+def pandas_dtypes(schema: Dict[str, str]) -> Dict[str, Any]:
+    """
+    'int', 'mixed', 'bool' and 'unknown' columns are left to pandas, which picks int64,
+    float64 (blank cells) or bool and treats tokens like "N/A" as missing as before.
+    """
+    dtypes = {}
+    for column, column_type in schema.items():
+        if column_type == 'float':
+            dtypes[column] = 'float64'
+        elif column_type in ('json', 'id', 'text'):
+            dtypes[column] = str
+    return dtypes
+
+# schema_overrides argument for pl.read_csv / pl.scan_csv
+def polars_schema_overrides(schema: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Polars only infers types from the first 100 rows by default and fails when a later
+    value does not fit; the overrides come from a much larger sample. 'mixed' columns
+    are read as strings, as Polars does when it sees a non-numeric token; 'bool' columns
+    are left to Polars, which reads them as Boolean.
+    """
+    import polars as pl
+    overrides = {}
+    for column, column_type in schema.items():
+        if column_type == 'int':
+            overrides[column] = pl.Int64
+        elif column_type == 'float':
+            overrides[column] = pl.Float64
+        elif column_type in ('mixed', 'json', 'id', 'text'):
+            overrides[column] = pl.Utf8
+    return overrides
+
+# pd.read_csv with the schema's dtypes (plain read_csv if a value does not fit them);
+# .gz / .zst files are decompressed by prefetch_reader, so .zst works without zstandard
+def read_csv_pandas(filepath: str, schema: Optional[Dict[str, str]] = None, columns: Optional[List[str]] = None):
+    import pandas as pd
+    if not schema:
+        return with_csv_source(filepath, lambda source: pd.read_csv(source, usecols=columns))
+    try:
+        return with_csv_source(filepath, lambda source: pd.read_csv(source, usecols=columns, dtype=pandas_dtypes(schema)))
+    except (ValueError, TypeError):
+        return with_csv_source(filepath, lambda source: pd.read_csv(source, usecols=columns))
+
+# pl.read_csv with the schema's overrides (full-file inference if a value does not fit)
+def read_csv_polars(filepath: str, schema: Optional[Dict[str, str]] = None):
+    import polars as pl
+    if not schema:
+        return pl.read_csv(filepath)
+    try:
+        return pl.read_csv(filepath, schema_overrides=polars_schema_overrides(schema))
+    except pl.exceptions.ComputeError:
+        return pl.read_csv(filepath, infer_schema_length=None)
+
+# pl.scan_csv with the schema's overrides
+def scan_csv_polars(filepath: str, schema: Optional[Dict[str, str]] = None, text_columns: Sequence[str] = (), infer_all: bool = False):
+    """
+    text_columns are read as strings whatever their type (join and group keys, so ids
+    are grouped by their text instead of a rounded float). infer_all ignores the
+    schema and infers types from the whole file.
+    """
+    import polars as pl
+    text = {column: pl.Utf8 for column in text_columns}
+    if infer_all:
+        return pl.scan_csv(filepath, infer_schema_length=None, schema_overrides=text or None)
+    if not schema:
+        return pl.scan_csv(filepath, schema_overrides=text or None)
+    return pl.scan_csv(filepath, schema_overrides={**polars_schema_overrides(schema), **text})
@@ -0,0 +1,228 @@
+import hashlib
+import math
+from typing import List, Dict, Any, Tuple, Optional, Iterable
+
+# Bounded-memory sketches for high-cardinality text columns (ad messages, tweet text).
+#
+# HyperLogLog estimates the number of distinct values (unique_non_numeric / n_unique).
+#   Memory is 2**precision bytes (16 KiB at the default precision 14) and the standard
+#   error of the estimate is 1.04 / sqrt(2**precision), about 0.8%.
+# SpaceSaving keeps at most 2 * capacity candidate heavy hitters for the top-k values.
+#   Every reported count is an upper bound and count - error is a lower bound; the
+#   error is at most total / capacity, so any value that occurs more often than that
+#   is guaranteed to be tracked.
+# Both sketches can be merged, so they work per group and across parallel chunks.
+# Hashes differ between engines (blake2b here, hash_pandas_object for pandas,
+# Series.hash for Polars), so only sketches built by the same engine can be merged.
+
+# --- Helper Functions ---
+
+# Stable 64-bit hash of a value (Python's hash() is salted per process)
+def stable_hash64(value: Any) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'little')
+
+# --- Distinct counts ---
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch over 64-bit hashes.
+    """
+
+    def __init__(self, precision: int = 14):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18.")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, value: Any) -> None:
+        self.add_hash(stable_hash64(value))
+
+    def add_hash(self, h: int) -> None:
+        rest_bits = 64 - self.precision
+        index = h >> rest_bits
+        rank = rest_bits - (h & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add_hashes(self, hashes: Iterable[int]) -> None:
+        """
+        Adds many hashes at once. A NumPy uint64 array (e.g. from hash_pandas_object
+        or Polars' Series.hash) is processed with vectorized operations.
+        """
+        if hasattr(hashes, 'dtype'):
+            import numpy as np
+            hashes = np.asarray(hashes, dtype=np.uint64)
+            rest_bits = 64 - self.precision
+            index = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+            rest = hashes & np.uint64((1 << rest_bits) - 1)
+            # frexp's exponent is the bit length (0 for 0); float rounding only matters
+            # for values just below a power of two and has no visible effect on the estimate
+            _, bit_length = np.frexp(rest.astype(np.float64))
+            ranks = (rest_bits - np.minimum(bit_length, rest_bits) + 1).astype(np.uint8)
+            registers = np.frombuffer(self.registers, dtype=np.uint8)
+            np.maximum.at(registers, index, ranks)
+            return
+        for h in hashes:
+            self.add_hash(int(h))
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions.")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros) # Linear counting for small cardinalities
+        return int(round(estimate))
+
+# --- Heavy hitters ---
+
+class SpaceSaving:
+    """
+    Space-Saving top-k sketch with batched eviction: the table grows to 2 * capacity
+    and is then pruned back to the capacity highest counts, so eviction is amortized
+    O(1) per value. floor is the largest evicted count; a value that enters the table
+    starts at floor + count with error floor.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+        self.total = 0
+
+    @classmethod
+    def from_counts(cls, counts: Dict[Any, int], capacity: int = 1024) -> 'SpaceSaving':
+        sketch = cls(capacity)
+        for item, count in counts.items():
+            sketch.add(item, count)
+        return sketch
+
+    def add(self, item: Any, count: int = 1) -> None:
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        self.counts[item] = self.floor + count
+        self.errors[item] = self.floor
+        if len(self.counts) >= 2 * self.capacity:
+            self._prune()
+
+    def _prune(self) -> None:
+        # sorted() is stable, so ties keep first-seen order
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        if len(ranked) <= self.capacity:
+            return
+        self.floor = max(self.floor, ranked[self.capacity][1])
+        for item, _ in ranked[self.capacity:]:
+            del self.counts[item]
+            del self.errors[item]
+
+    def merge(self, other: 'SpaceSaving') -> None:
+        for item in other.counts:
+            if item not in self.counts:
+                self.counts[item] = self.floor
+                self.errors[item] = self.floor
+        for item in self.counts:
+            self.counts[item] += other.counts.get(item, other.floor)
+            self.errors[item] += other.errors.get(item, other.floor)
+        self.floor += other.floor
+        self.total += other.total
+        self._prune()
+
+    def top(self, k: int) -> List[Tuple[Any, int]]:
+        """
+        Returns up to k (value, estimated_count) pairs, highest first.
+        """
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    @property
+    def error_bound(self) -> int:
+        return self.floor
+
+# --- Per-column policy ---
+
+class SketchPolicy:
+    """
+    Decides per column whether non-numeric values are counted exactly or sketched.
+    columns maps a column name to 'exact', 'sketch' or 'auto'; other columns use
+    default_mode. In 'auto' mode a column is counted exactly until it has more than
+    threshold distinct values, then switches to sketches.
+    """
+
+    def __init__(self, threshold: int = 100_000, columns: Optional[Dict[str, str]] = None, default_mode: str = 'auto', hll_precision: int = 14, topk_capacity: int = 1024):
+        for mode in [default_mode] + list((columns or {}).values()):
+            if mode not in ('exact', 'sketch', 'auto'):
+                raise ValueError(f"Unknown sketch mode '{mode}'. Expected 'exact', 'sketch' or 'auto'.")
+        self.threshold = threshold
+        self.columns = dict(columns or {})
+        self.default_mode = default_mode
+        self.hll_precision = hll_precision
+        self.topk_capacity = topk_capacity
+
+    def mode_for(self, column: Optional[str]) -> str:
+        return self.columns.get(column, self.default_mode)
+
+    def new_sketches(self) -> Tuple[HyperLogLog, SpaceSaving]:
+        return HyperLogLog(self.hll_precision), SpaceSaving(self.topk_capacity)
+
+    def sketch_counts(self, counts: Dict[Any, int]) -> Tuple[HyperLogLog, SpaceSaving]:
+        """
+        Converts exact value counts into sketches (used when 'auto' switches over).
+        """
+        hll = HyperLogLog(self.hll_precision)
+        for value in counts:
+            hll.add(value)
+        return hll, SpaceSaving.from_counts(counts, self.topk_capacity)
+
+# --- pandas / Polars helpers ---
+
+# Top-k values and distinct count of a pandas Series under a sketch policy
+def pandas_top_and_unique(series, policy: SketchPolicy, column: str, k: int = 5, chunk_rows: int = 100_000) -> Tuple[List[Tuple[Any, int]], int, bool]:
+    """
+    Returns (top_k_pairs, n_unique, approximate). The distinct count comes from a
+    vectorized HyperLogLog over hash_pandas_object; 'auto' columns under the threshold
+    fall back to exact value_counts. The top-k is built from per-chunk value_counts,
+    so no hash table ever holds more than chunk_rows + 2 * capacity values.
+    """
+    import pandas as pd
+    mode = policy.mode_for(column)
+    values = series.dropna()
+    if mode == 'exact':
+        counts = values.value_counts()
+        return list(counts.head(k).items()), int(values.nunique()), False
+    hll = HyperLogLog(policy.hll_precision)
+    hll.add_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy())
+    if mode == 'auto' and hll.count() <= policy.threshold:
+        counts = values.value_counts()
+        return list(counts.head(k).items()), int(values.nunique()), False
+    top_k = SpaceSaving(policy.topk_capacity)
+    for start in range(0, len(values), chunk_rows):
+        for value, count in values.iloc[start:start + chunk_rows].value_counts(sort=False).items():
+            top_k.add(value, int(count))
+    return top_k.top(k), hll.count(), True
+
+# Same as pandas_top_and_unique for an iterable of Polars Series batches of one column
+def polars_top_and_unique(batches: Iterable, policy: SketchPolicy, k: int = 5) -> Tuple[List[Tuple[Any, int]], int]:
+    """
+    Feeds every batch into a HyperLogLog (Series.hash) and a SpaceSaving sketch
+    (per-batch value_counts). Returns (top_k_pairs, approximate_n_unique).
+    """
+    hll, top_k = policy.new_sketches()
+    for batch in batches:
+        batch = batch.drop_nulls()
+        if batch.is_empty():
+            continue
+        hll.add_hashes(batch.hash().to_numpy())
+        for value, count in batch.value_counts().iter_rows():
+            top_k.add(value, int(count))
+    return top_k.top(k), hll.count()
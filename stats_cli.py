@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import tempfile
+from functools import partial
+from typing import List, Dict, Any, Optional
+
+from dataset_scheduler import run_dataset_jobs
+from job_spec import JOB_ENGINES, Comparison, DatasetSpec, load_job_spec
+
+# Single entry point for declarative jobs (job_spec.py):
+#
+#   python stats_cli.py job_spec.example.json [--engine polars] [--dataset fb_ads] [--comparison fb_pages]
+#
+# Each dataset of the spec runs in a worker process (dataset_scheduler.py) with the
+# chosen engine's analyze_job_dataset, which reads only the referenced columns and
+# applies the filters while reading. Results of all datasets are written to one JSON
+# file, shaped like all_datasets_summary.json.
+#
+# Comparisons (comparative_stats.py) run in worker processes too, with the engine's
+# analyze_comparison, and their results sit next to the datasets' under their names.
+# pandas has no comparison engine; its specs run comparisons with pure Python.
+#
+# --check-keys runs a small generated spec with every engine and fails if they key it
+# differently (check_keys), e.g. an id column Polars infers as float.
+
+DEFAULT_OUTPUT = "job_summary.json"
+
+# analyze_job_dataset of an engine module (imported in the worker, so only that engine loads)
+def run_job_dataset(engine: str, schema: Any, dataset: DatasetSpec, file_path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(file_path):
+        print(f"Error: The file was not found at '{file_path}'. Skipping dataset '{dataset.name}'.")
+        return None
+    if engine == 'polars':
+        import Polars_stats as module
+    elif engine == 'pandas':
+        import Pandas_Stats as module
+    else:
+        import Pure_Python_Stats as module
+    return module.analyze_job_dataset(dataset, schema)
+
+# analyze_comparison of an engine module; file_path is the first dataset's (for the scheduler)
+def run_comparison(engine: str, schema: Any, comparison: Comparison, datasets: Dict[str, DatasetSpec], file_path: str) -> Optional[Dict[str, Any]]:
+    for dataset in datasets.values():
+        if not os.path.exists(dataset.path):
+            print(f"Error: The file was not found at '{dataset.path}'. Skipping comparison '{comparison.name}'.")
+            return None
+    if engine == 'polars':
+        import Polars_stats as module
+    else:
+        import Pure_Python_Stats as module
+    return module.analyze_comparison(comparison, datasets, schema)
+
+# --- Key consistency check ---
+
+# Keys (and their row counts) of a comparison's results
+def comparison_keys(results: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    return {key: entry['rows'] for key, entry in results['keys'].items()}
+
+# Group keys of a dataset's results, with each group's row count
+def group_keys(results: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    return {name: {key: next(iter(stats.values()))['total_count'] for key, stats in groups.items()}
+            for name, groups in results.items() if name.startswith('grouped_by_')}
+
+# Run a generated spec with every engine and raise AssertionError where their keys differ
+def check_keys(directory: str) -> Dict[str, Any]:
+    """
+    fb_ads-like ids are written to a.csv with a "10000001.0" among them, so pandas and
+    Polars infer the column as float, and 12345678901234567 (above 2**53, so a float
+    rounds it to ...568); b.csv holds the same ids as plain integers. Both datasets
+    are grouped by their id and compared on it. Returns the pure Python engine's keys.
+    """
+    ids = ['10000001.0', '12345678901234567', '10000002', '10000003', '']
+    with open(os.path.join(directory, 'a.csv'), 'w', encoding='utf-8') as f:
+        f.write('Facebook_Id,Likes\n' + ''.join(f'{ids[i % len(ids)]},{i}\n' for i in range(200)))
+    with open(os.path.join(directory, 'b.csv'), 'w', encoding='utf-8') as f:
+        f.write('page_id,spend\n' + ''.join(f'{ids[i % 3].split(".")[0]},{i / 4}\n' for i in range(150)))
+    spec_path = os.path.join(directory, 'check_keys.json')
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump({'datasets': [{'name': 'a', 'path': 'a.csv', 'columns': ['Likes'], 'group_by': [['Facebook_Id']], 'stats': ['count', 'mean']},
+                                {'name': 'b', 'path': 'b.csv', 'columns': ['spend'], 'group_by': [['page_id']], 'stats': ['count', 'mean']}],
+                   'comparisons': [{'name': 'pages', 'keys': {'a': 'Facebook_Id', 'b': 'page_id'}, 'how': 'outer'}]}, f)
+    spec = load_job_spec(spec_path)
+    by_name = {dataset.name: dataset for dataset in spec.datasets}
+    keys = {}
+    for engine in JOB_ENGINES:
+        keys[engine] = {dataset.name: group_keys(run_job_dataset(engine, spec.schema, dataset, dataset.path)) for dataset in spec.datasets}
+        for comparison in spec.comparisons:
+            compared = {name: by_name[name] for name in comparison.keys}
+            keys[engine][comparison.name] = comparison_keys(run_comparison(engine, spec.schema, comparison, compared, ''))
+    expected = keys['python']
+    for engine, found in keys.items():
+        for name in expected:
+            assert found[name] == expected[name], f"{engine} keys of '{name}' differ from pure Python's: {found[name]} != {expected[name]}"
+    return expected
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the analyses and comparisons described by a job spec file (see job_spec.py).")
+    parser.add_argument("spec", nargs="?", help="Path of the JSON job spec")
+    parser.add_argument("--engine", choices=JOB_ENGINES, help="Engine to use instead of the spec's")
+    parser.add_argument("--output", help=f"JSON results file (default: the spec's output, else {DEFAULT_OUTPUT})")
+    parser.add_argument("--workers", type=int, help="Datasets analyzed at the same time")
+    parser.add_argument("--dataset", action="append", help="Only run this dataset (by name); may be repeated")
+    parser.add_argument("--comparison", action="append", help="Only run this comparison (by name); may be repeated")
+    parser.add_argument("--check-keys", action="store_true", help="Check that every engine keys a generated spec the same way, then exit")
+    args = parser.parse_args(argv)
+    if args.check_keys:
+        with tempfile.TemporaryDirectory() as directory:
+            for name, keys in check_keys(directory).items():
+                print(f"{name}: {json.dumps(keys)}")
+        print(f"Keys match across engines: {', '.join(JOB_ENGINES)}")
+        return
+    if args.spec is None:
+        parser.error("the spec argument is required")
+
+    spec = load_job_spec(args.spec)
+    engine = args.engine or spec.engine
+    datasets = spec.datasets
+    comparisons = spec.comparisons
+    # With --dataset or --comparison, only the named ones run
+    if args.dataset or args.comparison:
+        unknown = set(args.dataset or []) - {dataset.name for dataset in datasets}
+        unknown |= set(args.comparison or []) - {comparison.name for comparison in comparisons}
+        if unknown:
+            parser.error(f"Unknown dataset(s) or comparison(s): {', '.join(sorted(unknown))}")
+        datasets = [dataset for dataset in datasets if dataset.name in (args.dataset or [])]
+        comparisons = [comparison for comparison in comparisons if comparison.name in (args.comparison or [])]
+
+    by_name = {dataset.name: dataset for dataset in spec.datasets}
+    jobs = [(partial(run_job_dataset, engine, spec.schema, dataset), dataset.path) for dataset in datasets]
+    for comparison in comparisons:
+        compared = {name: by_name[name] for name in comparison.keys}
+        jobs.append((partial(run_comparison, engine, spec.schema, comparison, compared), next(iter(compared.values())).path))
+    # Polars warns about forking a process that has loaded it; spawn avoids that
+    results = run_dataset_jobs(jobs, max_workers=args.workers or spec.workers, start_method="spawn" if engine == 'polars' else None)
+
+    names = [dataset.name for dataset in datasets] + [comparison.name for comparison in comparisons]
+    summary = {name: result for name, result in zip(names, results) if result is not None}
+    output = args.output or spec.output or DEFAULT_OUTPUT
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nResults for {len(summary)} of {len(names)} datasets and comparisons written to {output}")
+
+
+if __name__ == "__main__":
+    main()